@@ -0,0 +1,88 @@
+import os
+import re
+import hashlib
+import threading
+from cache_store import make_cache, MemoryCache
+from data_events import on_tables_loaded, data_version
+from telemetry import span, increment
+
+# --- Answer Cache Configuration ---
+
+ANSWER_CACHE_ENABLED = os.getenv("AURA_ANSWER_CACHE", "1") == "1"
+# Answers are also dropped whenever new data is uploaded, so this only bounds drift
+# from the scheduled warehouse loads
+ANSWER_CACHE_TTL = float(os.getenv("AURA_ANSWER_CACHE_TTL", "900"))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("AURA_ANSWER_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("AURA_ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_PATH = os.getenv("AURA_ANSWER_CACHE_PATH")
+
+_cache = make_cache(
+    ANSWER_CACHE_PATH,
+    max_bytes=ANSWER_CACHE_MAX_BYTES,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    default_ttl=ANSWER_CACHE_TTL
+)
+_seen_version = data_version()
+_version_lock = threading.Lock()
+
+
+def normalize_question(question: str):
+    """Lower-cases, collapses whitespace and drops trailing punctuation."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def answer_cache_key(question: str, formatted_history: str):
+    """Cache key for a question asked in the context of the recent history window."""
+    raw = normalize_question(question) + "\n" + (formatted_history or "")
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _sync_with_other_workers():
+    """Drops in-memory answers once any worker has loaded new data."""
+    global _seen_version
+    current = data_version()
+    if current != _seen_version:
+        with _version_lock:
+            if current != _seen_version:
+                if isinstance(_cache, MemoryCache):
+                    _cache.clear()
+                _seen_version = current
+
+
+def get_cached_answer(question: str, formatted_history: str):
+    """Returns the cached {"intent", "response"} for this question, or None."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with span("cache.answer") as lookup:
+        _sync_with_other_workers()
+        value = _cache.get(answer_cache_key(question, formatted_history))
+        lookup.set(hit=value is not None)
+    increment("aura_cache_lookups_total", help_text="Cache lookups by cache and outcome.",
+              cache="answer", outcome="hit" if value is not None else "miss")
+    return value
+
+
+def cache_answer(question: str, formatted_history: str, intent: str, response: str):
+    """Remembers the final answer for this question and history window."""
+    if not ANSWER_CACHE_ENABLED:
+        return
+    _cache.set(
+        answer_cache_key(question, formatted_history),
+        {"intent": intent, "response": response},
+        tags=["answers"]
+    )
+
+
+@on_tables_loaded
+def invalidate_answers(tables):
+    """Any upload can change any answer, so the whole answer cache is dropped."""
+    removed = _cache.invalidate_tags(["answers"])
+    if removed:
+        print(f"[Answer Cache] Invalidated {removed} cached answer(s) after data load.")
+    return removed
+
+
+def answer_cache_stats():
+    """Returns hit/miss counters and current size of the answer cache."""
+    return _cache.stats()
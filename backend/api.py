@@ -1,13 +1,35 @@
 import os
-from flask import Flask, request, jsonify
+import json
+import math
+import time
+from datetime import datetime, timezone
+from flask import Flask, request, jsonify, Response, stream_with_context, g, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-import snowflake.connector
+from werkzeug.exceptions import ClientDisconnected
 # --- Import Your Existing Logic ---
 # We assume these functions are in the files as described
-from app import run_agentic_flow, route_user_question
-from csv_parser import get_ai_upload_plan, smart_upload_csv, get_all_table_schemas
+from app import (run_agentic_flow, iter_agentic_flow, route_user_question, format_chat_history,
+                 NO_DATA_ANSWER, InvestigationCancelled)
+from csv_parser import get_upload_plan, smart_upload_csv, smart_upload_batch, get_all_table_schemas
+from csv_intake import receive_csv, UploadRejected
+from upload_chunks import remove_quietly
+from upload_transform import REJECTS_DIR, purge_expired_reports
 from database_connector import get_schema_for_agent
+from connection_pool import pool_stats
+from warehouse import get_warehouse
+from schema_catalog import schema_catalog_stats
+from snapshot_store import snapshot_stats
+from upload_mapping import mapping_stats
+from result_cache import result_cache_stats
+from answer_cache import get_cached_answer, cache_answer, answer_cache_stats
+from job_queue import get_job_queue, JobQueueFull, JobCancelled, JOB_DEFAULT_DEADLINE
+from payload_cache import materialized_payload, payload_cache_stats
+from intent_router import router_stats
+from telemetry import (span, observe, request_trace, debug_trace_requested, register_gauge,
+                       render_prometheus)
+from llm_client import is_quota_error, llm_priority, llm_stats, PRIORITY_BACKGROUND
+from dashboard_queries import run_widgets, widget_stats, DASHBOARD_WIDGETS, ANALYTICS_WIDGETS
 import pandas as pd
 
 # --- Mock Mode (set AURA_MOCK_DATA=1 to enable stub responses when DB is down) ---
@@ -65,7 +87,7 @@ app = Flask(__name__)
 CORS(app, 
      resources={r"/api/*": {"origins": "*"}},
      allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "OPTIONS"],
+     methods=["GET", "POST", "DELETE", "OPTIONS"],
      supports_credentials=False)
 
 # Define a folder to store temporary uploads
@@ -87,13 +109,24 @@ except Exception as e:
     print(f"⚠️  Error loading database schema: {e}. Using mock data mode.")
     DB_SCHEMA = None
 
+def current_db_schema():
+    """
+    Returns the latest schema string from the catalog, which refreshes itself in
+    the background, so schema changes are picked up without restarting workers.
+    """
+    global DB_SCHEMA
+    schema = get_schema_for_agent()
+    if schema:
+        DB_SCHEMA = schema
+    return DB_SCHEMA
+
 # --- Error Handlers to ensure CORS works even with errors ---
 @app.after_request
 def after_request(response):
     """Ensure CORS headers are present on all responses."""
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
+    response.headers.add('Access-Control-Allow-Methods', 'GET,POST,DELETE,OPTIONS')
     return response
 
 @app.errorhandler(404)
@@ -106,8 +139,72 @@ def internal_error(error):
     """Handle 500 errors with CORS headers."""
     return jsonify({"error": "Internal server error"}), 500
 
+# --- Canned Replies for Non-Data Intents ---
+
+CANNED_ANSWERS = {
+    'greeting': "Hello! I'm Aura, your Autonomous Retail Intelligence Agent. How can I help you analyze our data today?",
+    'off_topic': "I'm sorry, but I can only answer questions related to our retail data. Please ask something about sales, inventory, or product performance.",
+    'unanswerable': "I understand you're asking about business/retail topics, but I don't have the necessary data in our system to answer that question. I can help you with questions about sales, inventory, product performance, and other data that's available in our Snowflake database. Could you try rephrasing your question to focus on data we have available?",
+}
+
+def canned_answer(intent: str):
+    """Returns the fixed reply for intents that do not need the agent."""
+    return CANNED_ANSWERS.get(
+        intent,
+        "I'm not sure how to handle that request. Please try asking a question related to our retail data."
+    )
+
+def is_cacheable_answer(intent: str, final_answer: str, grounded: bool = True):
+    """
+    'unanswerable' is also the router's fallback on errors, so it is never cached;
+    neither is a data answer synthesized when every plan step failed (grounded=False).
+    """
+    if intent == 'data_query' and not grounded:
+        return False
+    return intent in ('data_query', 'greeting', 'off_topic') and bool(final_answer) and final_answer != NO_DATA_ANSWER
+
+QUOTA_ERROR_MESSAGE = "API rate limit exceeded. Please wait a moment before trying again. The Gemini API free tier allows 15 requests per minute."
+
 # --- API Endpoints ---
 
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.time()
+
+@app.after_request
+def _record_request_latency(response):
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        observe("aura_http_request_seconds", time.time() - started, "Latency of each API endpoint.",
+                endpoint=request.endpoint or "unknown", status=response.status_code)
+    return response
+
+def _answer_chat(user_question: str, chat_history: list):
+    """Answers one chat message: answer cache, then router, then the agent if needed."""
+    # Serve repeated questions (same recent context) without touching Gemini or Snowflake
+    formatted_history = format_chat_history(chat_history)
+    cached = get_cached_answer(user_question, formatted_history)
+    if cached is not None:
+        print("[Answer Cache] Serving chat answer from cache.")
+        return cached["response"]
+
+    db_schema = current_db_schema()
+
+    # Use the router to check intent
+    intent = route_user_question(user_question, db_schema)
+    
+    final_answer, grounded = "", True
+    if intent == 'data_query':
+        # If it's a data query, run the full agentic flow
+        answer = run_agentic_flow(user_question, db_schema, chat_history)
+        final_answer, grounded = answer["response"], answer["grounded"]
+    else:
+        final_answer = canned_answer(intent)
+
+    if is_cacheable_answer(intent, final_answer, grounded):
+        cache_answer(user_question, formatted_history, intent, final_answer)
+    return final_answer
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Endpoint to handle chat interactions with the Aura agent."""
@@ -119,36 +216,241 @@ def chat():
         if not user_question:
             return jsonify({"error": "No message provided."}), 400
 
-        # Use the router to check intent
-        intent = route_user_question(user_question, DB_SCHEMA)
-        
-        final_answer = ""
-        if intent == 'data_query':
-            # If it's a data query, run the full agentic flow
-            final_answer = run_agentic_flow(user_question, DB_SCHEMA, chat_history)
-        elif intent == 'greeting':
-            final_answer = "Hello! I'm Aura, your Autonomous Retail Intelligence Agent. How can I help you analyze our data today?"
-        elif intent == 'off_topic':
-            final_answer = "I'm sorry, but I can only answer questions related to our retail data. Please ask something about sales, inventory, or product performance."
-        elif intent == 'unanswerable':
-            final_answer = "I understand you're asking about business/retail topics, but I don't have the necessary data in our system to answer that question. I can help you with questions about sales, inventory, product performance, and other data that's available in our Snowflake database. Could you try rephrasing your question to focus on data we have available?"
-        else:
-            final_answer = "I'm not sure how to handle that request. Please try asking a question related to our retail data."
+        with request_trace(debug_trace_requested(data.get('debug'))) as trace:
+            with span("http.chat"):
+                final_answer = _answer_chat(user_question, chat_history)
 
-        return jsonify({"response": final_answer})
+        body = {"response": final_answer}
+        if trace is not None:
+            body["trace"] = trace.to_dict()
+        return jsonify(body)
     
     except Exception as e:
         error_message = str(e)
         # Check if it's a quota error
-        if "ResourceExhausted" in error_message or "quota" in error_message.lower():
-            return jsonify({
-                "error": "API rate limit exceeded. Please wait a moment before trying again. The Gemini API free tier allows 15 requests per minute."
-            }), 429
+        if is_quota_error(e):
+            return jsonify({"error": QUOTA_ERROR_MESSAGE}), 429
         else:
             print(f"Error in chat endpoint: {e}")
             return jsonify({"error": f"An error occurred: {error_message}"}), 500
 
 
+def _sse(event: str, data: dict):
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat. Emits Server-Sent Events as the agent works:
+    intent, plan, step_start, step_finish, synthesis_token, and a final answer
+    (or error) event.
+    """
+    data = request.json or {}
+    user_question = data.get('message')
+    chat_history = data.get('history', [])
+
+    if not user_question:
+        return jsonify({"error": "No message provided."}), 400
+
+    debug = debug_trace_requested(data.get('debug'))
+
+    def generate():
+        with request_trace(debug) as trace:
+            yield from _stream_chat(user_question, chat_history)
+            if trace is not None:
+                yield _sse("trace", trace.to_dict())
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _stream_chat(user_question: str, chat_history: list):
+    """Yields the SSE messages of one streamed chat answer."""
+    with span("http.chat_stream"):
+        try:
+            formatted_history = format_chat_history(chat_history)
+            cached = get_cached_answer(user_question, formatted_history)
+            if cached is not None:
+                yield _sse("intent", {"intent": cached["intent"], "cached": True})
+                yield _sse("answer", {"response": cached["response"], "cached": True})
+                return
+
+            db_schema = current_db_schema()
+            intent = route_user_question(user_question, db_schema)
+            yield _sse("intent", {"intent": intent})
+
+            grounded = True
+            if intent != 'data_query':
+                final_answer = canned_answer(intent)
+                yield _sse("answer", {"response": final_answer})
+            else:
+                final_answer = None
+                for event, payload in iter_agentic_flow(user_question, db_schema, chat_history, stream_synthesis=True):
+                    if event == "answer":
+                        final_answer, grounded = payload["response"], payload["grounded"]
+                    yield _sse(event, payload)
+
+            if is_cacheable_answer(intent, final_answer, grounded):
+                cache_answer(user_question, formatted_history, intent, final_answer)
+
+        except Exception as e:
+            if is_quota_error(e):
+                yield _sse("error", {"error": QUOTA_ERROR_MESSAGE, "status": 429})
+            else:
+                print(f"Error in chat stream endpoint: {e}")
+                yield _sse("error", {"error": f"An error occurred: {e}", "status": 500})
+
+
+# --- Background Investigations (submit/poll) ---
+
+def _run_chat_job(user_question: str, chat_history: list, should_cancel=None, time_remaining=None):
+    """Job body for /api/chat/jobs: the same pipeline as /api/chat, off the request thread."""
+    formatted_history = format_chat_history(chat_history)
+    cached = get_cached_answer(user_question, formatted_history)
+    if cached is not None:
+        return {"response": cached["response"], "intent": cached["intent"], "cached": True}
+
+    db_schema = current_db_schema()
+    # Background investigations yield LLM capacity to interactive chats
+    with llm_priority(PRIORITY_BACKGROUND):
+        intent = route_user_question(user_question, db_schema)
+        grounded = True
+        if intent == 'data_query':
+            try:
+                # Leave a little of the job budget for the synthesis call
+                max_execution_time = max(5, time_remaining() - 10) if time_remaining else 60
+                answer = run_agentic_flow(user_question, db_schema, chat_history,
+                                          max_execution_time=max_execution_time,
+                                          should_cancel=should_cancel)
+                final_answer, grounded = answer["response"], answer["grounded"]
+            except InvestigationCancelled:
+                raise JobCancelled()
+        else:
+            final_answer = canned_answer(intent)
+
+    if is_cacheable_answer(intent, final_answer, grounded):
+        cache_answer(user_question, formatted_history, intent, final_answer)
+    return {"response": final_answer, "intent": intent}
+
+def _job_payload(job: dict):
+    payload = {
+        "jobId": job["id"],
+        "status": job["status"],
+        "createdAt": job["created_at"],
+        "startedAt": job["started_at"],
+        "finishedAt": job["finished_at"],
+        "deadlineAt": job["deadline_at"],
+        "cancelRequested": job["cancel_requested"],
+    }
+    if job["result"] is not None:
+        payload["result"] = job["result"]
+    if job["error"]:
+        payload["error"] = job["error"]
+    return payload
+
+@app.route('/api/chat/jobs', methods=['POST'])
+def submit_chat_job():
+    """
+    Queues a chat investigation on the background worker pool and returns at once.
+    Poll GET /api/chat/jobs/<job_id> for the result; DELETE cancels it.
+    """
+    data = request.json or {}
+    user_question = data.get('message')
+    chat_history = data.get('history', [])
+    deadline = data.get('deadline')
+
+    if not user_question:
+        return jsonify({"error": "No message provided."}), 400
+    if deadline is not None:
+        try:
+            if isinstance(deadline, bool):
+                raise ValueError(deadline)
+            deadline = float(deadline)
+        except (TypeError, ValueError):
+            return jsonify({"error": "'deadline' must be a number of seconds."}), 400
+        if math.isnan(deadline):
+            return jsonify({"error": "'deadline' must be a number of seconds."}), 400
+        # A non-positive deadline falls back to the default instead of timing the job out at once
+        deadline = min(deadline, JOB_DEFAULT_DEADLINE) if deadline > 0 else None
+
+    try:
+        job_id = get_job_queue().submit(
+            "chat", _run_chat_job, user_question, chat_history, deadline=deadline
+        )
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({"jobId": job_id, "status": "queued", "pollUrl": f"/api/chat/jobs/{job_id}"}), 202
+
+@app.route('/api/chat/jobs/<job_id>', methods=['GET'])
+def get_chat_job(job_id):
+    """Returns the status of a background investigation, and its answer once done."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired."}), 404
+    return jsonify(_job_payload(job))
+
+@app.route('/api/chat/jobs/<job_id>', methods=['DELETE'])
+def cancel_chat_job(job_id):
+    """Requests cancellation of a queued or running investigation."""
+    queue = get_job_queue()
+    if not queue.cancel(job_id):
+        job = queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found or expired."}), 404
+        return jsonify(_job_payload(job)), 409
+    return jsonify(_job_payload(queue.get(job_id))), 202
+
+
+@app.route('/api/upload-plan', methods=['POST'])
+@app.route('/api/analyze-csv', methods=['POST'])
+def upload_plan():
+    """
+    Streams an uploaded CSV (multipart `file` field, or a raw body with ?filename=)
+    to temp_uploads while profiling it, then plans the upload (a remembered plan,
+    the local matcher or, when it is unsure, the AI).
+    The response can be posted back unchanged to /api/execute-upload.
+    """
+    schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+    filepath = None
+    try:
+        with span("upload.receive") as receive_span:
+            filename, profile = receive_csv(request.stream, request.content_type, app.config['UPLOAD_FOLDER'],
+                                            request.args.get('filename'))
+            receive_span.set(bytes=profile["bytes"], rowsProfiled=profile["rowsProfiled"])
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+        all_schemas, error = get_all_table_schemas(schema_name) if schema_name else (None, "No schema configured.")
+        plan = None
+        if not error:
+            csv_columns = [column["name"] for column in profile["columns"]]
+            plan, error = get_upload_plan(csv_columns, all_schemas, schema_name, profile)
+    except UploadRejected as e:
+        return jsonify({"error": str(e)}), 400
+    except ClientDisconnected:
+        # receive_csv already removed its partial file
+        print("⚠️  Client disconnected during a CSV upload.")
+        return jsonify({"error": "The upload was interrupted before the file was complete."}), 400
+    except Exception as e:
+        print(f"Error planning upload: {e}")
+        error = f"Could not plan the upload: {e}"
+    if error:
+        if filepath:
+            remove_quietly(filepath)
+        return jsonify({"error": error}), 500
+
+    return jsonify({
+        "filename": filename,
+        "suggested_table": plan.get("suggested_table"),
+        "column_mapping": plan.get("column_mapping"),
+        "plan_source": plan["source"],
+        "plan_confidence": plan["confidence"],
+        "profile": profile,
+    })
+
 @app.route('/api/execute-upload', methods=['POST'])
 def execute_upload():
     """
@@ -176,220 +478,174 @@ def execute_upload():
             column_mapping=column_mapping
         )
 
-        if success:
-            # Clean up the temp file after successful upload
-            os.remove(filepath)
-            return jsonify({"message": f"Successfully uploaded data to {table_name}."})
-        else:
+        if not success:
             return jsonify({"error": message}), 500
+        # Clean up the temp file after successful upload
+        os.remove(filepath)
+        if not message:
+            return jsonify({"message": f"Successfully uploaded data to {table_name}."})
+        summary = _public_load_summary(message)
+        text = f"Successfully uploaded {summary['rowsLoaded']:,} rows to {table_name}."
+        if summary.get("rejectedReport"):
+            text += f" {summary['rowsRejected']:,} row(s) could not be converted and were skipped."
+        return jsonify({"message": text, "load": summary})
+
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred during upload: {str(e)}"}), 500
+
+def _public_load_summary(summary: dict):
+    """A load summary with the rejected-rows report as a name for /api/upload-rejects instead of a server path."""
+    public = {key: value for key, value in summary.items() if key != "report"}
+    if summary.get("report"):
+        public["rejectedReport"] = os.path.basename(summary["report"])
+    return public
+
+@app.route('/api/execute-upload-batch', methods=['POST'])
+def execute_upload_batch():
+    """
+    Uploads many confirmed files in one request: all files share one connection
+    and stage, and each target table is loaded once (raw CSV files once per
+    table and header layout). Body: {"files": [...]} where
+    each entry is a filename or {filename, suggested_table, column_mapping};
+    top-level suggested_table / column_mapping are the plan shared by the rest.
+    Returns one result per file, in order.
+    """
+    data = request.json or {}
+    schema_name = os.getenv("SNOWFLAKE_SCHEMA")
+    files = data.get('files') or []
+    if not files or not schema_name:
+        return jsonify({"error": "Missing data for upload execution."}), 400
+
+    uploads, missing = [], []
+    for entry in files:
+        entry = {"filename": entry} if isinstance(entry, str) else entry
+        upload = {
+            "filename": entry.get('filename'),
+            "table_name": entry.get('suggested_table') or data.get('suggested_table'),
+            "column_mapping": entry.get('column_mapping') or data.get('column_mapping'),
+        }
+        if not all(upload.values()):
+            return jsonify({"error": f"Missing plan for {upload['filename'] or 'a file'}."}), 400
+        upload["file_path"] = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(upload["filename"]))
+        if not os.path.exists(upload["file_path"]):
+            missing.append(upload["filename"])
+        uploads.append(upload)
+    if missing:
+        return jsonify({"error": f"File(s) not found on server: {', '.join(missing)}"}), 404
+    if len({upload["file_path"] for upload in uploads}) < len(uploads):
+        return jsonify({"error": "Each file can only appear once in a batch."}), 400
 
+    try:
+        with span("upload.batch", files=len(uploads)):
+            results = smart_upload_batch(uploads, schema_name)
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred during upload: {str(e)}"}), 500
 
+    response = []
+    for upload, result in zip(uploads, results):
+        if result["status"] == "loaded":
+            # Clean up the temp file after successful upload; failed files stay for a retry
+            os.remove(upload["file_path"])
+        response.append({"filename": upload["filename"], **_public_load_summary(result)})
+    loaded = [result for result in response if result["status"] == "loaded"]
+    rows = sum(result["rowsLoaded"] or 0 for result in loaded)
+    message = f"Uploaded {rows:,} rows from {len(loaded)} of {len(response)} file(s)."
+    if not loaded:
+        return jsonify({"error": message, "results": response}), 500
+    return jsonify({"message": message, "results": response})
+
+@app.route('/api/upload-rejects/<path:filename>', methods=['GET'])
+def get_upload_rejects(filename):
+    """
+    Downloads the rejected-rows report of an upload (the `rejectedReport` of its
+    load summary) until AURA_REJECTS_RETENTION_SECONDS have passed.
+    """
+    filename = secure_filename(filename)
+    if not filename.endswith(".rejected.csv"):
+        return jsonify({"error": "Not a rejected-rows report."}), 404
+    purge_expired_reports()
+    return send_from_directory(os.path.abspath(REJECTS_DIR), filename, as_attachment=True)
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Endpoint to inspect backend runtime metrics (connection pool, etc.)."""
+    return jsonify({
+        "warehouse": get_warehouse().stats(),
+        "snowflakePool": pool_stats(),
+        "schemaCatalog": schema_catalog_stats(),
+        "resultCache": result_cache_stats(),
+        "answerCache": answer_cache_stats(),
+        "intentRouter": router_stats(),
+        "llm": llm_stats(),
+        "jobQueue": get_job_queue().stats(),
+        "payloadCache": payload_cache_stats(),
+        "snapshot": snapshot_stats(),
+        "uploadMapping": mapping_stats(),
+        "dashboardWidgets": widget_stats()
+    })
+
+# Point-in-time values read on every scrape
+register_gauge("aura_snowflake_pool_connections", "Snowflake connections in this worker by state.",
+               lambda: {(("state", "in_use"),): pool_stats()["in_use"], (("state", "idle"),): pool_stats()["idle"]})
+register_gauge("aura_llm_waiting_requests", "LLM calls waiting for a rate-limit slot.",
+               lambda: llm_stats()["scheduler"]["waiting"])
+register_gauge("aura_job_queue_pending", "Background investigations queued or running in this worker.",
+               lambda: get_job_queue().stats()["pendingInThisWorker"])
+register_gauge("aura_snapshot_age_seconds", "Age of the local Parquet snapshot (-1 if there is none).",
+               lambda: snapshot_stats().get("ageSeconds") or -1)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: stage latency histograms, counters and gauges for this worker."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 # We will add another endpoint here later for executing the upload after user confirmation.
 # We will also add endpoints for the dashboard later.
 
-@app.route('/api/dashboard-data', methods=['GET'])
-def get_dashboard_data():
-    """Endpoint to fetch all data needed for the main dashboard."""
+def _compute_dashboard_data():
+    """Runs the dashboard widgets concurrently and builds the payload."""
+    return run_widgets("dashboard", DASHBOARD_WIDGETS, _mock_dashboard_data)
+
+def _compute_analytics_data():
+    """Runs the analytics scan (see dashboard_queries.py) and builds the payload."""
+    return run_widgets("analytics", ANALYTICS_WIDGETS, _mock_analytics_data)
+
+# --- Materialized Dashboard Payloads ---
+# Both pages are served from memory; a background refresher recomputes them on a
+# schedule and right after uploads, so warehouse load no longer follows traffic.
+
+DASHBOARD_PAYLOAD = materialized_payload("dashboard-data", _compute_dashboard_data)
+ANALYTICS_PAYLOAD = materialized_payload("analytics-data", _compute_analytics_data)
+
+def _serve_materialized(payload, mock_fn, label: str):
+    """Serves a materialized payload with ETag/Last-Modified, falling back to mock data."""
     # Serve mock data when DB is unavailable or mock mode enabled
     if USE_MOCK_DATA or not DB_SCHEMA:
-        return jsonify(_mock_dashboard_data())
+        return jsonify(mock_fn())
 
-    conn = None
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"),
-            password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"),
-            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"),
-            schema=os.getenv("SNOWFLAKE_SCHEMA")
-        )
-        cur = conn.cursor()
-
-        # Query 1: Total Revenue (7D)
-        cur.execute("""
-            SELECT SUM(NET_SALES) 
-            FROM FACT_SALES_DAILY
-            WHERE DATE_KEY IN (SELECT DATE_KEY FROM DIM_DATE WHERE D_DATE >= DATEADD(day, -7, CURRENT_DATE()));
-        """)
-        total_revenue = cur.fetchone()[0]
-
-        # Query 2: Units Sold (7D)
-        cur.execute("""
-            SELECT SUM(QTY_SOLD)
-            FROM FACT_SALES_DAILY
-            WHERE DATE_KEY IN (SELECT DATE_KEY FROM DIM_DATE WHERE D_DATE >= DATEADD(day, -7, CURRENT_DATE()));
-        """)
-        units_sold = cur.fetchone()[0]
-
-        # Query 3: Top Product (All Time by units sold)
-        cur.execute("""
-            SELECT P.PRODUCT_NAME
-            FROM FACT_SALES_DAILY S
-            JOIN DIM_PRODUCT P ON S.PRODUCT_KEY = P.PRODUCT_KEY
-            GROUP BY P.PRODUCT_NAME
-            ORDER BY SUM(S.QTY_SOLD) DESC
-            LIMIT 1;
-        """)
-        top_product = cur.fetchone()[0]
-
-        # Query 4: Recent Sales Activity (Last 5 transactions)
-        cur.execute("""
-            SELECT P.PRODUCT_NAME, S.QTY_SOLD, ST.STORE_NAME, S.NET_SALES
-            FROM FACT_SALES_DAILY S
-            JOIN DIM_PRODUCT P ON S.PRODUCT_KEY = P.PRODUCT_KEY
-            JOIN DIM_STORE ST ON S.STORE_KEY = ST.STORE_KEY
-            ORDER BY S.LOAD_TS DESC
-            LIMIT 5;
-        """)
-        recent_sales_raw = cur.fetchall()
-        recent_sales = [
-            {
-                "text": f"{row[0]} sold {int(row[1])} units at {row[2]}",
-                "value": f"${row[3]:.2f}"
-            } for row in recent_sales_raw
-        ]
-
-        # NOTE: Avg Profit Margin is complex without cost data. We'll use a placeholder.
-        avg_profit_margin = "96.7%"
-
-        dashboard_data = {
-            "totalRevenue": f"${total_revenue:,.2f}",
-            "unitsSold": f"{int(units_sold):,}",
-            "avgProfitMargin": avg_profit_margin,
-            "topProduct": top_product,
-            "recentSales": recent_sales
-        }
-        
-        return jsonify(dashboard_data)
-
+        entry = payload.get()
     except Exception as e:
-        print(f"Error fetching dashboard data: {e}")
+        print(f"Error fetching {label} data: {e}")
         # Fallback to mock data so frontend remains usable
-        return jsonify(_mock_dashboard_data()), 200
-    finally:
-        if conn:
-            conn.close()
+        return jsonify(mock_fn()), 200
+
+    response = jsonify(entry["payload"])
+    response.set_etag(entry["etag"])
+    response.last_modified = datetime.fromtimestamp(entry["computed_at"], tz=timezone.utc)
+    # Browsers must revalidate, which costs a 304 at most
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/dashboard-data', methods=['GET'])
+def get_dashboard_data():
+    """Endpoint to fetch all data needed for the main dashboard."""
+    return _serve_materialized(DASHBOARD_PAYLOAD, _mock_dashboard_data, "dashboard")
 
 @app.route('/api/analytics-data', methods=['GET'])
 def get_analytics_data():
     """Endpoint to fetch visualization data for analytics page."""
-    # Serve mock data when DB is unavailable or mock mode enabled
-    if USE_MOCK_DATA or not DB_SCHEMA:
-        return jsonify(_mock_analytics_data())
-
-    conn = None
-    try:
-        conn = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"),
-            password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"),
-            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"),
-            schema=os.getenv("SNOWFLAKE_SCHEMA")
-        )
-        cur = conn.cursor()
-
-        # Query 1: Sales Trend (Last 30 Days)
-        cur.execute("""
-            SELECT 
-                TO_CHAR(D.D_DATE, 'MM-DD') as date,
-                SUM(F.NET_SALES) as sales
-            FROM FACT_SALES_DAILY F
-            JOIN DIM_DATE D ON F.DATE_KEY = D.DATE_KEY
-            WHERE D.D_DATE >= DATEADD(day, -30, CURRENT_DATE())
-            GROUP BY D.D_DATE
-            ORDER BY D.D_DATE;
-        """)
-        sales_trend = [{"date": row[0], "sales": float(row[1]) if row[1] else 0} for row in cur.fetchall()]
-
-        # Query 2: Top Products by Revenue
-        cur.execute("""
-            SELECT 
-                P.PRODUCT_NAME as name,
-                SUM(F.NET_SALES) as value
-            FROM FACT_SALES_DAILY F
-            JOIN DIM_PRODUCT P ON F.PRODUCT_KEY = P.PRODUCT_KEY
-            GROUP BY P.PRODUCT_NAME
-            ORDER BY value DESC
-            LIMIT 5;
-        """)
-        top_products = [{"name": row[0], "value": float(row[1]) if row[1] else 0} for row in cur.fetchall()]
-
-        # Query 3: Store Performance
-        cur.execute("""
-            SELECT 
-                S.STORE_NAME as store,
-                SUM(F.NET_SALES) as revenue
-            FROM FACT_SALES_DAILY F
-            JOIN DIM_STORE S ON F.STORE_KEY = S.STORE_KEY
-            GROUP BY S.STORE_NAME
-            ORDER BY revenue DESC
-            LIMIT 10;
-        """)
-        store_performance = [{"store": row[0], "revenue": float(row[1]) if row[1] else 0} for row in cur.fetchall()]
-
-        # Query 4: Daily Sales Volume (Last 30 Days) - Using as alternative to spoilage
-        cur.execute("""
-            SELECT 
-                TO_CHAR(D.D_DATE, 'MM-DD') as date,
-                SUM(F.QTY_SOLD) as quantity,
-                SUM(F.NET_SALES) as value
-            FROM FACT_SALES_DAILY F
-            JOIN DIM_DATE D ON F.DATE_KEY = D.DATE_KEY
-            WHERE D.D_DATE >= DATEADD(day, -30, CURRENT_DATE())
-            GROUP BY D.D_DATE
-            ORDER BY D.D_DATE;
-        """)
-        spoilage_data = [{"date": row[0], "quantity": float(row[1]) if row[1] else 0, "value": float(row[2]) if row[2] else 0} for row in cur.fetchall()]
-
-        # Query 5: Category Sales Comparison (Top Products as Categories)
-        cur.execute("""
-            SELECT 
-                P.PRODUCT_NAME as category,
-                SUM(F.NET_SALES) as sales
-            FROM FACT_SALES_DAILY F
-            JOIN DIM_PRODUCT P ON F.PRODUCT_KEY = P.PRODUCT_KEY
-            GROUP BY P.PRODUCT_NAME
-            ORDER BY sales DESC
-            LIMIT 8;
-        """)
-        category_comparison = [{"category": row[0] if row[0] else "Unknown", "sales": float(row[1]) if row[1] else 0} for row in cur.fetchall()]
-
-        # Query 6: Promotion Effectiveness (Promo vs No Promo by Store)
-        cur.execute("""
-            SELECT 
-                S.STORE_NAME as promotion,
-                SUM(CASE WHEN F.PROMO_KEY > 0 THEN F.NET_SALES ELSE 0 END) as withPromo,
-                SUM(CASE WHEN F.PROMO_KEY = 0 OR F.PROMO_KEY IS NULL THEN F.NET_SALES ELSE 0 END) as withoutPromo
-            FROM FACT_SALES_DAILY F
-            JOIN DIM_STORE S ON F.STORE_KEY = S.STORE_KEY
-            GROUP BY S.STORE_NAME
-            ORDER BY withPromo DESC
-            LIMIT 5;
-        """)
-        promotion_effectiveness = [{"promotion": row[0], "withPromo": float(row[1]) if row[1] else 0, "withoutPromo": float(row[2]) if row[2] else 0} for row in cur.fetchall()]
-
-        analytics_data = {
-            "salesTrend": sales_trend,
-            "topProducts": top_products,
-            "storePerformance": store_performance,
-            "spoilageData": spoilage_data,
-            "categoryComparison": category_comparison,
-            "promotionEffectiveness": promotion_effectiveness
-        }
-        
-        return jsonify(analytics_data)
-
-    except Exception as e:
-        print(f"Error fetching analytics data: {e}")
-        # Fallback to mock data so frontend remains usable
-        return jsonify(_mock_analytics_data()), 200
-    finally:
-        if conn:
-            conn.close()
+    return _serve_materialized(ANALYTICS_PAYLOAD, _mock_analytics_data, "analytics")
 
 # --- Main Execution ---
 if __name__ == '__main__':
@@ -1,67 +1,171 @@
 import os
 import json
 import time
-import google.generativeai as genai
-import snowflake.connector
-from dotenv import load_dotenv
+import queue
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, Future
 from database_connector import get_schema_for_agent
+from connection_pool import get_connection
+from warehouse import get_warehouse
+from result_cache import get_cached_result, cache_result
+from result_fetcher import limit_query, fetch_bounded, format_result
+from snapshot_store import get_snapshot_store
+from observation_digest import build_observation_context
+from intent_router import classify_intent
+from schema_pruner import prune_schema
+from llm_client import generate as generate_llm
+from telemetry import span, increment
+
+# Max number of plan steps (SQL generation + query) run at the same time; 1 = sequential
+AGENT_PARALLELISM = int(os.getenv("AURA_AGENT_PARALLELISM", "4"))
+# Threads shared by the plan steps of every investigation in this worker
+AGENT_POOL_SIZE = int(os.getenv("AURA_AGENT_POOL_SIZE", str(4 * AGENT_PARALLELISM)))
+# Generate SQL for every plan step in a single model call instead of one call per step
+BATCH_SQL_GENERATION = os.getenv("AURA_BATCH_SQL", "1") == "1"
+
+# Returned when an investigation gathers no observations at all
+NO_DATA_ANSWER = "I apologize, but I'm unable to find relevant data to answer your question. The question may be outside the scope of our available data, or there might be an issue with the data connection. Please try rephrasing your question or ask about sales, inventory, or product data that should be available in our system."
+
+_step_pool = ThreadPoolExecutor(max_workers=max(1, AGENT_POOL_SIZE), thread_name_prefix="aura-agent")
 
 # --- Reusable Tools for the Agent ---
 
+class StepCancellation:
+    """
+    Stops one investigation's outstanding steps: steps check `is_set()` before
+    their model call and their query, and queries already running on the
+    warehouse are cancelled there.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._running = set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    @contextmanager
+    def running(self, conn):
+        """Marks `conn` as executing a step's query until the block exits."""
+        with self._lock:
+            if self._event.is_set():
+                raise InvestigationCancelled()
+            self._running.add(conn)
+        try:
+            yield conn
+        finally:
+            # Waits for an in-progress cancel, so it never reaches a connection already back in the pool
+            with self._lock:
+                self._running.discard(conn)
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            running = list(self._running)
+            for conn in running:
+                try:
+                    get_warehouse().cancel_query(conn)
+                except Exception as e:
+                    print(f"[Aura's Brain] Could not cancel a running query: {e}")
+        if running:
+            print(f"[Aura's Brain] Cancelled {len(running)} running query(ies).")
+
+def _fetch_query(conn, sql_query: str, stage: str):
+    with conn.cursor() as cur, span(stage) as query_span:
+        cur.execute(limit_query(sql_query))
+        result = fetch_bounded(cur)
+        query_span.set(queryId=getattr(cur, "sfqid", None), rows=len(result["rows"]),
+                       bytes=result["bytes"], truncated=result["truncated"])
+    return result
+
+def run_snowflake_query(sql_query: str, cancellation: StepCancellation = None):
+    """
+    Executes a query with a bounded fetch and returns {"columns", "rows", "truncated"}.
+    Results are served from and stored in the result cache. Queries that only read
+    tables of a fresh local snapshot run there first. Raises on query errors; a
+    warehouse query can be stopped through `cancellation`.
+    """
+    cached = get_cached_result(sql_query)
+    if isinstance(cached, dict):
+        print("[Result Cache] Serving query result from cache.")
+        return cached
+
+    result = None
+    snapshot = get_snapshot_store()
+    if snapshot is not None and snapshot.serves_query(sql_query):
+        try:
+            with snapshot.connection() as conn:
+                result = _fetch_query(conn, sql_query, "snapshot.query")
+            snapshot.record_route(local=True)
+            increment("aura_snapshot_queries_total", 1, "Agent queries by where they ran.", route="snapshot")
+        except Exception as e:
+            # Snowflake-only syntax and the like: the warehouse still has the answer
+            print(f"[Snapshot] Local query failed, running it on the warehouse: {e}")
+            snapshot.record_route(local=False)
+            increment("aura_snapshot_queries_total", 1, "Agent queries by where they ran.", route="fallback")
+
+    if result is None:
+        with get_connection() as conn, (cancellation.running(conn) if cancellation else nullcontext()):
+            result = _fetch_query(conn, sql_query, "snowflake.query")
+        increment("aura_snowflake_rows_total", len(result["rows"]), "Rows fetched by agent queries.")
+        increment("aura_snowflake_bytes_total", result["bytes"], "Rendered bytes fetched by agent queries.")
+    if result["truncated"]:
+        print(f"[Result Fetch] Result truncated at {len(result['rows'])} rows ({result['truncated']} limit).")
+    cache_result(sql_query, result)
+    return result
+
 def execute_snowflake_query(sql_query: str):
     """A tool to execute a SQL query on Snowflake and return results."""
-    # ... (code is unchanged from previous version)
-    load_dotenv()
-    conn = None
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"),
-            password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"),
-            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"),
-            schema=os.getenv("SNOWFLAKE_SCHEMA")
-        )
-        cur = conn.cursor()
-        cur.execute(sql_query)
-        columns = [desc[0] for desc in cur.description]
-        results = cur.fetchall()
-        
-        if not results:
-            return "Query returned no results."
-        
-        formatted_results = " | ".join(columns) + "\n"
-        for row in results:
-            formatted_results += " | ".join(map(str, row)) + "\n"
-        return formatted_results
+        return format_result(run_snowflake_query(sql_query))
 
     except Exception as e:
         print(f"Error executing query: {e}")
         return f"Error: Could not execute query. {e}"
-    finally:
-        if conn:
-            conn.close()
 
-def text_to_sql_tool(question: str, db_schema: str, chat_history: list):
-    """A tool that takes a natural language question and returns structured data from the database."""
+def text_to_sql_result(question: str, db_schema: str, chat_history: list, sql_query: str = None,
+                       cancellation: StepCancellation = None):
+    """
+    Like text_to_sql_tool, but returns (observation, result) where `result` is the
+    fetched {"columns", "rows", "truncated"} dict, or None if no data was returned.
+    Once `cancellation` is set, the model call and the query are skipped.
+    """
     print(f"\n[Tool Activated: Text-to-SQL] Answering sub-question: '{question}'")
     
-    sql_query = generate_sql_query(question, db_schema, chat_history)
     if not sql_query:
-        return "Error: Could not generate a valid SQL query."
+        if cancellation is not None and cancellation.is_set():
+            return "Error: Investigation stopped before this step ran.", None
+        sql_query = generate_sql_query(question, db_schema, chat_history)
+    if not sql_query:
+        return "Error: Could not generate a valid SQL query.", None
     print(f"Generated SQL:\n{sql_query}\n")
 
-    results = execute_snowflake_query(sql_query)
-    return results
+    if cancellation is not None and cancellation.is_set():
+        return "Error: Investigation stopped before this step ran.", None
+    try:
+        result = run_snowflake_query(sql_query, cancellation)
+    except Exception as e:
+        print(f"Error executing query: {e}")
+        return f"Error: Could not execute query. {e}", None
+    return format_result(result), result
+
+def text_to_sql_tool(question: str, db_schema: str, chat_history: list, sql_query: str = None):
+    """
+    A tool that takes a natural language question and returns structured data from the database.
+    If `sql_query` was already generated (e.g. by the batched generator) it is used as-is.
+    """
+    return text_to_sql_result(question, db_schema, chat_history, sql_query)[0]
 
 # --- Core Gemini Functions (Prompts) ---
 
 def generate_sql_query(user_question: str, db_schema: str, chat_history: list):
     """Uses Gemini to generate a SQL query from a user question."""
-    load_dotenv()
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-2.5-flash-lite')
     formatted_history = format_chat_history(chat_history)
+    # Only the tables relevant to this question (and its follow-up context) go into the prompt
+    db_schema = prune_schema(db_schema, f"{user_question}\n{formatted_history}")
 
     prompt = f"""
     You are an expert Snowflake SQL data analyst. Your task is to write a single, valid Snowflake SQL query.
@@ -97,17 +201,106 @@ def generate_sql_query(user_question: str, db_schema: str, chat_history: list):
     **SQL Query:**
     """
     try:
-        response = model.generate_content(prompt)
-        sql_query = response.text.strip()
-        if sql_query.lower().startswith("```sql"):
-            sql_query = sql_query[5:-3].strip()
-        if sql_query.startswith('l'):
-            sql_query = sql_query[1:]
-        return sql_query.lstrip()
+        response = generate_llm(prompt, purpose="sql")
+        return _clean_sql_response(response.text)
     except Exception as e:
         print(f"Error generating SQL query: {e}")
         return None
 
+def generate_sql_queries(sub_questions: list, db_schema: str, chat_history: list):
+    """
+    Uses a single Gemini call to generate one SQL query per sub-question.
+    Returns a list aligned with `sub_questions`; entries the model left out or
+    returned malformed are None so the caller can fall back to `generate_sql_query`.
+    """
+    if not sub_questions:
+        return []
+
+    formatted_history = format_chat_history(chat_history)
+    numbered_questions = "\n".join(f"{i}. {q}" for i, q in enumerate(sub_questions, 1))
+    db_schema = prune_schema(db_schema, f"{numbered_questions}\n{formatted_history}")
+
+    prompt = f"""
+    You are an expert Snowflake SQL data analyst. Your task is to write one single, valid Snowflake SQL query for EACH numbered question below.
+    
+    **CONTEXT AWARENESS:**
+    Use the conversation history to understand context for follow-up questions. For example:
+    - If the user asks "what about last week?" after asking about "this week", apply the same analysis to last week
+    - If they ask "how about the other products?" after asking about a specific product, analyze all other products
+    - If they ask "what's the trend?" after asking about sales, show the trend over time
+    - Pronouns like "it", "that", "them" refer to the most recently discussed items
+
+    **IMPORTANT DATABASE NOTES:**
+    - The DIM_DATE table has duplicate DATE_KEY entries (each date appears 3 times)
+    - Use DISTINCT when selecting DATE_KEY from DIM_DATE to avoid "Single-row subquery returns more than one row" errors
+    - The data is from July 2025 to October 2025 (test data)
+    - Use NET_SALES for revenue calculations (not GROSS_SALES)
+    - Always use proper JOINs between tables
+    - Each query must answer its own question independently
+
+    **Database Schema:**
+    ---
+    {db_schema}
+    ---
+
+    **Previous Conversation:**
+    ---
+    {formatted_history if formatted_history else "No previous conversation."}
+    ---
+
+    **Questions:**
+    ---
+    {numbered_questions}
+    ---
+
+    Your response MUST be a JSON array with one object per question, in the same order, each with the keys
+    "step" (the question number) and "sql" (the raw SQL query, without markdown or explanation).
+
+    **JSON Response:**
+    """
+    sql_queries = [None] * len(sub_questions)
+    try:
+        response = generate_llm(prompt, purpose="sql_batch")
+        # Slice out the array itself so fences inside the SQL strings survive
+        text = response.text
+        entries = json.loads(text[text.index("["):text.rindex("]") + 1])
+        if not isinstance(entries, list):
+            raise ValueError("expected a JSON array")
+    except Exception as e:
+        print(f"Error generating batched SQL queries: {e}. Falling back to per-question generation.")
+        return sql_queries
+
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        step = entry.get("step")
+        index = step - 1 if isinstance(step, int) else position
+        if not 0 <= index < len(sub_questions) or sql_queries[index] is not None:
+            continue
+        sql_query = entry.get("sql")
+        if isinstance(sql_query, str):
+            sql_query = _clean_sql_response(sql_query)
+            if _looks_like_sql(sql_query):
+                sql_queries[index] = sql_query
+
+    missing = sum(1 for q in sql_queries if q is None)
+    print(f"Batched SQL generation produced {len(sub_questions) - missing}/{len(sub_questions)} queries.")
+    return sql_queries
+
+def _clean_sql_response(text: str):
+    """Strips markdown fences and stray leading characters from a model-generated query."""
+    sql_query = text.strip()
+    if sql_query.lower().startswith("```sql"):
+        sql_query = sql_query[5:-3].strip()
+    if sql_query.startswith('l'):
+        sql_query = sql_query[1:]
+    return sql_query.lstrip()
+
+def _looks_like_sql(sql_query: str):
+    """Cheap sanity check that a generated query is a single read statement."""
+    first_word = sql_query.split(None, 1)[0].upper() if sql_query else ""
+    return first_word in ("SELECT", "WITH")
+
 def format_chat_history(chat_history: list):
     """Helper to format chat history for the prompt."""
     if not chat_history:
@@ -139,9 +332,16 @@ def route_user_question(user_question: str, db_schema: str):
     """
     print("\n[Aura's Router] Classifying user intent...")
     
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-2.5-flash-lite')
+    # Greetings and questions that plainly name our data never need the model
+    with span("router.fast_path") as route_span:
+        intent, tier = classify_intent(user_question, db_schema)
+        route_span.set(tier=tier, intent=intent)
+    if intent:
+        print(f"Detected Intent: {intent} (fast path: {tier})")
+        return intent
     
+    db_schema = prune_schema(db_schema, user_question)
+
     router_prompt = f"""
     You are an intent classification agent. Your job is to determine the user's intent.
     The user is talking to Aura, an Autonomous Retail Intelligence Agent that answers questions by querying a Snowflake database.
@@ -173,7 +373,7 @@ def route_user_question(user_question: str, db_schema: str):
     """
     
     try:
-        response = model.generate_content(router_prompt)
+        response = generate_llm(router_prompt, purpose="router")
         json_text = response.text.strip().replace("```json", "").replace("```", "")
         intent_data = json.loads(json_text)
         intent = intent_data.get("intent")
@@ -185,17 +385,128 @@ def route_user_question(user_question: str, db_schema: str):
 
 # --- The Main Agent "Brain" ---
 
-def run_agentic_flow(user_question: str, db_schema: str, chat_history: list):
+def _observation_status(observation: str):
+    """Classifies a tool observation as ok/empty/error and counts its data rows."""
+    if "Error:" in observation:
+        return "error", 0
+    if "Query returned no results." in observation:
+        return "empty", 0
+    lines = observation.strip().splitlines()[1:]
+    return "ok", sum(1 for line in lines if not line.startswith("[Truncated"))
+
+def _run_plan_step(step: int, question: str, db_schema: str, chat_history: list, sql_query: str, events,
+                   cancellation: StepCancellation):
+    """Runs one plan step on a worker thread and reports its progress on `events`."""
+    events.put(("step_start", {"step": step, "question": question}))
+    step_start = time.time()
+    with span("agent.step", step=step) as step_span:
+        observation, result = text_to_sql_result(question, db_schema, chat_history, sql_query, cancellation)
+        status, rows = _observation_status(observation)
+        step_span.set(status=status, rows=rows)
+    events.put(("step_finish", {
+        "step": step,
+        "question": question,
+        "status": status,
+        "rows": rows,
+        "seconds": round(time.time() - step_start, 3)
+    }))
+    return observation, result
+
+class InvestigationCancelled(Exception):
+    """Raised inside the agent loop when the caller asked to stop the investigation."""
+
+def _check_cancelled(should_cancel):
+    if should_cancel is not None and should_cancel():
+        print("[Aura's Brain] Investigation cancelled by the caller.")
+        raise InvestigationCancelled()
+
+def _start_steps(steps: list, events, cancellation: StepCancellation):
     """
-    The main agentic loop that thinks, acts, and synthesizes an answer.
+    Runs `steps` (argument tuples for _run_plan_step) on the shared pool, at most
+    AGENT_PARALLELISM at a time: each finished step starts the next one, so a
+    slow early step does not hold back the rest. Returns one future per step.
+    Steps not started when `cancellation` is set never run.
+    """
+    futures = [Future() for _ in steps]
+    pending = iter(zip(steps, futures))
+    lock = threading.Lock()
+    context = contextvars.copy_context()
+
+    def _run(step, future):
+        try:
+            if cancellation.is_set():
+                raise InvestigationCancelled()
+            future.set_result(context.copy().run(_run_plan_step, *step, events, cancellation))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            _launch_next()
+
+    def _launch_next():
+        with lock:
+            item = None if cancellation.is_set() else next(pending, None)
+        if item is not None:
+            # Each step runs in a copy of this context so it keeps the caller's LLM priority
+            _step_pool.submit(_run, *item)
+
+    for _ in range(max(1, AGENT_PARALLELISM)):
+        _launch_next()
+    return futures
+
+def _await_step(future, deadline: float, events, should_cancel=None):
+    """
+    Yields progress events from all in-flight steps until `future` is done.
+    Returns the step's (observation, result), or None if the deadline passed first.
+    """
+    while not future.done():
+        _check_cancelled(should_cancel)
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        try:
+            yield events.get(timeout=min(0.25, remaining))
+        except queue.Empty:
+            pass
+    while True:
+        try:
+            yield events.get_nowait()
+        except queue.Empty:
+            break
+    try:
+        return future.result()
+    except Exception as e:
+        return f"Error: Could not answer sub-question. {e}", None
+
+def run_agentic_flow(user_question: str, db_schema: str, chat_history: list,
+                     max_execution_time: float = 60, should_cancel=None):
+    """
+    The main agentic loop that thinks, acts, and synthesizes an answer. Returns
+    the final answer event: {"response", "grounded"}, where grounded is False when
+    every plan step failed. `should_cancel` is polled between stages; when it
+    returns True the loop raises InvestigationCancelled.
+    """
+    answer = {"response": NO_DATA_ANSWER, "grounded": False}
+    for event, data in iter_agentic_flow(user_question, db_schema, chat_history,
+                                         max_execution_time=max_execution_time, should_cancel=should_cancel):
+        if event == "answer":
+            answer = data
+    return answer
+
+def iter_agentic_flow(user_question: str, db_schema: str, chat_history: list, stream_synthesis: bool = False,
+                      max_execution_time: float = 60, should_cancel=None):
+    """
+    Generator version of run_agentic_flow that yields (event, data) progress tuples:
+    plan, step_start, step_finish, synthesis_token (only with stream_synthesis) and
+    finally answer, whose "grounded" flag is False when every plan step failed.
     """
     print("\n[Aura's Brain] Starting new investigation...")
     start_time = time.time()
-    MAX_EXECUTION_TIME = 60  # 60 seconds timeout
+    MAX_EXECUTION_TIME = max_execution_time  # 60 seconds timeout by default
     
     print("[Aura's Brain] Step 1: Formulating an analysis plan...")
     
     formatted_history = format_chat_history(chat_history)
+    plan_schema = prune_schema(db_schema, f"{user_question}\n{formatted_history}")
     
     plan_prompt = f"""
     You are Aura, an Autonomous Retail Intelligence Agent. Your goal is to perform a comprehensive analysis.
@@ -222,7 +533,7 @@ def run_agentic_flow(user_question: str, db_schema: str, chat_history: list):
 
     **Database Schema:**
     ---
-    {db_schema}
+    {plan_schema}
     ---
     
     **Previous Conversation:**
@@ -233,59 +544,90 @@ def run_agentic_flow(user_question: str, db_schema: str, chat_history: list):
     **Analysis Plan:**
     """
     
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-2.5-flash-lite')
-    plan_response = model.generate_content(plan_prompt)
+    plan_response = generate_llm(plan_prompt, purpose="plan")
     analysis_plan = plan_response.text
     print(f"Analysis Plan:\n{analysis_plan}")
     
     print("\n[Aura's Brain] Step 2: Executing plan and gathering data...")
     
-    observations = ""
+    gathered = []  # (step, sub_question, observation, result)
     sub_questions = []
     failed_queries = 0
     max_failed_queries = 5  # Stop if too many queries fail
+    steps_with_data = 0  # steps whose query ran, even with no rows; an answer without any is not cached
     
     for line in analysis_plan.strip().split('\n'):
         line = line.strip()
         parts = line.split('.', 1)
         if len(parts) == 2 and parts[0].isdigit():
             sub_questions.append(parts[1].strip())
+    yield "plan", {"steps": sub_questions}
+    _check_cancelled(should_cancel)
     
-    for i, sub_q in enumerate(sub_questions, 1):
-        # Check timeout
-        if time.time() - start_time > MAX_EXECUTION_TIME:
-            print(f"[Aura's Brain] Timeout reached ({MAX_EXECUTION_TIME}s). Stopping execution.")
-            break
+    # One model call for the whole plan; steps it could not produce are generated individually
+    if BATCH_SQL_GENERATION and sub_questions:
+        planned_sql = generate_sql_queries(sub_questions, db_schema, chat_history)
+    else:
+        planned_sql = [None] * len(sub_questions)
+    
+    deadline = start_time + MAX_EXECUTION_TIME
+    events = queue.Queue()
+    cancellation = StepCancellation()
+    # Steps run concurrently; results are still consumed in plan order below
+    futures = _start_steps([(i, sub_q, db_schema, chat_history, sql_query)
+                            for i, (sub_q, sql_query) in enumerate(zip(sub_questions, planned_sql), 1)],
+                           events, cancellation)
+    
+    try:
+        for i, (sub_q, future) in enumerate(zip(sub_questions, futures), 1):
+            # Check if too many queries have failed
+            if failed_queries >= max_failed_queries:
+                print(f"[Aura's Brain] Too many failed queries ({failed_queries}). Stopping execution.")
+                break
             
-        # Check if too many queries have failed
-        if failed_queries >= max_failed_queries:
-            print(f"[Aura's Brain] Too many failed queries ({failed_queries}). Stopping execution.")
-            break
+            # Check timeout (the deadline is shared by all in-flight steps)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print(f"[Aura's Brain] Timeout reached ({MAX_EXECUTION_TIME}s). Stopping execution.")
+                break
             
-        observation = text_to_sql_tool(sub_q, db_schema, chat_history)
-        
-        # Check if query failed (be more lenient with "no results")
-        if "Error:" in observation:
-            failed_queries += 1
-            print(f"[Aura's Brain] Query {i} failed with error. Failed count: {failed_queries}")
-        elif "Query returned no results." in observation:
-            # Don't count "no results" as a failure - it might be expected for some queries
-            print(f"[Aura's Brain] Query {i} returned no results (not counted as failure)")
-        else:
-            failed_queries = 0  # Reset counter on successful query
+            step_output = yield from _await_step(future, deadline, events, should_cancel)
+            if step_output is None:
+                print(f"[Aura's Brain] Timeout reached ({MAX_EXECUTION_TIME}s) while waiting on query {i}. Stopping execution.")
+                break
+            observation, result = step_output
             
-        observations += f"Observation {i} (from question '{sub_q}'):\n{observation}\n\n"
+            # Check if query failed (be more lenient with "no results")
+            if "Error:" in observation:
+                failed_queries += 1
+                print(f"[Aura's Brain] Query {i} failed with error. Failed count: {failed_queries}")
+            elif "Query returned no results." in observation:
+                # Don't count "no results" as a failure - it might be expected for some queries
+                print(f"[Aura's Brain] Query {i} returned no results (not counted as failure)")
+                steps_with_data += 1
+            else:
+                failed_queries = 0  # Reset counter on successful query
+                steps_with_data += 1
+                
+            gathered.append((i, sub_q, observation, result))
+    finally:
+        # Steps not started yet never run, running ones skip their remaining model
+        # call or query, and queries already executing are cancelled on the warehouse
+        cancellation.cancel()
         
+    # Large results are reduced to digests so the prompt scales with the plan, not the rows
+    observations = build_observation_context(gathered)
     print(f"--- All Data Gathered ---\n{observations}")
 
     # Check if we have any meaningful data (be more lenient)
     if not observations.strip():
-        return "I apologize, but I'm unable to find relevant data to answer your question. The question may be outside the scope of our available data, or there might be an issue with the data connection. Please try rephrasing your question or ask about sales, inventory, or product data that should be available in our system."
+        yield "answer", {"response": NO_DATA_ANSWER, "grounded": False}
+        return
     elif failed_queries >= max_failed_queries:
         # Even if some queries failed, try to synthesize what we have
         print(f"[Aura's Brain] Some queries failed ({failed_queries}), but proceeding with available data...")
 
+    _check_cancelled(should_cancel)
     print("[Aura's Brain] Step 3: Synthesizing final answer...")
     
     # --- MODIFIED PROMPT: User-friendly, concise responses with context ---
@@ -325,8 +667,21 @@ def run_agentic_flow(user_question: str, db_schema: str, chat_history: list):
     **Example of BAD response:** "To determine this, I first identified the latest date in our date dimension as October 4, 2025. I then calculated the date one week prior..."
     """
     
-    final_answer_response = model.generate_content(synthesis_prompt)
-    return final_answer_response.text.strip()
+    if stream_synthesis:
+        answer_parts = []
+        for chunk in generate_llm(synthesis_prompt, purpose="synthesis", stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # chunk without text (e.g. only safety metadata)
+            if text:
+                answer_parts.append(text)
+                yield "synthesis_token", {"text": text}
+        final_answer = "".join(answer_parts).strip()
+    else:
+        final_answer_response = generate_llm(synthesis_prompt, purpose="synthesis")
+        final_answer = final_answer_response.text.strip()
+    yield "answer", {"response": final_answer, "grounded": steps_with_data > 0}
 
 
 def main():
@@ -353,7 +708,7 @@ def main():
         final_answer = ""
         
         if intent == 'data_query':
-            final_answer = run_agentic_flow(user_question, db_schema, chat_history)
+            final_answer = run_agentic_flow(user_question, db_schema, chat_history)["response"]
         elif intent == 'greeting':
             final_answer = "Hello! I'm Aura, your Autonomous Retail Intelligence Agent. How can I help you analyze our data today?"
         elif intent == 'off_topic':
@@ -0,0 +1,610 @@
+"""
+Offline benchmark for the Aura API.
+
+Runs the real Flask app against a local DuckDB copy of the retail mart filled with
+synthetic data and a deterministic stand-in for Gemini, then drives the endpoints
+with concurrent clients and reports latency percentiles and throughput:
+
+    python benchmark.py --scale 5 --concurrency 8 --duration 60
+    python benchmark.py --llm-latency 0.8 --json results.json
+    python benchmark.py --baseline results.json --tolerance 0.2   # exit 1 on p95 regressions
+
+No Snowflake or Gemini credentials or network access are needed. Everything runs in
+one process, so the numbers approximate a single gunicorn worker.
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import contextlib
+import tempfile
+import threading
+from types import SimpleNamespace
+
+# --- Benchmark Configuration ---
+
+# Fact rows per unit of --scale
+ROWS_PER_SCALE = 100_000
+# Days of history ending today, so the 7- and 30-day dashboard windows have data
+HISTORY_DAYS = 120
+PRODUCT_COUNT = 200
+STORE_COUNT = 25
+LOCAL_SCHEMA = "MART"
+
+DEFAULT_MIX = "chat=4,chat_stream=1,dashboard=3,analytics=2,upload_plan=1"
+
+CHAT_QUESTIONS = [
+    "What were total sales by store last week?",
+    "Which products sold the most units?",
+    "Show me the daily sales trend for the last month",
+    "How did promotions affect net sales?",
+    "What are the most recent sales?",
+    "Which product category brings in the most revenue?",
+    "Compare sales across our stores",
+    "What is our best selling product at the Princeton store?",
+    "How are avocado sales doing?",
+    "Are we growing compared to last month?",
+    "hi there!",
+    "thanks aura",
+]
+
+_PRODUCT_ITEMS = [
+    ("Milk", "Dairy"), ("Cheese", "Dairy"), ("Yogurt", "Dairy"), ("Butter", "Dairy"),
+    ("Avocado", "Produce"), ("Apples", "Produce"), ("Bananas", "Produce"), ("Spinach", "Produce"),
+    ("Bread", "Bakery"), ("Bagels", "Bakery"), ("Croissants", "Bakery"), ("Muffins", "Bakery"),
+    ("Coffee", "Beverages"), ("Orange Juice", "Beverages"), ("Sparkling Water", "Beverages"),
+    ("Rice", "Pantry"), ("Pasta", "Pantry"), ("Olive Oil", "Pantry"), ("Cereal", "Pantry"), ("Eggs", "Dairy"),
+]
+_PRODUCT_STYLES = ["Organic", "Fresh", "Classic", "Family Size", "Premium", "Store Brand", "Value", "Artisan", "Local", "Lite"]
+_STORE_CITIES = ["Princeton", "Trenton", "Newark", "Hoboken", "Camden", "Edison", "Paterson", "Clifton", "Passaic", "Bayonne"]
+_PROMOTIONS = [(0, "NONE"), (1, "BOGO"), (2, "10% OFF"), (3, "CLEARANCE"), (4, "LOYALTY")]
+
+
+# --- Local Warehouse (DuckDB) ---
+
+def seed_dataset(con, scale: float = 1.0, days: int = HISTORY_DAYS, seed: int = 7):
+    """
+    Creates FACT_SALES_DAILY, DIM_DATE, DIM_PRODUCT, DIM_STORE and DIM_PROMOTION in
+    the LOCAL_SCHEMA of a DuckDB connection. Values are derived from hashes of the
+    row number, so the same scale and seed always produce the same data.
+    """
+    import pandas as pd
+
+    rows = max(1, int(ROWS_PER_SCALE * scale))
+    rng = random.Random(seed)
+    products = pd.DataFrame([
+        {
+            "PRODUCT_KEY": key,
+            "PRODUCT_NAME": f"{_PRODUCT_STYLES[(key - 1) // len(_PRODUCT_ITEMS) % len(_PRODUCT_STYLES)]} {item}",
+            "CATEGORY": category,
+            "UNIT_PRICE": round(rng.uniform(0.99, 19.99), 2),
+        }
+        for key, (item, category) in ((k, _PRODUCT_ITEMS[(k - 1) % len(_PRODUCT_ITEMS)]) for k in range(1, PRODUCT_COUNT + 1))
+    ])
+    stores = pd.DataFrame([
+        {
+            "STORE_KEY": key,
+            "STORE_NAME": f"{_STORE_CITIES[(key - 1) % len(_STORE_CITIES)]} Store #{key}",
+            "CITY": _STORE_CITIES[(key - 1) % len(_STORE_CITIES)],
+            "STATE": "NJ",
+        }
+        for key in range(1, STORE_COUNT + 1)
+    ])
+    promotions = pd.DataFrame(_PROMOTIONS, columns=["PROMO_KEY", "PROMO_TYPE"])
+
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {LOCAL_SCHEMA}")
+    for table, frame in (("DIM_PRODUCT", products), ("DIM_STORE", stores), ("DIM_PROMOTION", promotions)):
+        con.register("seed_frame", frame)
+        con.execute(f"CREATE OR REPLACE TABLE {LOCAL_SCHEMA}.{table} AS SELECT * FROM seed_frame")
+        con.unregister("seed_frame")
+
+    # Like the production mart, every date appears three times in DIM_DATE
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {LOCAL_SCHEMA}.DIM_DATE AS
+        SELECT
+            CAST(strftime(D, '%Y%m%d') AS INTEGER) AS DATE_KEY,
+            D AS D_DATE,
+            year(D) AS D_YEAR,
+            month(D) AS D_MONTH,
+            dayname(D) AS D_DAY_NAME
+        FROM (SELECT CAST(CURRENT_DATE - CAST(i AS INTEGER) AS DATE) AS D FROM range({days}) t(i)), range(3) copies(c)
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {LOCAL_SCHEMA}.FACT_SALES_DAILY AS
+        SELECT
+            CAST(strftime(F.D, '%Y%m%d') AS INTEGER) AS DATE_KEY,
+            F.PRODUCT_KEY,
+            F.STORE_KEY,
+            F.PROMO_KEY,
+            F.QTY_SOLD,
+            CAST(F.QTY_SOLD * P.UNIT_PRICE AS DECIMAL(12, 2)) AS GROSS_SALES,
+            CAST(F.QTY_SOLD * P.UNIT_PRICE * CASE WHEN F.PROMO_KEY > 0 THEN 0.85 ELSE 1 END AS DECIMAL(12, 2)) AS NET_SALES,
+            CAST(F.D AS TIMESTAMP) + to_seconds(CAST(F.I % 86400 AS BIGINT)) AS LOAD_TS
+        FROM (
+            SELECT
+                i AS I,
+                CAST(CURRENT_DATE - CAST(hash(i, {seed}, 0) % {days} AS INTEGER) AS DATE) AS D,
+                1 + CAST(hash(i, {seed}, 1) % {PRODUCT_COUNT} AS INTEGER) AS PRODUCT_KEY,
+                1 + CAST(hash(i, {seed}, 2) % {STORE_COUNT} AS INTEGER) AS STORE_KEY,
+                CASE WHEN hash(i, {seed}, 3) % 5 = 0
+                     THEN 1 + CAST(hash(i, {seed}, 4) % {len(_PROMOTIONS) - 1} AS INTEGER) ELSE 0 END AS PROMO_KEY,
+                1 + CAST(hash(i, {seed}, 5) % 12 AS INTEGER) AS QTY_SOLD
+            FROM range({rows}) t(i)
+        ) F
+        JOIN {LOCAL_SCHEMA}.DIM_PRODUCT P ON F.PRODUCT_KEY = P.PRODUCT_KEY
+    """)
+    print(f"[Benchmark] Seeded {rows:,} fact rows over {days} days, {PRODUCT_COUNT} products and {STORE_COUNT} stores.")
+    return rows
+
+
+def open_local_warehouse(scale: float = 1.0, path: str = ":memory:"):
+    """Creates a DuckDB warehouse for LOCAL_SCHEMA and seeds it with synthetic data."""
+    from warehouse import DuckDBWarehouse
+
+    warehouse = DuckDBWarehouse(path, schema_name=LOCAL_SCHEMA, parquet_dir=None)
+    started = time.time()
+    con = warehouse.raw_connection()
+    try:
+        seed_dataset(con, scale)
+    finally:
+        con.close()
+    print(f"[Benchmark] Local warehouse ready in {time.time() - started:.1f}s.")
+    return warehouse
+
+
+# --- Deterministic LLM Stand-in ---
+
+# Canned queries for the synthetic mart; they run unchanged on Snowflake and DuckDB
+CANNED_SQL = [
+    """SELECT ST.STORE_NAME, SUM(F.NET_SALES) AS NET_SALES
+FROM FACT_SALES_DAILY F
+JOIN DIM_STORE ST ON F.STORE_KEY = ST.STORE_KEY
+WHERE F.DATE_KEY IN (SELECT DISTINCT DATE_KEY FROM DIM_DATE WHERE D_DATE >= DATEADD(day, -7, CURRENT_DATE()))
+GROUP BY ST.STORE_NAME
+ORDER BY NET_SALES DESC""",
+    """SELECT P.PRODUCT_NAME, SUM(F.QTY_SOLD) AS UNITS_SOLD
+FROM FACT_SALES_DAILY F
+JOIN DIM_PRODUCT P ON F.PRODUCT_KEY = P.PRODUCT_KEY
+GROUP BY P.PRODUCT_NAME
+ORDER BY UNITS_SOLD DESC
+LIMIT 10""",
+    """SELECT D.D_DATE, SUM(F.NET_SALES) AS NET_SALES
+FROM FACT_SALES_DAILY F
+JOIN (SELECT DISTINCT DATE_KEY, D_DATE FROM DIM_DATE) D ON F.DATE_KEY = D.DATE_KEY
+WHERE D.D_DATE >= DATEADD(day, -30, CURRENT_DATE())
+GROUP BY D.D_DATE
+ORDER BY D.D_DATE""",
+    """SELECT PR.PROMO_TYPE, SUM(F.NET_SALES) AS NET_SALES, SUM(F.QTY_SOLD) AS UNITS_SOLD
+FROM FACT_SALES_DAILY F
+LEFT JOIN DIM_PROMOTION PR ON F.PROMO_KEY = PR.PROMO_KEY
+GROUP BY PR.PROMO_TYPE""",
+    """SELECT F.DATE_KEY, P.PRODUCT_NAME, ST.STORE_NAME, F.QTY_SOLD, F.NET_SALES
+FROM FACT_SALES_DAILY F
+JOIN DIM_PRODUCT P ON F.PRODUCT_KEY = P.PRODUCT_KEY
+JOIN DIM_STORE ST ON F.STORE_KEY = ST.STORE_KEY
+ORDER BY F.LOAD_TS DESC""",
+    """SELECT P.CATEGORY, SUM(F.NET_SALES) AS NET_SALES
+FROM FACT_SALES_DAILY F
+JOIN DIM_PRODUCT P ON F.PRODUCT_KEY = P.PRODUCT_KEY
+GROUP BY P.CATEGORY
+ORDER BY NET_SALES DESC""",
+]
+
+CANNED_PLAN = [
+    "What were total net sales by store over the last 7 days?",
+    "Which 10 products sold the most units?",
+    "What is the daily net sales trend over the last 30 days?",
+    "How do net sales split between promotion types?",
+    "What are the most recently loaded sales?",
+    "Which product category has the highest net sales?",
+]
+
+CANNED_ANSWER = ("Net sales held steady over the last week, led by the Princeton store, and the top "
+                 "products by units were dairy and produce staples. Promotions accounted for about a "
+                 "fifth of revenue.")
+
+# Prompt markers, checked in order (the batched SQL prompt also contains the single-query wording)
+_PROMPT_KINDS = [
+    ("router", "intent classification agent"),
+    ("sql_batch", "for EACH numbered question"),
+    ("sql", "write a single, valid Snowflake SQL query"),
+    ("upload_plan", "intelligent data pipeline expert"),
+    ("plan", "**Analysis Plan:**"),
+    ("synthesis", "You have completed your investigation"),
+]
+
+
+def _pick(items, key: str):
+    return items[zlib.crc32(key.encode("utf-8")) % len(items)]
+
+
+class FakeModel:
+    """
+    Stands in for genai.GenerativeModel. Answers each prompt kind with canned output
+    chosen deterministically from the prompt text, after `latency` seconds (plus up to
+    `jitter`, seeded by the prompt) and `token_latency` per output token.
+    """
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, token_latency: float = 0.002, plan_steps: int = 4):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.plan_steps = plan_steps
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _kind(self, prompt: str):
+        for kind, marker in _PROMPT_KINDS:
+            if marker in prompt:
+                return kind
+        return "other"
+
+    def _respond(self, kind: str, prompt: str):
+        if kind == "router":
+            return json.dumps({"intent": "data_query"})
+        if kind == "plan":
+            start = zlib.crc32(prompt.encode("utf-8"))
+            steps = [CANNED_PLAN[(start + i) % len(CANNED_PLAN)] for i in range(self.plan_steps)]
+            return "\n".join(f"{i}. {step}" for i, step in enumerate(steps, 1))
+        if kind == "sql_batch":
+            section = prompt.split("**Questions:**", 1)[-1].split("**JSON Response:**", 1)[0]
+            questions = re.findall(r"^\s*(\d+)\.\s+(.+)$", section, re.MULTILINE)
+            return json.dumps([{"step": int(step), "sql": _pick(CANNED_SQL, question)} for step, question in questions])
+        if kind == "sql":
+            question = prompt.split("**User Question:**", 1)[-1]
+            return _pick(CANNED_SQL, question.strip())
+        if kind == "upload_plan":
+            return json.dumps(self._upload_plan(prompt))
+        return CANNED_ANSWER
+
+    @staticmethod
+    def _upload_plan(prompt: str):
+        tables = {}
+        for table, body in re.findall(r"Table `([^`]+)`:\n((?:\s*- .+\n)*)", prompt):
+            tables[table] = {col.upper() for col in re.findall(r"- (\S+) \(", body)}
+        csv_section = prompt.split("**CSV Columns:**", 1)[-1].split("---")[1]
+        csv_cols = [col.strip() for col in csv_section.split(",") if col.strip()]
+        best = max(tables, key=lambda t: sum(c.upper() in tables[t] for c in csv_cols), default=None)
+        mapping = {col: (col.upper() if best and col.upper() in tables[best] else None) for col in csv_cols}
+        return {"suggested_table": best, "column_mapping": mapping}
+
+    def _wait(self, prompt: str, text: str):
+        delay = self.latency + random.Random(zlib.crc32(prompt.encode("utf-8"))).uniform(0, self.jitter)
+        time.sleep(delay + self.token_latency * (len(text) // 4))
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        kind = self._kind(prompt)
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+        text = self._respond(kind, prompt)
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        if not stream:
+            self._wait(prompt, text)
+            return SimpleNamespace(text=text, usage_metadata=usage)
+        return self._stream(prompt, text, usage)
+
+    def _stream(self, prompt: str, text: str, usage):
+        words = text.split(" ")
+        time.sleep(self.latency)
+        for i, word in enumerate(words):
+            time.sleep(self.token_latency * max(1, len(word) // 4))
+            last = i == len(words) - 1
+            yield SimpleNamespace(text=word + ("" if last else " "), usage_metadata=usage if last else None)
+
+
+# --- Load Generator ---
+
+def percentile(sorted_values, pct: float):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(mix: str):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip():
+            weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def run_load(scenarios: dict, weights: dict, concurrency: int, duration: float, max_requests: int = 0, seed: int = 7):
+    """
+    Closed-loop load: `concurrency` threads each pick a weighted-random scenario,
+    call it and record the latency until `duration` seconds pass (or `max_requests`
+    calls were made). A scenario returns None or the seconds until its first event.
+    Returns {endpoint: [(seconds, ok)]}, the wall time and the first error per endpoint.
+    """
+    names = [name for name in weights if name in scenarios and weights[name] > 0]
+    if not names:
+        raise ValueError(f"No known endpoints in the mix; choose from {', '.join(scenarios)}.")
+    samples = {}
+    failures = {}
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.time() + duration
+
+    def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.time() < deadline:
+            with lock:
+                if max_requests and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+                sequence = issued[0]
+            name = rng.choices(names, weights=[weights[n] for n in names])[0]
+            started = time.time()
+            first_event = None
+            try:
+                first_event = scenarios[name](sequence)
+                ok = True
+            except Exception as e:
+                ok = False
+                with lock:
+                    failures.setdefault(name, f"{type(e).__name__}: {e}")
+            elapsed = time.time() - started
+            with lock:
+                samples.setdefault(name, []).append((elapsed, ok))
+                if first_event is not None:
+                    samples.setdefault(f"{name} (first event)", []).append((first_event, ok))
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"bench-{i}", daemon=True) for i in range(concurrency)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.time() - started, failures
+
+
+def summarize(samples: dict, wall_seconds: float):
+    """Per-endpoint request count, errors, throughput and latency percentiles (ms)."""
+    report = {}
+    for name, values in sorted(samples.items()):
+        latencies = sorted(seconds for seconds, ok in values if ok)
+        report[name] = {
+            "requests": len(values),
+            "errors": sum(1 for _, ok in values if not ok),
+            "throughput": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+            "p50Ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95Ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99Ms": round(percentile(latencies, 99) * 1000, 1),
+            "maxMs": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
+    return report
+
+
+def print_report(report: dict, wall_seconds: float):
+    print(f"\n{'endpoint':<28}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in report.items():
+        print(f"{name:<28}{row['requests']:>9}{row['errors']:>8}{row['throughput']:>9.2f}"
+              f"{row['p50Ms']:>10.1f}{row['p95Ms']:>10.1f}{row['p99Ms']:>10.1f}{row['maxMs']:>10.1f}")
+    total = sum(row["requests"] for name, row in report.items() if not name.endswith("(first event)"))
+    print(f"\n{total} requests in {wall_seconds:.1f}s ({total / wall_seconds:.2f} req/s overall).")
+
+
+def regressions(report: dict, baseline: dict, tolerance: float):
+    """Endpoints whose p95 grew more than `tolerance` (a fraction) over the baseline."""
+    slower = []
+    for name, row in report.items():
+        before = baseline.get(name)
+        if before and before["p95Ms"] > 0 and row["p95Ms"] > before["p95Ms"] * (1 + tolerance):
+            slower.append(f"{name}: p95 {before['p95Ms']}ms -> {row['p95Ms']}ms")
+    return slower
+
+
+# --- Scenarios ---
+
+def _write_upload_csv(work_dir: str, rows: int = 2000):
+    """A store extract shaped like FACT_SALES_DAILY plus a column the planner should drop."""
+    path = os.path.join(work_dir, "sales_upload.csv")
+    with open(path, "w") as f:
+        f.write("date_key,product_key,store_key,qty_sold,net_sales,cashier\n")
+        for i in range(rows):
+            f.write(f"202507{i % 28 + 1:02d},{i % 200 + 1},{i % 25 + 1},{i % 12 + 1},{(i % 97) * 1.25:.2f},C{i % 9}\n")
+    return path
+
+
+def in_process_scenarios(app, work_dir: str):
+    """Calls the Flask app through its test client (one client per thread)."""
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        return local.client
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    def chat(i):
+        check(client().post("/api/chat", json={"message": CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)], "history": []}))
+
+    def chat_stream(i):
+        started = time.time()
+        response = check(client().post("/api/chat/stream", json={"message": CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]},
+                                       buffered=False))
+        first_event = None
+        for _ in response.response:
+            if first_event is None:
+                first_event = time.time() - started
+        response.close()
+        return first_event
+
+    def dashboard(i):
+        check(client().get("/api/dashboard-data"))
+
+    def analytics(i):
+        check(client().get("/api/analytics-data"))
+
+    csv_path = _write_upload_csv(work_dir)
+    upload_folder = app.config["UPLOAD_FOLDER"]
+
+    def upload_plan(i):
+        with open(csv_path, "rb") as f:
+            response = check(client().post("/api/upload-plan", data={"file": (f, "sales_upload.csv")},
+                                           content_type="multipart/form-data"))
+        os.remove(os.path.join(upload_folder, response.get_json()["filename"]))
+
+    return {"chat": chat, "chat_stream": chat_stream, "dashboard": dashboard, "analytics": analytics,
+            "upload_plan": upload_plan}
+
+
+def http_scenarios(base_url: str):
+    """Calls a running server (e.g. gunicorn started separately) over HTTP."""
+    import urllib.request
+
+    def post(path: str, body: dict):
+        request = urllib.request.Request(base_url.rstrip("/") + path, data=json.dumps(body).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=300)
+
+    def chat(i):
+        with post("/api/chat", {"message": CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)], "history": []}) as response:
+            response.read()
+
+    def chat_stream(i):
+        started = time.time()
+        with post("/api/chat/stream", {"message": CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)]}) as response:
+            response.readline()
+            first_event = time.time() - started
+            response.read()
+        return first_event
+
+    def get(path: str):
+        def call(i):
+            with urllib.request.urlopen(base_url.rstrip("/") + path, timeout=300) as response:
+                response.read()
+        return call
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        with open(_write_upload_csv(work_dir), "rb") as f:
+            csv_body = f.read()
+
+    def upload_plan(i):
+        # Raw CSV body, so no multipart encoder is needed. The file stays in the server's
+        # temp_uploads, like any plan that was never confirmed.
+        request = urllib.request.Request(base_url.rstrip("/") + "/api/upload-plan?filename=sales_upload.csv",
+                                         data=csv_body, headers={"Content-Type": "text/csv"})
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+
+    return {"chat": chat, "chat_stream": chat_stream, "dashboard": get("/api/dashboard-data"),
+            "analytics": get("/api/analytics-data"), "upload_plan": upload_plan}
+
+
+@contextlib.contextmanager
+def _backend_log(verbose: bool):
+    """The backend logs every step; keep that out of the report unless asked for."""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def prepare_local_app(args, work_dir: str):
+    """Points the backend at the local warehouse and fake model, then imports the API."""
+    # Forced, so credentials from a .env file can never send benchmark traffic to Snowflake
+    os.environ["SNOWFLAKE_SCHEMA"] = LOCAL_SCHEMA
+    os.environ["SNOWFLAKE_DATABASE"] = ""
+    os.environ["AURA_MOCK_DATA"] = "0"
+    # The stand-in has no quota unless one is configured explicitly
+    os.environ.setdefault("AURA_LLM_RPM", "1000000")
+    os.environ.setdefault("AURA_LLM_TPM", "1000000000")
+    os.environ.setdefault("AURA_JOB_DB", os.path.join(work_dir, "jobs.sqlite3"))
+    os.environ.setdefault("AURA_DATA_VERSION_FILE", os.path.join(work_dir, "data_version"))
+    os.environ.setdefault("AURA_MAPPING_STORE_PATH", os.path.join(work_dir, "upload_mappings.sqlite"))
+    if args.cold:
+        os.environ["AURA_RESULT_CACHE"] = "0"
+        os.environ["AURA_ANSWER_CACHE"] = "0"
+    if args.snapshot:
+        os.environ["AURA_SNAPSHOT_DIR"] = os.path.join(work_dir, "snapshot")
+
+    from warehouse import configure_warehouse
+    from connection_pool import configure_pool
+    from llm_client import configure_model
+
+    configure_warehouse(open_local_warehouse(args.scale, args.db))
+    configure_pool()
+    if args.snapshot:
+        from snapshot_store import get_snapshot_store
+        get_snapshot_store().refresh()  # start measuring with a fresh snapshot
+    model = configure_model(FakeModel(args.llm_latency, args.llm_jitter, args.llm_token_latency, args.plan_steps))
+    from api import app
+    return app, model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for the Aura API.")
+    parser.add_argument("--scale", type=float, default=1.0, help=f"synthetic data size ({ROWS_PER_SCALE:,} fact rows per unit)")
+    parser.add_argument("--db", default=":memory:", help="DuckDB file for the synthetic mart (default: in memory)")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. chat=4,dashboard=3")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after warm-up")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = duration only)")
+    parser.add_argument("--warmup", type=int, default=10, help="requests run before measuring")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds before the fake model answers")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="extra random latency, seeded by the prompt")
+    parser.add_argument("--llm-token-latency", type=float, default=0.002, help="seconds per output token")
+    parser.add_argument("--plan-steps", type=int, default=4, help="sub-questions in each fake analysis plan")
+    parser.add_argument("--cold", action="store_true", help="disable the result and answer caches")
+    parser.add_argument("--snapshot", action="store_true", help="serve hot queries from a local Parquet snapshot")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true", help="show the backend's log output while running")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report from an earlier run to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth over the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory(prefix="aura-bench-") as work_dir:
+        model = None
+        if args.url:
+            scenarios = http_scenarios(args.url)
+        else:
+            app, model = prepare_local_app(args, work_dir)
+            scenarios = in_process_scenarios(app, work_dir)
+
+        if args.warmup:
+            print(f"[Benchmark] Warming up with {args.warmup} request(s)...")
+            with _backend_log(args.verbose):
+                run_load(scenarios, weights, min(args.concurrency, args.warmup), duration=300,
+                         max_requests=args.warmup, seed=args.seed + 1)
+        print(f"[Benchmark] Running {args.concurrency} client(s) for {args.duration:.0f}s with mix {args.mix}...")
+        with _backend_log(args.verbose):
+            samples, wall_seconds, failures = run_load(scenarios, weights, args.concurrency, args.duration,
+                                                       args.requests, args.seed)
+
+    report = summarize(samples, wall_seconds)
+    print_report(report, wall_seconds)
+    for name, error in failures.items():
+        print(f"[Benchmark] First {name} error: {error}")
+    if model is not None:
+        print(f"Fake LLM calls by prompt kind: {model.calls}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "wallSeconds": round(wall_seconds, 2), "endpoints": report}, f, indent=2)
+        print(f"Report written to {args.json}.")
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f)["endpoints"], args.tolerance)
+        for line in slower:
+            print(f"[Benchmark] Regression: {line}")
+        if slower:
+            sys.exit(1)
+        print(f"[Benchmark] No p95 regressions beyond {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# --- Cache Backends ---
+# Both backends share the same interface: values must be JSON-serializable and
+# may carry "tags" (e.g. table names) so related entries can be invalidated together.
+
+
+class MemoryCache:
+    """An in-process LRU cache with per-entry TTL and byte-size accounting."""
+
+    def __init__(self, max_bytes: int, max_entries: int = 10000, default_ttl: float = 300):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size, expires_at, tags)
+        self._tag_index = {}  # tag -> set(keys)
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _drop(self, key):
+        value, size, expires_at, tags = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[2] < time.time():
+                self._drop(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value, tags=(), ttl=None):
+        size = len(json.dumps(value, default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return False
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires_at, tags)
+            self._bytes += size
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            self._stats["sets"] += 1
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._drop(oldest_key)
+                self._stats["evictions"] += 1
+        return True
+
+    def invalidate_tags(self, tags):
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    if key in self._entries:
+                        self._drop(key)
+                        removed += 1
+            self._stats["invalidations"] += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._tag_index.clear()
+            self._bytes = 0
+            self._stats["invalidations"] += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update(backend="memory", entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+        return snapshot
+
+
+class SQLiteCache:
+    """
+    An on-disk LRU cache with TTL and byte accounting, backed by a SQLite file
+    so that every gunicorn worker on the host shares the same entries.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_entries: int = 10000, default_ttl: float = 300):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            db.execute("CREATE TABLE IF NOT EXISTS cache_tags (key TEXT NOT NULL, tag TEXT NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_cache_tags_tag ON cache_tags (tag)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key)")
+
+    def _connect(self):
+        # One connection per thread; SQLite connections must not be shared across threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return _Transaction(db)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    @staticmethod
+    def _delete_keys(db, keys):
+        for key in keys:
+            db.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            db.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            if row[1] < now:
+                self._delete_keys(db, [key])
+                self._count("expirations")
+                self._count("misses")
+                return None
+            db.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return json.loads(row[0])
+
+    def set(self, key, value, tags=(), ttl=None):
+        payload = json.dumps(value, default=str)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return False
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        with self._connect() as db:
+            self._delete_keys(db, [key])
+            db.execute(
+                "INSERT INTO cache_entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, expires_at, now)
+            )
+            db.executemany("INSERT INTO cache_tags (key, tag) VALUES (?, ?)", [(key, tag) for tag in set(tags)])
+
+            # Drop expired entries first, then least-recently-used ones until within budget
+            expired = [r[0] for r in db.execute("SELECT key FROM cache_entries WHERE expires_at < ?", (now,))]
+            self._delete_keys(db, expired)
+            total_bytes, total_entries = db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache_entries").fetchone()
+            evicted = 0
+            if total_bytes > self.max_bytes or total_entries > self.max_entries:
+                for lru_key, lru_size in db.execute("SELECT key, size FROM cache_entries ORDER BY last_access").fetchall():
+                    if total_bytes <= self.max_bytes and total_entries <= self.max_entries:
+                        break
+                    self._delete_keys(db, [lru_key])
+                    total_bytes -= lru_size
+                    total_entries -= 1
+                    evicted += 1
+        self._count("sets")
+        self._count("expirations", len(expired))
+        self._count("evictions", evicted)
+        return True
+
+    def invalidate_tags(self, tags):
+        tags = list(tags)
+        if not tags:
+            return 0
+        placeholders = ", ".join("?" for _ in tags)
+        with self._connect() as db:
+            keys = [r[0] for r in db.execute(f"SELECT DISTINCT key FROM cache_tags WHERE tag IN ({placeholders})", tags)]
+            self._delete_keys(db, keys)
+        self._count("invalidations", len(keys))
+        return len(keys)
+
+    def clear(self):
+        with self._connect() as db:
+            removed = db.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            db.execute("DELETE FROM cache_entries")
+            db.execute("DELETE FROM cache_tags")
+        self._count("invalidations", removed)
+        return removed
+
+    def stats(self):
+        with self._connect() as db:
+            total_bytes, total_entries = db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache_entries").fetchone()
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot.update(backend="sqlite", path=self.path, entries=total_entries, bytes=total_bytes, max_bytes=self.max_bytes)
+        return snapshot
+
+
+class _Transaction:
+    """Wraps a SQLite connection in an explicit IMMEDIATE transaction."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def make_cache(path=None, **kwargs):
+    """Returns a SQLiteCache when a path is configured, otherwise a MemoryCache."""
+    if path:
+        try:
+            return SQLiteCache(path, **kwargs)
+        except Exception as e:
+            print(f"⚠️  Could not open shared cache at '{path}': {e}. Using in-memory cache.")
+    return MemoryCache(**kwargs)
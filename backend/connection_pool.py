@@ -0,0 +1,276 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from telemetry import span
+from warehouse import get_warehouse
+
+# --- Pool Configuration (per gunicorn worker process) ---
+
+POOL_MAX_SIZE = int(os.getenv("AURA_SF_POOL_SIZE", "4"))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("AURA_SF_POOL_TIMEOUT", "30"))
+POOL_MAX_IDLE_SECONDS = float(os.getenv("AURA_SF_POOL_MAX_IDLE", "600"))
+POOL_MAX_AGE_SECONDS = float(os.getenv("AURA_SF_POOL_MAX_AGE", "3600"))
+POOL_HEALTH_CHECK_AFTER = float(os.getenv("AURA_SF_POOL_HEALTH_CHECK_AFTER", "60"))
+
+
+def _warehouse_connect():
+    """Opens a new connection to the configured warehouse (Snowflake unless AURA_WAREHOUSE says otherwise)."""
+    return get_warehouse().connect()
+
+
+def _warehouse_connection_error(error):
+    """True if `error` left the connection unusable (OperationalError and friends on Snowflake)."""
+    return get_warehouse().is_connection_error(error)
+
+
+class SnowflakeConnectionPool:
+    """
+    A bounded, thread-safe pool of reusable Snowflake connections.
+    Connections are health-checked after sitting idle and recycled once they
+    exceed the idle or max-age limits.
+    """
+
+    def __init__(self, connect_fn=_warehouse_connect, max_size=POOL_MAX_SIZE,
+                 acquire_timeout=POOL_ACQUIRE_TIMEOUT, max_idle_seconds=POOL_MAX_IDLE_SECONDS,
+                 max_age_seconds=POOL_MAX_AGE_SECONDS, health_check_after=POOL_HEALTH_CHECK_AFTER,
+                 is_connection_error=_warehouse_connection_error):
+        self.connect_fn = connect_fn
+        self.is_connection_error = is_connection_error
+        self.max_size = max(1, max_size)
+        self.acquire_timeout = acquire_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, created_at, last_used)], most recently used last
+        self._created_at = {}  # id(conn) -> created_at for checked-out connections
+        self._total = 0
+        self._pid = os.getpid()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "creates": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "discarded": 0,
+        }
+
+    # --- Internal Helpers ---
+
+    def _reset_after_fork(self):
+        """Drops inherited connections if this process was forked after the pool was used."""
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle = []
+            self._created_at = {}
+            self._total = 0
+
+    def _is_expired(self, created_at, last_used, now):
+        return (now - last_used > self.max_idle_seconds) or (now - created_at > self.max_age_seconds)
+
+    def _is_healthy(self, conn):
+        if self._is_closed(conn):
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            return True
+        except Exception as e:
+            print(f"[Snowflake Pool] Health check failed: {e}")
+            return False
+
+    @staticmethod
+    def _is_closed(conn):
+        try:
+            return conn.is_closed()
+        except Exception:
+            return True
+
+    def _is_broken_by(self, error):
+        try:
+            broken = self.is_connection_error(error)
+        except Exception:
+            broken = False
+        if broken:
+            print(f"[Snowflake Pool] Discarding a connection after: {error}")
+        return broken
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # --- Public API ---
+
+    def acquire(self):
+        """Checks out a connection, creating one if the pool has room, otherwise waiting."""
+        deadline = time.time() + self.acquire_timeout
+        waited_since = None
+
+        while True:
+            candidate = None
+            to_close = []
+            create_new = False
+
+            with self._cond:
+                self._reset_after_fork()
+                now = time.time()
+                while self._idle and candidate is None:
+                    conn, created_at, last_used = self._idle.pop()
+                    if self._is_expired(created_at, last_used, now):
+                        to_close.append(conn)
+                        self._total -= 1
+                        self._stats["recycled"] += 1
+                    else:
+                        candidate = (conn, created_at, last_used)
+
+                if candidate is None:
+                    if self._total < self.max_size:
+                        self._total += 1
+                        create_new = True
+                    else:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise TimeoutError(
+                                f"Timed out after {self.acquire_timeout}s waiting for a Snowflake connection."
+                            )
+                        if waited_since is None:
+                            waited_since = now
+                            self._stats["waits"] += 1
+                        self._cond.wait(remaining)
+
+            for conn in to_close:
+                self._close_quietly(conn)
+
+            if create_new:
+                try:
+                    conn = self.connect_fn()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.time()
+                with self._cond:
+                    self._stats["creates"] += 1
+                    candidate = (conn, created_at, created_at)
+
+            if candidate is None:
+                continue
+
+            conn, created_at, last_used = candidate
+            if not create_new and time.time() - last_used > self.health_check_after and not self._is_healthy(conn):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._total -= 1
+                    self._stats["health_check_failures"] += 1
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._created_at[id(conn)] = created_at
+                self._stats["checkouts"] += 1
+                if waited_since is not None:
+                    self._stats["wait_seconds"] += time.time() - waited_since
+            return conn
+
+    def release(self, conn, discard=False):
+        """Returns a connection to the pool, or closes it if it is broken or too old."""
+        discard = discard or self._is_closed(conn)
+        with self._cond:
+            created_at = self._created_at.pop(id(conn), None)
+            if created_at is None:
+                # Connection belongs to a pre-fork generation of the pool
+                to_close = True
+            else:
+                now = time.time()
+                to_close = discard or now - created_at > self.max_age_seconds
+                if to_close:
+                    self._total -= 1
+                    self._stats["discarded" if discard else "recycled"] += 1
+                else:
+                    self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+        if to_close:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks a connection out and always returns it.
+        A connection that failed with a connection-level error is discarded instead.
+        """
+        with span("snowflake.acquire"):
+            conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            discard = self._is_broken_by(e)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def stats(self):
+        """Returns a snapshot of the pool metrics."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["wait_seconds"] = round(snapshot["wait_seconds"], 3)
+            snapshot["max_size"] = self.max_size
+            snapshot["open"] = self._total
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = self._total - len(self._idle)
+        return snapshot
+
+    def close_all(self):
+        """Closes every idle connection. Checked-out connections are closed on release."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+
+# --- Shared Pool for All Backend Modules ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide Snowflake connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SnowflakeConnectionPool()
+    return _pool
+
+
+def configure_pool(**kwargs):
+    """Replaces the shared pool, e.g. to change its size or connection factory."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = SnowflakeConnectionPool(**kwargs)
+    return _pool
+
+
+def get_connection():
+    """Shortcut for `with get_connection() as conn:` on the shared pool."""
+    return get_pool().connection()
+
+
+def pool_stats():
+    """Returns the shared pool's metrics."""
+    return get_pool().stats()
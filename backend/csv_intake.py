@@ -0,0 +1,269 @@
+import io
+import os
+import re
+import csv
+import math
+import uuid
+import codecs
+from werkzeug.utils import secure_filename
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, File, Field, Data, Epilogue, NeedData
+
+# --- CSV Intake Configuration ---
+
+# Bytes read from the request body at a time
+INTAKE_CHUNK_BYTES = int(os.getenv("AURA_INTAKE_CHUNK_BYTES", str(1024 * 1024)))
+# Rows profiled per upload; later rows are still saved but only counted
+PROFILE_MAX_ROWS = int(os.getenv("AURA_PROFILE_MAX_ROWS", "200000"))
+# Largest accepted upload (0 = unlimited)
+UPLOAD_MAX_BYTES = int(float(os.getenv("AURA_UPLOAD_MAX_MB", "0")) * 1024 * 1024)
+
+NULL_TOKENS = {"", "null", "na", "n/a", "nan", "none"}
+SAMPLE_VALUES = 3
+MAX_TEXT_STAT = 64  # characters kept of string min/max/sample values
+HLL_PRECISION = 11  # 2,048 one-byte registers per column, ~2.3% error
+
+_TYPE_PATTERNS = (
+    ("INTEGER", re.compile(r"[+-]?\d+")),
+    ("FLOAT", re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")),
+    ("BOOLEAN", re.compile(r"(?i:true|false|yes|no|t|f)")),
+    ("DATE", re.compile(r"\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{4}")),
+    # Dates also match here, so a column mixing dates and timestamps is a TIMESTAMP
+    ("TIMESTAMP", re.compile(r"(?:\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{4})"
+                             r"(?:[T ]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?")),
+)
+_NUMERIC_TYPES = {"INTEGER", "FLOAT"}
+
+
+class UploadRejected(Exception):
+    """The request body is not a CSV upload we can accept (message is safe to show)."""
+
+
+class CardinalitySketch:
+    """HyperLogLog distinct-value estimate in a fixed 2**precision bytes."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        hashed = hash(value) & 0xFFFFFFFFFFFFFFFF
+        index = hashed >> (64 - self.precision)
+        rest = (hashed << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = 64 - self.precision + 1 if rest == 0 else 65 - rest.bit_length()
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self):
+        m = len(self.registers)
+        raw = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))  # linear counting for small sets
+        return int(round(raw))
+
+
+class ColumnProfile:
+    """Running statistics of one CSV column."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.values = 0
+        self.nulls = 0
+        self.types = [name for name, _ in _TYPE_PATTERNS]  # still-possible types, narrowest first
+        self.numeric_min = self.numeric_max = None
+        self.text_min = self.text_max = None
+        self.samples = []
+        self.sketch = CardinalitySketch()
+
+    def add(self, raw: str):
+        self.values += 1
+        value = raw.strip()
+        if value.lower() in NULL_TOKENS:
+            self.nulls += 1
+            return
+        self.sketch.add(value)
+        if self.types:
+            self.types = [name for name, pattern in _TYPE_PATTERNS if name in self.types and pattern.fullmatch(value)]
+        if self.types and self.types[0] in _NUMERIC_TYPES:
+            number = float(value)
+            if self.numeric_min is None or number < self.numeric_min:
+                self.numeric_min = number
+            if self.numeric_max is None or number > self.numeric_max:
+                self.numeric_max = number
+        text = value[:MAX_TEXT_STAT]
+        if self.text_min is None or text < self.text_min:
+            self.text_min = text
+        if self.text_max is None or text > self.text_max:
+            self.text_max = text
+        if len(self.samples) < SAMPLE_VALUES and text not in self.samples:
+            self.samples.append(text)
+
+    def to_dict(self):
+        inferred = self.types[0] if self.types else "STRING"
+        if self.values == self.nulls:
+            inferred = "UNKNOWN"
+        numeric = inferred in _NUMERIC_TYPES
+        return {
+            "name": self.name,
+            "type": inferred,
+            "nullRate": round(self.nulls / self.values, 4) if self.values else 0.0,
+            "distinct": self.sketch.estimate(),
+            "min": _plain(self.numeric_min) if numeric else self.text_min,
+            "max": _plain(self.numeric_max) if numeric else self.text_max,
+            "samples": self.samples,
+        }
+
+
+def _plain(number):
+    return int(number) if number is not None and number.is_integer() else number
+
+
+def header_names(record: list):
+    """Column names of a CSV header record, as the planner and every load path see them."""
+    return [name.strip() for name in record]
+
+
+def read_csv_header(file_path: str):
+    """Reads the header of a stored CSV the same way the upload profile did."""
+    with open(file_path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        return header_names(next(csv.reader(f), []))
+
+
+class CsvProfiler:
+    """
+    Profiles a CSV fed as raw byte chunks in arrival order. Only the current
+    incomplete record is buffered, so memory stays bounded whatever the file size.
+    """
+
+    def __init__(self, max_rows: int = PROFILE_MAX_ROWS):
+        self.max_rows = max_rows
+        self.columns = None
+        self.rows = 0
+        self.bytes = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._pending = ""
+        self._pending_quotes = 0
+
+    def feed(self, data: bytes):
+        self.bytes += len(data)
+        if self.columns is not None and self.rows >= self.max_rows:
+            return  # profile is complete; the rest of the file is only saved
+        self._consume(self._decoder.decode(data))
+
+    def _consume(self, text: str, final: bool = False):
+        # A newline ends a record only outside double quotes
+        start = end = len(self._pending)
+        self._pending += text
+        complete_upto = None
+        quotes = self._pending_quotes
+        for match in re.finditer("\n", text):
+            newline = start + match.start()
+            quotes += self._pending.count('"', end, newline)
+            end = newline
+            if quotes % 2 == 0:
+                complete_upto = newline + 1
+        if final:
+            complete_upto = len(self._pending)
+        if not complete_upto:
+            self._pending_quotes = quotes + self._pending.count('"', end)
+            return
+        complete, self._pending = self._pending[:complete_upto], self._pending[complete_upto:]
+        self._pending_quotes = self._pending.count('"')
+        for record in csv.reader(io.StringIO(complete, newline="")):
+            self._add_record(record)
+
+    def _add_record(self, record: list):
+        if self.columns is None:
+            self.columns = [ColumnProfile(name) for name in header_names(record)]
+            return
+        if not record or self.rows >= self.max_rows:
+            return
+        self.rows += 1
+        for column, value in zip(self.columns, record):
+            column.add(value)
+
+    def finish(self):
+        """Flushes the last record and returns the profile."""
+        if self.columns is None or self.rows < self.max_rows:
+            self._consume(self._decoder.decode(b"", final=True), final=True)
+        return {
+            "columns": [column.to_dict() for column in self.columns or []],
+            "rowsProfiled": self.rows,
+            "sampled": self.rows >= self.max_rows,
+            "bytes": self.bytes,
+        }
+
+
+# --- Streaming Receive ---
+
+def _read_chunks(stream):
+    received = 0
+    while True:
+        chunk = stream.read(INTAKE_CHUNK_BYTES)
+        if not chunk:
+            return
+        received += len(chunk)
+        if UPLOAD_MAX_BYTES and received > UPLOAD_MAX_BYTES:
+            raise UploadRejected(f"Upload exceeds the {UPLOAD_MAX_BYTES // (1024 * 1024)} MB limit.")
+        yield chunk
+
+
+def _multipart_file_chunks(stream, boundary: bytes, filename_holder: dict):
+    """Yields the bytes of the `file` part of a multipart body as they arrive."""
+    decoder = MultipartDecoder(boundary)
+    in_file = False
+    for chunk in _read_chunks(stream):
+        decoder.receive_data(chunk)
+        event = decoder.next_event()
+        while not isinstance(event, (NeedData, Epilogue)):
+            if isinstance(event, File):
+                in_file = event.name == "file"
+                if in_file:
+                    filename_holder["filename"] = event.filename
+            elif isinstance(event, Field):
+                in_file = False
+            elif isinstance(event, Data) and in_file:
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    return
+            event = decoder.next_event()
+        if isinstance(event, Epilogue):
+            return
+
+
+def receive_csv(stream, content_type: str, upload_folder: str, filename: str = None):
+    """
+    Writes an uploaded CSV to `upload_folder` chunk by chunk while profiling it.
+    Accepts a multipart form with a `file` field or a raw CSV body (with `filename`).
+    Returns (stored filename, profile); raises UploadRejected for unusable uploads.
+    """
+    mimetype, options = parse_options_header(content_type or "")
+    source = {"filename": filename}
+    if mimetype == "multipart/form-data":
+        if not options.get("boundary"):
+            raise UploadRejected("Multipart upload without a boundary.")
+        chunks = _multipart_file_chunks(stream, options["boundary"].encode("latin-1"), source)
+    else:
+        chunks = _read_chunks(stream)
+
+    stored_name = f"{uuid.uuid4().hex[:8]}_upload.csv"
+    path = os.path.join(upload_folder, stored_name)
+    profiler = CsvProfiler()
+    try:
+        with open(path, "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+                profiler.feed(chunk)
+        profile = profiler.finish()
+        if not profile["columns"]:
+            raise UploadRejected("No CSV file found in the upload.")
+    except Exception:
+        os.remove(path)
+        raise
+
+    original = secure_filename(source["filename"] or "") or "upload.csv"
+    final_name = f"{stored_name[:8]}_{original}"
+    os.replace(path, os.path.join(upload_folder, final_name))
+    return final_name, profile
@@ -1,68 +1,81 @@
 import os
 import json
-import pandas as pd
-import google.generativeai as genai
-import snowflake.connector
+import tempfile
 from dotenv import load_dotenv
+from connection_pool import get_connection
+from warehouse import get_warehouse
+from data_events import notify_tables_loaded
+from schema_catalog import get_catalog
+from schema_pruner import prune_table_schemas
+from llm_client import generate as generate_llm
+from upload_transform import UPLOAD_TRANSFORM, ParquetTransform, rejects_report_path
+from csv_intake import read_csv_header
+from upload_mapping import lookup_plan, remember_plan, match_plan, record_plan_source
 
 # --- Database Functions (Self-contained) ---
 
 def get_all_table_schemas(schema_name: str):
     """
-    Connects to Snowflake and retrieves the schema for ALL tables in a given schema.
+    Retrieves the schema for ALL tables in a given schema from the shared schema catalog.
     This is used by the AI to determine the best destination table.
     """
-    load_dotenv()
-    conn = None
-    all_schemas = {}
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"), password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"), warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"), schema=os.getenv("SNOWFLAKE_SCHEMA")
-        )
-        cur = conn.cursor()
-        query = f"""
-        SELECT table_name, column_name, data_type
-        FROM INFORMATION_SCHEMA.COLUMNS
-        WHERE TABLE_SCHEMA = '{schema_name.upper()}'
-        ORDER BY table_name, ORDINAL_POSITION;
-        """
-        cur.execute(query)
-        for table, column, dtype in cur.fetchall():
-            if table not in all_schemas:
-                all_schemas[table] = {}
-            all_schemas[table][column] = dtype
+        catalog = get_catalog(schema_name)
+        if not catalog.ensure_loaded():
+            return None, f"Error fetching all Snowflake schemas: catalog for '{schema_name}' is unavailable."
+        all_schemas = catalog.table_schemas()
         
         if not all_schemas:
             return None, f"Could not find any tables in schema '{schema_name}'."
         return all_schemas, None
     except Exception as e:
         return None, f"Error fetching all Snowflake schemas: {e}"
-    finally:
-        if conn:
-            conn.close()
 
 # --- AI-Powered Mapping Function ---
 
-def get_ai_upload_plan(csv_cols: list, all_db_schemas: dict):
+def format_csv_profile(profile: dict):
+    """Renders a csv_intake profile as one line per column for the planner prompt."""
+    def one_line(value):
+        return " ".join(str(value).split())
+
+    lines = []
+    for column in profile.get("columns", []):
+        line = f"- {column['name']}: {column['type']}, {column['nullRate']:.0%} null, ~{column['distinct']:,} distinct"
+        if column["min"] is not None:
+            line += f", range {one_line(column['min'])} .. {one_line(column['max'])}"
+        if column["samples"]:
+            line += f", e.g. {', '.join(one_line(v) for v in column['samples'])}"
+        lines.append(line)
+    return "\n".join(lines)
+
+def get_ai_upload_plan(csv_cols: list, all_db_schemas: dict, profile: dict = None):
     """
     Uses Gemini to suggest the best target table and create a column mapping.
+    `profile` (from csv_intake) adds inferred types and value ranges to the prompt.
     """
     print("   - Asking AI to analyze CSV and suggest an upload plan...")
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-2.5-flash-lite')
-    
+    # Only offer the tables whose names look related to the CSV header
+    candidate_schemas = prune_table_schemas(all_db_schemas, " ".join(csv_cols))
+
     schemas_str = ""
-    for table, cols in all_db_schemas.items():
+    for table, cols in candidate_schemas.items():
         schemas_str += f"Table `{table}`:\n"
         for col, dtype in cols.items():
             schemas_str += f"- {col} ({dtype})\n"
         schemas_str += "\n"
 
+    profile_section = ""
+    if profile:
+        profile_section = f"""
+    **CSV Column Profile (inferred type, null rate, distinct values, range, samples):**
+    ---
+    {format_csv_profile(profile)}
+    ---
+"""
+
     prompt = f"""
     You are an intelligent data pipeline expert. A user wants to upload a CSV.
-    Based on the CSV's column names, determine the most logical destination table from the available Snowflake schemas and create a column mapping.
+    Based on the CSV's column names (and their profile, if given), determine the most logical destination table from the available Snowflake schemas and create a column mapping.
 
     **Instructions:**
     1.  **Suggest Table:** Identify the single best Snowflake table for this data.
@@ -78,76 +91,231 @@ def get_ai_upload_plan(csv_cols: list, all_db_schemas: dict):
     ---
     {', '.join(csv_cols)}
     ---
-
+    {profile_section}
     **JSON Response:**
     """
     try:
-        response = model.generate_content(prompt)
+        response = generate_llm(prompt, purpose="upload_plan")
         # Simple parsing, assuming model returns clean JSON in a code block
         json_response_text = response.text.strip().replace("```json", "").replace("```", "")
         return json.loads(json_response_text), None
     except Exception as e:
         return None, f"Failed to get a valid plan from the AI model: {e}"
 
+def get_upload_plan(csv_cols: list, all_db_schemas: dict, schema_name: str, profile: dict = None):
+    """
+    Plans an upload without the LLM when possible: a plan confirmed earlier for
+    the same header and schema is reused as is, then the local matcher is tried,
+    and Gemini is only asked when the matcher is not confident. The plan carries
+    its "source" (memory, matcher or llm) and the matcher's "confidence".
+    """
+    remembered = lookup_plan(csv_cols, schema_name)
+    if remembered:
+        print("   - Reusing the confirmed plan for this header.")
+        return {**remembered, "source": "memory", "confidence": 1.0}, None
+
+    matched, confidence = match_plan(csv_cols, all_db_schemas, profile)
+    if matched and matched.pop("confident"):
+        print(f"   - Local matcher picked '{matched['suggested_table']}' (confidence {confidence:.2f}).")
+        record_plan_source("matcher")
+        return {**matched, "source": "matcher", "confidence": confidence}, None
+
+    plan, error = get_ai_upload_plan(csv_cols, all_db_schemas, profile)
+    if error and matched:
+        # A best-effort local plan still beats no plan; the user reviews it before loading
+        print(f"   - {error} Falling back to the local matcher's plan.")
+        record_plan_source("matcher")
+        return {**matched, "source": "matcher", "confidence": confidence}, None
+    if error:
+        return None, error
+    record_plan_source("llm")
+    return {**plan, "source": "llm", "confidence": confidence}, None
+
 # --- Smart Upload Function ---
 
+def _target_column_types(schema_name: str, table_name: str):
+    """{COLUMN: data_type} of the target table from the schema catalog ({} if unknown)."""
+    catalog = get_catalog(schema_name)
+    if not catalog.ensure_loaded():
+        return {}
+    for table, columns in catalog.table_schemas().items():
+        if table.upper() == table_name.upper():
+            return {column.upper(): dtype for column, dtype in columns.items()}
+    return {}
+
+
+def _prepare_upload(file_path: str, table_name: str, schema_name: str, column_mapping: dict):
+    """
+    Reads the header and keeps the usable part of the mapping. Returns
+    ((csv columns, mapping, target column types or {} for the raw CSV path), None)
+    or (None, error message).
+    """
+    csv_cols = read_csv_header(file_path)
+
+    # Filter map for only valid, non-null mappings
+    valid_mapping = {
+        csv_col: snow_col for csv_col, snow_col in column_mapping.items()
+        if csv_col in csv_cols and snow_col is not None
+    }
+
+    if not valid_mapping:
+        return None, "AI mapping resulted in no common columns. Cannot upload."
+
+    print(f"   - Applying AI-generated mapping for columns: {', '.join(valid_mapping.keys())}")
+
+    target_types = _target_column_types(schema_name, table_name) if UPLOAD_TRANSFORM else {}
+    if target_types:
+        unknown = [col for col in valid_mapping.values() if col.upper() not in target_types]
+        if unknown:
+            return None, f"Mapped column(s) not found in '{table_name}': {', '.join(unknown)}"
+    return (csv_cols, valid_mapping, target_types), None
+
+
+def _load_typed(file_path: str, table_name: str, mapping: dict, target_types: dict):
+    """
+    Coerces the mapped columns to the table's types, loads them as Parquet and
+    writes rows that do not convert to a rejected-rows report. Returns the summary.
+    """
+    with tempfile.TemporaryDirectory(prefix="aura_transform_") as work_dir:
+        transform = ParquetTransform(file_path, mapping, target_types, work_dir, rejects_report_path(file_path))
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                rows_loaded = get_warehouse().bulk_load_parquet(cur, transform.parts(), table_name)
+    summary = transform.summary
+    summary["rowsLoaded"] = rows_loaded if rows_loaded is not None else summary["rowsWritten"]
+    if summary["rowsRejected"]:
+        print(f"   - Rejected {summary['rowsRejected']:,} row(s) (by column: {summary['rejectedByColumn']}); "
+              f"report at {summary['report']}")
+    return summary
+
+
 def smart_upload_csv(file_path: str, table_name: str, schema_name: str, column_mapping: dict):
     """
-    Uploads a CSV to a Snowflake table using a provided column map.
+    Uploads a CSV to a Snowflake table using a provided column map. Returns
+    (True, load summary or None) or (False, error message).
     """
     print(f"\nAttempting smart upload for '{file_path}' to table '{table_name}'...")
     load_dotenv()
-    conn = None
     try:
-        csv_cols = pd.read_csv(file_path, nrows=0).columns.tolist()
-        
-        # Filter map for only valid, non-null mappings
-        valid_mapping = {
-            csv_col: snow_col for csv_col, snow_col in column_mapping.items()
-            if csv_col in csv_cols and snow_col is not None
-        }
-
-        if not valid_mapping:
-            return False, "AI mapping resulted in no common columns. Cannot upload."
-
-        print(f"   - Applying AI-generated mapping for columns: {', '.join(valid_mapping.keys())}")
-
-        conn = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"), password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"), warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"), schema=os.getenv("SNOWFLAKE_SCHEMA")
-        )
-        cur = conn.cursor()
-
-        stage_name = "temp_csv_stage"
-        cur.execute(f"CREATE OR REPLACE TEMPORARY STAGE {stage_name}")
-        put_command = f"PUT file://{os.path.abspath(file_path)} @{stage_name}"
-        cur.execute(put_command)
-
-        # Dynamically build the COPY INTO command from the AI map
-        target_cols_str = ", ".join(f'"{col}"' for col in valid_mapping.values())
-        source_cols_str = ", ".join(f't.${csv_cols.index(col) + 1}' for col in valid_mapping.keys())
-        
-        copy_command = f"""
-        COPY INTO {table_name} ({target_cols_str})
-        FROM (SELECT {source_cols_str} FROM @{stage_name} t)
-        FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '"' SKIP_HEADER = 1 EMPTY_FIELD_AS_NULL = TRUE)
-        ON_ERROR = 'CONTINUE';
-        """
-        
-        print("   - Executing smart COPY INTO command...")
-        cur.execute(copy_command)
+        prepared, error = _prepare_upload(file_path, table_name, schema_name, column_mapping)
+        if error:
+            return False, error
+        csv_cols, valid_mapping, target_types = prepared
+
+        summary = None
+        if target_types:
+            summary = _load_typed(file_path, table_name, valid_mapping, target_types)
+            rows_loaded = summary["rowsLoaded"]
+        else:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    rows_loaded = get_warehouse().bulk_load(cur, file_path, table_name, csv_cols, valid_mapping)
+        if rows_loaded is not None:
+            print(f"   - Loaded {rows_loaded:,} row(s).")
         
+        # Cached query results that read this table are now stale
+        notify_tables_loaded([table_name])
+        # The user confirmed this plan and it loaded; the next file with this header reuses it
+        remember_plan(csv_cols, schema_name, table_name, column_mapping)
         print(f"✅ Successfully loaded matching data into '{table_name}'.")
-        return True, None
+        return True, summary
 
     except Exception as e:
         error_message = f"❌ Failed to upload data to Snowflake: {e}"
         print(error_message)
         return False, error_message
-    finally:
-        if conn:
-            conn.close()
+
+
+def _converted_parts(files: list, results: list):
+    """
+    Yields the Parquet parts of each file once the whole file has converted, so
+    a file that fails halfway loads nothing. The next file converts while the
+    warehouse stages the parts already handed over.
+    """
+    for index, transform, _ in files:
+        try:
+            parts = list(transform.parts())
+        except Exception as e:
+            results[index]["error"] = f"Could not convert the file: {e}"
+            continue
+        yield from parts
+
+
+def smart_upload_batch(uploads: list, schema_name: str):
+    """
+    Uploads many CSVs at once. `uploads` is a list of {"file_path", "table_name",
+    "column_mapping"}. All files share one connection and one stage: typed files
+    get a single load per target table, and files loaded as raw CSV (the typed
+    transform is off or the table is not in the catalog) a single load per table
+    and header layout. Returns one result per upload, in order: {"table",
+    "status" ("loaded" or "failed"), "rowsLoaded", load summary..., "error"}.
+    """
+    print(f"\nAttempting batch upload of {len(uploads)} file(s)...")
+    load_dotenv()
+    results = [{"table": upload["table_name"], "status": "failed", "rowsLoaded": 0} for upload in uploads]
+    groups, raw_groups, loaded_tables = {}, {}, set()
+    with tempfile.TemporaryDirectory(prefix="aura_batch_") as work_dir:
+        for index, upload in enumerate(uploads):
+            file_path, table_name = upload["file_path"], upload["table_name"]
+            try:
+                prepared, error = _prepare_upload(file_path, table_name, schema_name, upload["column_mapping"])
+            except Exception as e:
+                prepared, error = None, f"Could not read the file: {e}"
+            if error:
+                results[index]["error"] = error
+                continue
+            csv_cols, mapping, target_types = prepared
+            if not target_types:
+                raw_groups.setdefault(table_name, []).append((index, file_path, csv_cols, mapping))
+                continue
+            # The part prefix ties each staged file back to its upload in the load results
+            transform = ParquetTransform(file_path, mapping, target_types, work_dir, rejects_report_path(file_path),
+                                         part_prefix=f"f{index:04d}_")
+            groups.setdefault(table_name, []).append((index, transform, csv_cols))
+
+        loaded, raw_loaded = {}, {}
+        if groups or raw_groups:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    if groups:
+                        loaded = get_warehouse().bulk_load_parquet_tables(
+                            cur, {table: _converted_parts(files, results) for table, files in groups.items()})
+                    if raw_groups:
+                        # The key prefixes the staged chunks, like part_prefix does for the Parquet parts
+                        raw_loaded = get_warehouse().bulk_load_csv_tables(cur, {
+                            table: [(f"f{index:04d}", *file) for index, *file in files]
+                            for table, files in raw_groups.items()})
+            for table_name, files in groups.items():
+                per_part, error = loaded[table_name]
+                for index, transform, csv_cols in files:
+                    if results[index].get("error"):
+                        continue
+                    if error is not None:
+                        results[index]["error"] = f"Loading '{table_name}' failed: {error}"
+                        continue
+                    summary = transform.summary
+                    rows = summary["rowsWritten"] if per_part is None else \
+                        sum(n for name, n in per_part.items() if name.startswith(f"f{index:04d}_"))
+                    results[index].update(summary, status="loaded", rowsLoaded=rows)
+                    loaded_tables.add(table_name)
+                    remember_plan(csv_cols, schema_name, table_name, uploads[index]["column_mapping"])
+            for table_name, files in raw_groups.items():
+                per_file, error = raw_loaded[table_name]
+                for index, _, csv_cols, _ in files:
+                    if f"f{index:04d}" not in per_file:
+                        results[index]["error"] = f"Loading '{table_name}' failed: {error}"
+                        continue
+                    results[index].update(status="loaded", rowsLoaded=per_file[f"f{index:04d}"])
+                    loaded_tables.add(table_name)
+                    remember_plan(csv_cols, schema_name, table_name, uploads[index]["column_mapping"])
+
+    if loaded_tables:
+        # Cached query results that read these tables are now stale
+        notify_tables_loaded(sorted(loaded_tables))
+
+    done = sum(result["status"] == "loaded" for result in results)
+    print(f"✅ Batch upload finished: {done}/{len(uploads)} file(s) loaded.")
+    return results
 
 
 # --- Tester Block ---
@@ -170,7 +338,7 @@ if __name__ == "__main__":
             print(f"FATAL: {err}")
         else:
             # Step 2: Get AI suggestion for table and mapping
-            csv_columns = pd.read_csv(test_csv_file, nrows=0).columns.tolist()
+            csv_columns = read_csv_header(test_csv_file)
             upload_plan, err = get_ai_upload_plan(csv_columns, all_schemas)
 
             if err:
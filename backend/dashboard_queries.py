@@ -0,0 +1,349 @@
+import os
+import time
+import threading
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from connection_pool import get_connection
+from snapshot_store import get_snapshot_store
+
+# --- Widget Execution Configuration ---
+
+# Widget queries run concurrently on pooled connections (bounded by AURA_SF_POOL_SIZE)
+WIDGET_PARALLELISM = int(os.getenv("AURA_WIDGET_PARALLELISM", "4"))
+# A widget slower than this is served from its last good value (or mock data)
+WIDGET_TIMEOUT = float(os.getenv("AURA_WIDGET_TIMEOUT", "20"))
+
+# --- Dashboard Widgets ---
+
+# NOTE: Avg Profit Margin is complex without cost data. We'll use a placeholder.
+AVG_PROFIT_MARGIN = "96.7%"
+
+
+def fetch_kpis(cur):
+    """Total revenue and units sold over the last 7 days, in one pass."""
+    cur.execute("""
+        SELECT SUM(NET_SALES), SUM(QTY_SOLD)
+        FROM FACT_SALES_DAILY
+        WHERE DATE_KEY IN (SELECT DATE_KEY FROM DIM_DATE WHERE D_DATE >= DATEADD(day, -7, CURRENT_DATE()));
+    """)
+    return _kpis_fragment(*cur.fetchone())
+
+
+def fetch_kpis_snapshot(cur):
+    """fetch_kpis on the daily rollup of the local snapshot."""
+    cur.execute("""
+        SELECT SUM(NET_SALES), SUM(QTY_SOLD)
+        FROM SALES_BY_DAY
+        WHERE D_DATE >= DATEADD(day, -7, CURRENT_DATE());
+    """)
+    return _kpis_fragment(*cur.fetchone())
+
+
+def _kpis_fragment(total_revenue, units_sold):
+    return {
+        "totalRevenue": f"${total_revenue:,.2f}",
+        "unitsSold": f"{int(units_sold):,}",
+        "avgProfitMargin": AVG_PROFIT_MARGIN,
+    }
+
+
+def fetch_top_product(cur):
+    """Top product of all time by units sold."""
+    cur.execute("""
+        SELECT P.PRODUCT_NAME
+        FROM FACT_SALES_DAILY S
+        JOIN DIM_PRODUCT P ON S.PRODUCT_KEY = P.PRODUCT_KEY
+        GROUP BY P.PRODUCT_NAME
+        ORDER BY SUM(S.QTY_SOLD) DESC
+        LIMIT 1;
+    """)
+    return {"topProduct": cur.fetchone()[0]}
+
+
+def fetch_top_product_snapshot(cur):
+    """fetch_top_product on the product rollup of the local snapshot."""
+    cur.execute("""
+        SELECT P.PRODUCT_NAME
+        FROM SALES_BY_PRODUCT_DAY S
+        JOIN DIM_PRODUCT P ON S.PRODUCT_KEY = P.PRODUCT_KEY
+        GROUP BY P.PRODUCT_NAME
+        ORDER BY SUM(S.QTY_SOLD) DESC
+        LIMIT 1;
+    """)
+    return {"topProduct": cur.fetchone()[0]}
+
+
+def fetch_recent_sales(cur):
+    """The last 5 loaded sales rows."""
+    cur.execute("""
+        SELECT P.PRODUCT_NAME, S.QTY_SOLD, ST.STORE_NAME, S.NET_SALES
+        FROM FACT_SALES_DAILY S
+        JOIN DIM_PRODUCT P ON S.PRODUCT_KEY = P.PRODUCT_KEY
+        JOIN DIM_STORE ST ON S.STORE_KEY = ST.STORE_KEY
+        ORDER BY S.LOAD_TS DESC
+        LIMIT 5;
+    """)
+    return {
+        "recentSales": [
+            {
+                "text": f"{row[0]} sold {int(row[1])} units at {row[2]}",
+                "value": f"${row[3]:.2f}"
+            } for row in cur.fetchall()
+        ]
+    }
+
+
+# --- Analytics Query Plan ---
+# The analytics page used to send six aggregate queries. They only differ in how
+# they group FACT_SALES_DAILY (by day in the last 30 days, by product, by store),
+# so one GROUPING SETS pass computes every measure for all three groupings and
+# the widgets are carved out of that result in Python.
+
+TREND_DAYS = 30
+
+ANALYTICS_SQL = f"""
+    WITH DATES AS (
+        SELECT DISTINCT DATE_KEY, D_DATE
+        FROM DIM_DATE
+        WHERE D_DATE >= DATEADD(day, -{TREND_DAYS}, CURRENT_DATE())
+    ),
+    SALES AS (
+        SELECT
+            F.NET_SALES,
+            F.QTY_SOLD,
+            F.PROMO_KEY,
+            D.D_DATE AS TREND_DATE,
+            P.PRODUCT_NAME,
+            S.STORE_NAME
+        FROM FACT_SALES_DAILY F
+        LEFT JOIN DATES D ON F.DATE_KEY = D.DATE_KEY
+        LEFT JOIN DIM_PRODUCT P ON F.PRODUCT_KEY = P.PRODUCT_KEY
+        LEFT JOIN DIM_STORE S ON F.STORE_KEY = S.STORE_KEY
+    )
+    SELECT
+        CASE
+            WHEN GROUPING(TREND_DATE) = 0 THEN 'date'
+            WHEN GROUPING(PRODUCT_NAME) = 0 THEN 'product'
+            ELSE 'store'
+        END AS GROUPING_SET,
+        TREND_DATE,
+        PRODUCT_NAME,
+        STORE_NAME,
+        SUM(NET_SALES) AS SALES,
+        SUM(QTY_SOLD) AS QUANTITY,
+        SUM(CASE WHEN PROMO_KEY > 0 THEN NET_SALES ELSE 0 END) AS WITH_PROMO,
+        SUM(CASE WHEN PROMO_KEY = 0 OR PROMO_KEY IS NULL THEN NET_SALES ELSE 0 END) AS WITHOUT_PROMO
+    FROM SALES
+    GROUP BY GROUPING SETS ((TREND_DATE), (PRODUCT_NAME), (STORE_NAME));
+"""
+
+# The same rows from the rollups of the local snapshot (see snapshot_store.py)
+ANALYTICS_SNAPSHOT_SQL = f"""
+    SELECT 'date' AS GROUPING_SET, D_DATE AS TREND_DATE, NULL AS PRODUCT_NAME, NULL AS STORE_NAME,
+           SUM(NET_SALES) AS SALES, SUM(QTY_SOLD) AS QUANTITY, NULL AS WITH_PROMO, NULL AS WITHOUT_PROMO
+    FROM SALES_BY_DAY
+    WHERE D_DATE >= DATEADD(day, -{TREND_DAYS}, CURRENT_DATE())
+    GROUP BY D_DATE
+    UNION ALL
+    SELECT 'product', NULL, P.PRODUCT_NAME, NULL, SUM(S.NET_SALES), SUM(S.QTY_SOLD), NULL, NULL
+    FROM SALES_BY_PRODUCT_DAY S
+    LEFT JOIN DIM_PRODUCT P ON S.PRODUCT_KEY = P.PRODUCT_KEY
+    GROUP BY P.PRODUCT_NAME
+    UNION ALL
+    SELECT 'store', NULL, NULL, ST.STORE_NAME, SUM(S.NET_SALES), SUM(S.QTY_SOLD),
+           SUM(S.PROMO_NET_SALES), SUM(S.NON_PROMO_NET_SALES)
+    FROM SALES_BY_STORE_DAY S
+    LEFT JOIN DIM_STORE ST ON S.STORE_KEY = ST.STORE_KEY
+    GROUP BY ST.STORE_NAME;
+"""
+
+
+def _number(value):
+    return float(value) if value else 0
+
+
+def _format_day(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%m-%d")
+    return str(value)[5:10]  # 'YYYY-MM-DD' strings from other drivers
+
+
+def build_analytics_payload(rows):
+    """
+    Splits the rows of ANALYTICS_SQL into the JSON shape of /api/analytics-data.
+    Each row is (grouping_set, trend_date, product, store, sales, quantity, with_promo, without_promo).
+    """
+    by_date, by_product, by_store = [], [], []
+    for grouping_set, trend_date, product, store, sales, quantity, with_promo, without_promo in rows:
+        # NULL keys are facts outside the trend window or without a matching dimension row,
+        # which the per-widget inner joins used to drop
+        if grouping_set == "date" and trend_date is not None:
+            by_date.append((trend_date, _number(sales), _number(quantity)))
+        elif grouping_set == "product" and product is not None:
+            by_product.append((product, _number(sales)))
+        elif grouping_set == "store" and store is not None:
+            by_store.append((store, _number(sales), _number(with_promo), _number(without_promo)))
+
+    by_date.sort(key=lambda row: row[0])
+    by_product.sort(key=lambda row: row[1], reverse=True)
+    stores_by_revenue = sorted(by_store, key=lambda row: row[1], reverse=True)
+    stores_by_promo = sorted(by_store, key=lambda row: row[2], reverse=True)
+
+    return {
+        "salesTrend": [{"date": _format_day(d), "sales": sales} for d, sales, _ in by_date],
+        "topProducts": [{"name": name, "value": sales} for name, sales in by_product[:5]],
+        "storePerformance": [{"store": store, "revenue": revenue} for store, revenue, _, _ in stores_by_revenue[:10]],
+        "spoilageData": [{"date": _format_day(d), "quantity": quantity, "value": sales} for d, sales, quantity in by_date],
+        "categoryComparison": [{"category": name, "sales": sales} for name, sales in by_product[:8]],
+        "promotionEffectiveness": [
+            {"promotion": store, "withPromo": with_promo, "withoutPromo": without_promo}
+            for store, _, with_promo, without_promo in stores_by_promo[:5]
+        ],
+    }
+
+
+def fetch_analytics_data(cur):
+    """Runs the single analytics scan on `cur` and returns the analytics payload."""
+    cur.execute(ANALYTICS_SQL)
+    return build_analytics_payload(cur.fetchall())
+
+
+def fetch_analytics_snapshot(cur):
+    """fetch_analytics_data on the rollups of the local snapshot."""
+    cur.execute(ANALYTICS_SNAPSHOT_SQL)
+    return build_analytics_payload(cur.fetchall())
+
+
+# --- Widget Sets ---
+# name -> (payload keys the widget fills, fetch function, snapshot variant or None)
+# A snapshot variant is (fetch function, snapshot tables it reads); it is used
+# whenever the local snapshot is fresh and holds those tables.
+
+DASHBOARD_WIDGETS = {
+    "kpis": (("totalRevenue", "unitsSold", "avgProfitMargin"), fetch_kpis,
+             (fetch_kpis_snapshot, ("SALES_BY_DAY",))),
+    "topProduct": (("topProduct",), fetch_top_product,
+                   (fetch_top_product_snapshot, ("SALES_BY_PRODUCT_DAY", "DIM_PRODUCT"))),
+    # Needs the fact rows themselves, so only with AURA_SNAPSHOT_FACT=1
+    "recentSales": (("recentSales",), fetch_recent_sales,
+                    (fetch_recent_sales, ("FACT_SALES_DAILY", "DIM_PRODUCT", "DIM_STORE"))),
+}
+
+ANALYTICS_WIDGETS = {
+    "analytics": (("salesTrend", "topProducts", "storePerformance", "spoilageData",
+                   "categoryComparison", "promotionEffectiveness"), fetch_analytics_data,
+                  (fetch_analytics_snapshot, ("SALES_BY_DAY", "SALES_BY_PRODUCT_DAY", "SALES_BY_STORE_DAY",
+                                              "DIM_PRODUCT", "DIM_STORE"))),
+}
+
+
+# --- Parallel Widget Runner ---
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_last_good = {}  # "page/widget" -> last successfully fetched fragment
+_widget_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _get_executor():
+    # Thread pools do not survive a fork, so each gunicorn worker builds its own
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=WIDGET_PARALLELISM, thread_name_prefix="aura-widget")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _record(widget_id, outcome, duration=None):
+    with _stats_lock:
+        stats = _widget_stats.setdefault(widget_id, {"ok": 0, "failed": 0, "timedOut": 0, "lastSeconds": None})
+        stats[outcome] += 1
+        if duration is not None:
+            stats["lastSeconds"] = round(duration, 3)
+
+
+def _run_on_snapshot(widget_id, snapshot):
+    """Runs a widget's snapshot variant if the local snapshot can serve it; None otherwise."""
+    store = get_snapshot_store()
+    if snapshot is None or store is None or not store.serves(snapshot[1]):
+        return None
+    snapshot_fn, _ = snapshot
+    try:
+        with store.connection() as conn:
+            with conn.cursor() as cur:
+                fragment = snapshot_fn(cur)
+    except Exception as e:
+        print(f"[Dashboard] Widget '{widget_id}' failed on the snapshot, using the warehouse: {e}")
+        store.record_route(local=False)
+        return None
+    store.record_route(local=True)
+    return fragment
+
+
+def _run_widget(widget_id, fetch_fn, snapshot=None):
+    """Runs one widget (on the local snapshot, else its own pooled connection) and remembers the result."""
+    started = time.time()
+    try:
+        fragment = _run_on_snapshot(widget_id, snapshot)
+        if fragment is None:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    fragment = fetch_fn(cur)
+    except Exception:
+        _record(widget_id, "failed", time.time() - started)
+        raise
+    # Also reached by widgets that already timed out, so their late result is served next time
+    _last_good[widget_id] = fragment
+    _record(widget_id, "ok", time.time() - started)
+    return fragment
+
+
+def run_widgets(page: str, widgets: dict, mock_fn, timeout: float = None):
+    """
+    Runs every widget of a page concurrently and merges their fragments into one payload.
+    A widget that fails or exceeds `timeout` is replaced by its last good fragment, or by
+    its part of `mock_fn()` if it never succeeded. Raises if every widget failed, so a
+    materialized payload keeps its last real value instead of a page of fallbacks.
+    """
+    timeout = WIDGET_TIMEOUT if timeout is None else timeout
+    executor = _get_executor()
+    deadline = time.time() + timeout
+    futures = {
+        name: executor.submit(_run_widget, f"{page}/{name}", fetch_fn, snapshot)
+        for name, (_, fetch_fn, snapshot) in widgets.items()
+    }
+
+    payload, degraded, mocked, mock = {}, [], 0, None
+    for name, (keys, _, _) in widgets.items():
+        widget_id = f"{page}/{name}"
+        try:
+            payload.update(futures[name].result(timeout=max(0, deadline - time.time())))
+            continue
+        except FutureTimeoutError:
+            _record(widget_id, "timedOut")
+            print(f"[Dashboard] Widget '{widget_id}' timed out after {timeout:g}s.")
+        except Exception as e:
+            print(f"[Dashboard] Widget '{widget_id}' failed: {e}")
+
+        degraded.append(name)
+        fragment = _last_good.get(widget_id)
+        if fragment is None:
+            mocked += 1
+            mock = mock if mock is not None else mock_fn()
+            fragment = {key: mock[key] for key in keys}
+        payload.update(fragment)
+
+    if len(degraded) == len(widgets):
+        raise RuntimeError(f"Every {page} widget failed ({mocked} without a previous result).")
+    if degraded:
+        print(f"[Dashboard] Served {page} with fallback values for: {', '.join(degraded)}.")
+    return payload
+
+
+def widget_stats():
+    """Returns per-widget success/failure/timeout counters for this worker."""
+    with _stats_lock:
+        return {widget_id: dict(stats) for widget_id, stats in _widget_stats.items()}
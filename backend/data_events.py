@@ -0,0 +1,49 @@
+import os
+import tempfile
+import threading
+
+# --- Data Change Notifications ---
+# Caches register a listener here and are told whenever new data lands in the
+# warehouse. A shared version file lets the other gunicorn workers on the host
+# notice the change too, since listeners only run in the worker that did the load.
+
+DATA_VERSION_FILE = os.getenv(
+    "AURA_DATA_VERSION_FILE", os.path.join(tempfile.gettempdir(), "aura_data_version")
+)
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+def on_tables_loaded(callback):
+    """Registers `callback(tables)` to run after data is loaded into `tables`."""
+    with _listeners_lock:
+        _listeners.append(callback)
+    return callback
+
+
+def notify_tables_loaded(tables):
+    """Tells every registered cache that `tables` changed and bumps the shared data version."""
+    tables = {t.upper() for t in tables if t}
+    try:
+        with open(DATA_VERSION_FILE, "a") as f:
+            f.write(",".join(sorted(tables)) + "\n")
+    except OSError as e:
+        print(f"⚠️  Could not bump shared data version: {e}")
+
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback(tables)
+        except Exception as e:
+            print(f"⚠️  Data change listener failed: {e}")
+
+
+def data_version():
+    """Returns an opaque token that changes whenever any worker loads new data."""
+    try:
+        stat = os.stat(DATA_VERSION_FILE)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
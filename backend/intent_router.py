@@ -0,0 +1,202 @@
+import os
+import re
+import time
+import threading
+from functools import lru_cache
+from connection_pool import get_connection
+from data_events import on_tables_loaded
+from schema_pruner import tokenize, expand_query_tokens, parse_agent_schema, SYNONYMS
+
+# --- Fast Router Configuration ---
+
+FAST_ROUTER_ENABLED = os.getenv("AURA_FAST_ROUTER", "1") == "1"
+# How long the product/store name vocabulary is kept before it is re-read
+ROUTER_VALUES_TTL = float(os.getenv("AURA_ROUTER_VALUES_TTL", "3600"))
+# Distinct values read per dimension name column
+ROUTER_VALUES_LIMIT = int(os.getenv("AURA_ROUTER_VALUES_LIMIT", "2000"))
+
+# Whole-message pleasantries ("hi", "thanks aura!", "good morning"): every word must
+# come from this list and at least one must be an actual greeting or thanks
+_GREETING_WORDS = {
+    "hi", "hello", "hey", "hiya", "howdy", "yo", "greetings", "thanks", "thank", "thx", "ty",
+    "cheers", "bye", "goodbye", "morning", "afternoon", "evening",
+}
+_PLEASANTRY_WORDS = _GREETING_WORDS | {
+    "good", "you", "ok", "okay", "cool", "great", "awesome", "nice", "perfect", "see", "how",
+    "are", "doing", "aura", "there", "team", "again", "so", "much", "a", "lot", "very", "today",
+}
+_GREETING_MAX_WORDS = 8
+# Clearly outside a retail database, when nothing in the message matches our data
+_OFF_TOPIC = re.compile(
+    r"\b(?:jokes?|weather|capital\s+of|recipes?|cook|poems?|songs?|movies?|president|"
+    r"translate|meaning\s+of\s+life|who\s+are\s+you|what\s+are\s+you)\b",
+    re.IGNORECASE
+)
+# Needs data we do not have (or a judgement call): always left to the model
+_EXTERNAL = re.compile(
+    r"\b(?:competitors?|competition|market\s+share|industry|benchmarks?|forecasts?|predict\w*|"
+    r"next\s+(?:week|month|quarter|year)|economy|inflation|stock\s+price|census|population)\b",
+    re.IGNORECASE
+)
+
+# Name fragments too generic to signal a data question on their own
+_GENERIC_TOKENS = {"dim", "fact", "key", "id", "ts", "load", "name", "code", "type", "flag", "the", "and",
+                   "date", "day", "week", "month", "year"}
+# Everyday words that show up in product and store names ("New Brunswick", "Fresh Value Pack")
+_GENERIC_VALUE_WORDS = frozenset(tokenize(
+    "new old fresh value classic family local size brand premium lite original best good great big small large "
+    "mini extra plus pack north south east west center central street road main market city town "
+    "monday tuesday wednesday thursday friday saturday sunday"
+))
+# Function words and analysis vocabulary that every data question may use; any other
+# word the schema and the dimension values do not know makes the question ambiguous
+_QUESTION_WORDS = frozenset(tokenize(
+    "a an the of in on at by for to from with and or vs versus non per over under between during since than "
+    "is are was were be been being do does did have has had can could would should will please "
+    "we our us i me my you your it its this that these those there here "
+    "what whats which who how when where why show list give tell get find see know let "
+    "compare comparison breakdown split rank ranking overall performance performing doing "
+    "many much most least top bottom best worst highest lowest high low more less "
+    "total sum average avg mean median count number amount rate percent percentage share "
+    "growth change increase decrease up down all each every any some only not no "
+    "last past previous prior current recent recently today yesterday ago so far ytd mtd wtd "
+    "quarter quarterly selling sell sold"
+))
+
+_stats = {"rules": 0, "vocabulary": 0, "llm": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(tier: str):
+    with _stats_lock:
+        _stats[tier] += 1
+
+
+def _is_pleasantry(question: str):
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    return (0 < len(words) <= _GREETING_MAX_WORDS
+            and all(word in _PLEASANTRY_WORDS for word in words)
+            and any(word in _GREETING_WORDS for word in words))
+
+
+@lru_cache(maxsize=4)
+def _schema_vocabulary(db_schema: str):
+    vocabulary = set()
+    for table, columns in parse_agent_schema(db_schema).items():
+        vocabulary.update(tokenize(table))
+        for column, _ in columns:
+            vocabulary.update(tokenize(column))
+    return frozenset(t for t in vocabulary if len(t) >= 3 and not t.isdigit()) - _GENERIC_TOKENS
+
+
+class DimensionVocabulary:
+    """
+    Words from product, store and other dimension names ("milk", "princeton"),
+    read once from the warehouse in the background and dropped after uploads.
+    """
+
+    def __init__(self):
+        self._words = set()
+        self._loaded_at = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def _load(self, db_schema: str):
+        words = set()
+        try:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    for table, columns in parse_agent_schema(db_schema).items():
+                        if not table.upper().startswith("DIM_"):
+                            continue
+                        for column, _ in columns:
+                            if not column.upper().endswith("_NAME"):
+                                continue
+                            cur.execute(f"SELECT DISTINCT {column} FROM {table} LIMIT {ROUTER_VALUES_LIMIT};")
+                            for (value,) in cur.fetchall():
+                                words.update(t for t in tokenize(str(value)) if len(t) >= 3 and not t.isdigit())
+            with self._lock:
+                self._words = words - _GENERIC_TOKENS - _GENERIC_VALUE_WORDS
+                self._loaded_at = time.time()
+            print(f"[Intent Router] Loaded {len(self._words)} dimension value word(s).")
+        except Exception as e:
+            print(f"[Intent Router] Could not load dimension values: {e}")
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def words(self, db_schema: str):
+        """Returns the current vocabulary, starting a background reload when it is stale."""
+        with self._lock:
+            if not self._loading and time.time() - self._loaded_at > ROUTER_VALUES_TTL:
+                self._loading = True
+                threading.Thread(target=self._load, args=(db_schema,), name="router-vocabulary", daemon=True).start()
+            return self._words
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+
+_dimension_vocabulary = DimensionVocabulary()
+
+
+@on_tables_loaded
+def refresh_dimension_vocabulary(tables):
+    """New products or stores may have been uploaded."""
+    _dimension_vocabulary.invalidate()
+
+
+def _has_unknown_words(question: str, known: set):
+    """True if the question uses a content word that neither the schema nor the dimension values know."""
+    words = {token for token in tokenize(question) if not token.isdigit()}
+    return bool(words - _QUESTION_WORDS - known - set(SYNONYMS))
+
+
+def classify_intent(user_question: str, db_schema: str):
+    """
+    Resolves obvious intents without the model. Returns (intent, tier) where tier is
+    "rules" or "vocabulary", or (None, "llm") when the question should go to the LLM router.
+    A data question needs a metric or column word and no words we cannot place;
+    when the rules disagree (an off-topic phrase about our data), the model decides.
+    """
+    if not FAST_ROUTER_ENABLED:
+        return None, "llm"
+    question = (user_question or "").strip()
+
+    if _is_pleasantry(question):
+        _count("rules")
+        return "greeting", "rules"
+    if _EXTERNAL.search(question):
+        _count("llm")
+        return None, "llm"
+
+    tokens = expand_query_tokens(question)
+    schema_words = _schema_vocabulary(db_schema or "")
+    value_words = _dimension_vocabulary.words(db_schema or "")
+
+    if _OFF_TOPIC.search(question):
+        if tokens & (schema_words | value_words):
+            _count("llm")
+            return None, "llm"
+        _count("rules")
+        return "off_topic", "rules"
+
+    if tokens & schema_words and not _has_unknown_words(question, schema_words | value_words):
+        _count("vocabulary")
+        return "data_query", "vocabulary"
+
+    _count("llm")
+    return None, "llm"
+
+
+def router_stats():
+    """Returns how many messages each routing tier resolved, with hit rates."""
+    with _stats_lock:
+        counts = dict(_stats)
+    total = sum(counts.values())
+    return {
+        "counts": counts,
+        "total": total,
+        "hitRates": {tier: round(count / total, 3) if total else 0.0 for tier, count in counts.items()},
+    }
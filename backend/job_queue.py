@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Job Queue Configuration ---
+
+# Investigations run concurrently per worker; the rest wait in the queue
+JOB_WORKERS = int(os.getenv("AURA_JOB_WORKERS", "2"))
+# Submissions beyond this many queued/running jobs (per worker) are rejected
+JOB_MAX_PENDING = int(os.getenv("AURA_JOB_MAX_PENDING", "20"))
+JOB_DEFAULT_DEADLINE = float(os.getenv("AURA_JOB_DEADLINE", "120"))
+JOB_RETENTION_SECONDS = float(os.getenv("AURA_JOB_RETENTION_SECONDS", "3600"))
+# SQLite file shared by all gunicorn workers so any worker can answer a poll
+JOB_DB_PATH = os.getenv("AURA_JOB_DB", os.path.join(tempfile.gettempdir(), "aura_jobs.sqlite3"))
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled", "timed_out")
+
+
+class JobQueueFull(Exception):
+    """Raised when a worker already has JOB_MAX_PENDING unfinished jobs."""
+
+
+class JobCancelled(Exception):
+    """Raised by job functions that noticed their cancellation flag."""
+
+
+class JobQueue:
+    """
+    A small background job queue. Jobs run on a bounded in-process thread pool;
+    their status and results live in SQLite so every worker can poll or cancel them.
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH, max_workers: int = JOB_WORKERS,
+                 max_pending: int = JOB_MAX_PENDING, retention_seconds: float = JOB_RETENTION_SECONDS):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = None
+        self._executor_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    deadline_at REAL NOT NULL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT
+                )""")
+
+    # --- Storage ---
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def _update(self, job_id, only_if_active=True, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        query = f"UPDATE jobs SET {assignments} WHERE id = ?"
+        if only_if_active:
+            query += " AND status IN ('queued', 'running')"
+        return self._db().execute(query, (*fields.values(), job_id)).rowcount
+
+    def _purge_expired(self):
+        """Deletes finished jobs whose results have outlived the retention window."""
+        cutoff = time.time() - self.retention_seconds
+        self._db().execute(
+            f"DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ? "
+            f"AND status IN ({', '.join('?' for _ in TERMINAL_STATUSES)})",
+            (cutoff, *TERMINAL_STATUSES)
+        )
+
+    def _get_executor(self):
+        # Thread pools do not survive a fork, so each gunicorn worker builds its own
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="aura-job")
+            self._executor_pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    # --- Public API ---
+
+    def submit(self, kind: str, fn, *args, deadline: float = None, **kwargs):
+        """
+        Queues `fn(*args, should_cancel=..., time_remaining=..., **kwargs)` and returns its job id.
+        The function receives a `should_cancel()` callable and a `time_remaining()` callable.
+        """
+        deadline = deadline or JOB_DEFAULT_DEADLINE
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"Too many pending jobs ({self._pending}). Please try again shortly.")
+            executor = self._get_executor()
+            self._pending += 1
+
+        self._purge_expired()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._db().execute(
+            "INSERT INTO jobs (id, kind, status, created_at, deadline_at) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, kind, now, now + deadline)
+        )
+        executor.submit(self._run, job_id, now + deadline, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, deadline_at, fn, args, kwargs):
+        try:
+            if time.time() >= deadline_at:
+                self._update(job_id, status="timed_out", finished_at=time.time(),
+                             error="Job deadline passed before it could start.")
+                return
+            if self.is_cancel_requested(job_id):
+                self._update(job_id, status="cancelled", finished_at=time.time())
+                return
+            self._update(job_id, status="running", started_at=time.time())
+
+            result = fn(
+                *args,
+                should_cancel=lambda: self.is_cancel_requested(job_id),
+                time_remaining=lambda: deadline_at - time.time(),
+                **kwargs
+            )
+            if time.time() > deadline_at:
+                self._update(job_id, status="timed_out", finished_at=time.time(),
+                             result=json.dumps(result, default=str),
+                             error="Job finished after its deadline.")
+            else:
+                self._update(job_id, status="succeeded", finished_at=time.time(),
+                             result=json.dumps(result, default=str))
+        except JobCancelled:
+            self._update(job_id, status="cancelled", finished_at=time.time())
+        except Exception as e:
+            print(f"[Job Queue] Job {job_id} failed: {e}")
+            self._update(job_id, status="failed", finished_at=time.time(), error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id: str):
+        """Returns the job as a dict (including its result once finished), or None."""
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        # A job whose worker died never reaches a terminal state; report it as timed out
+        if job["status"] in ("queued", "running") and time.time() > job["deadline_at"] + 60:
+            self._update(job_id, status="timed_out", finished_at=time.time(),
+                         error="Job did not finish; the worker running it may have restarted.")
+            job = dict(self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def cancel(self, job_id: str):
+        """Flags a job for cancellation. Returns False if it does not exist or already finished."""
+        return self._db().execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')",
+            (job_id,)
+        ).rowcount > 0
+
+    def is_cancel_requested(self, job_id: str):
+        row = self._db().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def stats(self):
+        counts = {status: count for status, count in
+                  self._db().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+        with self._lock:
+            pending = self._pending
+        return {"workers": self.max_workers, "pendingInThisWorker": pending, "jobs": counts}
+
+
+# --- Shared Queue ---
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Returns the process-wide job queue, creating it on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
@@ -0,0 +1,302 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+import google.generativeai as genai
+from dotenv import load_dotenv
+from telemetry import span, increment
+
+load_dotenv()
+
+# --- LLM Client Configuration ---
+
+LLM_MODEL = os.getenv("AURA_LLM_MODEL", "gemini-2.5-flash-lite")
+# Quotas this worker may use; with several gunicorn workers, divide the project quota between them
+LLM_RPM = float(os.getenv("AURA_LLM_RPM", "15"))
+LLM_TPM = float(os.getenv("AURA_LLM_TPM", "250000"))
+# Longest a request waits for a free slot before giving up with a rate-limit error
+LLM_QUEUE_TIMEOUT = float(os.getenv("AURA_LLM_QUEUE_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("AURA_LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("AURA_LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("AURA_LLM_BACKOFF_MAX", "20"))
+# Output tokens reserved per call until the real usage is known
+LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("AURA_LLM_OUTPUT_TOKEN_ESTIMATE", "500"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+CHARS_PER_TOKEN = 4
+
+
+class LLMRateLimited(Exception):
+    """Raised when no request slot became free within LLM_QUEUE_TIMEOUT, or retries ran out."""
+
+
+def is_quota_error(error: Exception):
+    """True if a Gemini error means the rate limit or quota was exceeded."""
+    if isinstance(error, LLMRateLimited):
+        return True
+    error_message = f"{type(error).__name__}: {error}"
+    return "ResourceExhausted" in error_message or "quota" in error_message.lower() or " 429" in error_message
+
+
+# --- Token-Bucket Scheduler ---
+
+class RateLimiter:
+    """
+    Request and token buckets refilled continuously at the RPM/TPM rates. Waiting
+    callers are served strictly by (priority, arrival), so background work never
+    overtakes a waiting chat request.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = rpm
+        self._tokens = tpm
+        self._updated = time.monotonic()
+        self._waiting = []  # heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _seconds_until_ready(self, tokens: float):
+        request_gap = max(0.0, 1 - self._requests) * 60 / self.rpm
+        token_gap = max(0.0, tokens - self._tokens) * 60 / self.tpm
+        return max(request_gap, token_gap)
+
+    def acquire(self, tokens: float, priority: int = PRIORITY_INTERACTIVE, timeout: float = LLM_QUEUE_TIMEOUT):
+        """Blocks until one request and `tokens` tokens are available; returns the seconds waited."""
+        tokens = min(tokens, self.tpm)  # a prompt larger than the bucket would otherwise never fit
+        entry = (priority, next(self._tickets))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiting[0] == entry and self._requests >= 1 and self._tokens >= tokens:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        heapq.heappop(self._waiting)
+                        return time.monotonic() - started
+                    remaining = started + timeout - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMRateLimited("Timed out waiting for an LLM request slot.")
+                    wait = self._seconds_until_ready(tokens) if self._waiting[0] == entry else remaining
+                    self._cond.wait(min(remaining, max(0.05, wait)))
+            finally:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def settle(self, reserved: float, used: float):
+        """Returns over-reserved tokens (or charges the shortfall) once real usage is known."""
+        with self._cond:
+            self._tokens = min(self.tpm, self._tokens + reserved - used)
+            self._cond.notify_all()
+
+    def penalize(self):
+        """The API said we are over quota: stop handing out request slots until the bucket refills."""
+        with self._cond:
+            self._refill()
+            self._requests = min(self._requests, 0.0)
+
+    def stats(self):
+        with self._cond:
+            self._refill()
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "availableRequests": round(self._requests, 2),
+                "availableTokens": int(self._tokens),
+                "waiting": len(self._waiting),
+            }
+
+
+# --- Shared Model and Usage Counters ---
+
+_model = None
+_model_lock = threading.Lock()
+_limiter = RateLimiter()
+_usage = {}
+_usage_lock = threading.Lock()
+_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+def get_model():
+    """Returns the process-wide Gemini model, configuring the SDK once."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                _model = genai.GenerativeModel(LLM_MODEL)
+    return _model
+
+
+def configure_model(model):
+    """Replaces the shared model, e.g. with a local stand-in for benchmarks."""
+    global _model
+    with _model_lock:
+        _model = model
+    return _model
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Runs the enclosed LLM calls (and plan steps submitted from it) at `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(text: str):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+_PROMETHEUS_COUNTERS = {
+    "calls": ("aura_llm_calls_total", "Gemini calls by purpose.", {}),
+    "errors": ("aura_llm_errors_total", "Gemini calls that failed, by purpose.", {}),
+    "rateLimited": ("aura_llm_rate_limited_total", "Gemini calls rejected for quota, by purpose.", {}),
+    "promptTokens": ("aura_llm_tokens_total", "Gemini tokens by purpose and kind.", {"kind": "prompt"}),
+    "outputTokens": ("aura_llm_tokens_total", "Gemini tokens by purpose and kind.", {"kind": "output"}),
+}
+
+
+def _record(purpose: str, **increments):
+    for counter, value in increments.items():
+        if counter in _PROMETHEUS_COUNTERS and value:
+            name, help_text, labels = _PROMETHEUS_COUNTERS[counter]
+            increment(name, value, help_text, purpose=purpose, **labels)
+    with _usage_lock:
+        usage = _usage.setdefault(purpose, {
+            "calls": 0, "errors": 0, "retries": 0, "rateLimited": 0,
+            "promptTokens": 0, "outputTokens": 0, "waitSeconds": 0.0, "latencySeconds": 0.0,
+        })
+        for name, value in increments.items():
+            usage[name] += value
+
+
+def _usage_tokens(response, prompt_tokens: int):
+    """(prompt, output) token counts from the response metadata, or estimates."""
+    metadata = getattr(response, "usage_metadata", None)
+    prompt = getattr(metadata, "prompt_token_count", None) or prompt_tokens
+    output = getattr(metadata, "candidates_token_count", None)
+    if output is None:
+        try:
+            output = estimate_tokens(response.text)
+        except Exception:
+            output = 0
+    return prompt, output
+
+
+def _backoff(attempt: int):
+    # Full jitter keeps retries from several threads from landing together
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def generate(prompt: str, purpose: str, stream: bool = False):
+    """
+    Sends `prompt` through the shared scheduler. `purpose` names the caller in the
+    usage counters (router, plan, sql, synthesis, upload_plan). Quota errors are
+    retried with jittered exponential backoff. With `stream=True` an iterator of
+    chunks is returned; a stream is only retried before its first chunk.
+    """
+    if stream:
+        return _generate_stream(prompt, purpose)
+
+    prompt_tokens = estimate_tokens(prompt)
+    reserved = prompt_tokens + LLM_OUTPUT_TOKEN_ESTIMATE
+    priority = _priority.get()
+    with span(f"llm.{purpose}") as llm_span:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = _limiter.acquire(reserved, priority)
+            started = time.time()
+            try:
+                response = get_model().generate_content(prompt)
+            except Exception as e:
+                _limiter.settle(reserved, prompt_tokens)
+                if not is_quota_error(e):
+                    _record(purpose, calls=1, errors=1, waitSeconds=waited)
+                    raise
+                _limiter.penalize()
+                _record(purpose, calls=1, rateLimited=1, waitSeconds=waited)
+                if attempt == LLM_MAX_RETRIES:
+                    raise LLMRateLimited(f"Gemini quota still exhausted after {LLM_MAX_RETRIES} retries: {e}") from e
+                _record(purpose, retries=1)
+                delay = _backoff(attempt)
+                print(f"[LLM] {purpose}: quota exceeded, retrying in {delay:.1f}s (attempt {attempt + 1}/{LLM_MAX_RETRIES}).")
+                time.sleep(delay)
+                continue
+
+            prompt_used, output_used = _usage_tokens(response, prompt_tokens)
+            _limiter.settle(reserved, prompt_used + output_used)
+            _record(purpose, calls=1, promptTokens=prompt_used, outputTokens=output_used,
+                    waitSeconds=waited, latencySeconds=time.time() - started)
+            llm_span.set(promptTokens=prompt_used, outputTokens=output_used, waitSeconds=round(waited, 3), retries=attempt)
+            return response
+
+
+def _generate_stream(prompt: str, purpose: str):
+    prompt_tokens = estimate_tokens(prompt)
+    reserved = prompt_tokens + LLM_OUTPUT_TOKEN_ESTIMATE
+    priority = _priority.get()
+    with span(f"llm.{purpose}", stream=True) as llm_span:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = _limiter.acquire(reserved, priority)
+            started = time.time()
+            output_chars = 0
+            yielded = False
+            last_chunk = None
+            try:
+                for chunk in get_model().generate_content(prompt, stream=True):
+                    last_chunk = chunk
+                    try:
+                        output_chars += len(chunk.text or "")
+                    except ValueError:
+                        pass  # chunk without text (e.g. only safety metadata)
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                _limiter.settle(reserved, prompt_tokens)
+                if yielded or not is_quota_error(e):
+                    _record(purpose, calls=1, errors=1, waitSeconds=waited)
+                    raise
+                _limiter.penalize()
+                _record(purpose, calls=1, rateLimited=1, waitSeconds=waited)
+                if attempt == LLM_MAX_RETRIES:
+                    raise LLMRateLimited(f"Gemini quota still exhausted after {LLM_MAX_RETRIES} retries: {e}") from e
+                _record(purpose, retries=1)
+                time.sleep(_backoff(attempt))
+                continue
+
+            metadata = getattr(last_chunk, "usage_metadata", None)
+            prompt_used = getattr(metadata, "prompt_token_count", None) or prompt_tokens
+            output_used = getattr(metadata, "candidates_token_count", None) or (output_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+            _limiter.settle(reserved, prompt_used + output_used)
+            _record(purpose, calls=1, promptTokens=prompt_used, outputTokens=output_used,
+                    waitSeconds=waited, latencySeconds=time.time() - started)
+            llm_span.set(promptTokens=prompt_used, outputTokens=output_used, waitSeconds=round(waited, 3), retries=attempt)
+            return
+
+
+def llm_stats():
+    """Returns per-purpose call/token counters and the scheduler's current capacity."""
+    with _usage_lock:
+        usage = {purpose: {k: round(v, 3) if isinstance(v, float) else v for k, v in counters.items()}
+                 for purpose, counters in _usage.items()}
+    return {"model": LLM_MODEL, "scheduler": _limiter.stats(), "byPurpose": usage}
@@ -0,0 +1,152 @@
+import os
+import re
+import pandas as pd
+
+# --- Observation Digest Configuration ---
+
+# Token budget for all observations in the synthesis prompt (roughly 4 characters per token)
+SYNTHESIS_TOKEN_BUDGET = int(os.getenv("AURA_SYNTHESIS_TOKEN_BUDGET", "6000"))
+# Rows kept verbatim in the digest of a large result
+DIGEST_TOP_N = int(os.getenv("AURA_DIGEST_TOP_N", "10"))
+
+CHARS_PER_TOKEN = 4
+
+_KEY_COLUMN = re.compile(r"(_KEY|_ID|^ID)$", re.IGNORECASE)
+_TIME_COLUMN = re.compile(r"DATE|DAY|WEEK|MONTH|YEAR|PERIOD|TIME", re.IGNORECASE)
+
+
+def estimate_tokens(text: str):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _fmt(value):
+    if value is None or pd.isna(value):
+        return "n/a"
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+
+def _measure_columns(frame: pd.DataFrame, names: list):
+    """Numeric columns worth aggregating, by position: not surrogate keys and not calendar parts."""
+    measures = {}
+    for position, column in enumerate(names):
+        if _KEY_COLUMN.search(column) or _TIME_COLUMN.search(column):
+            continue
+        values = pd.to_numeric(frame[position], errors="coerce")
+        if values.notna().any() and values.notna().sum() == frame[position].notna().sum():
+            measures[position] = values
+    return measures
+
+
+def _time_column(frame: pd.DataFrame, names: list):
+    """Position of the first column that looks like a date/period and parses as one."""
+    for position, column in enumerate(names):
+        if not _TIME_COLUMN.search(column):
+            continue
+        if pd.to_numeric(frame[position], errors="coerce").notna().all():
+            continue  # plain numbers (counts, years, keys) are not a time axis we can parse
+        parsed = pd.to_datetime(frame[position].astype(str), errors="coerce", format="mixed")
+        if parsed.notna().sum() >= max(2, len(frame) // 2):
+            return position, parsed
+    return None, None
+
+
+def _labels(columns: list):
+    """Column names for the digest lines; repeated names (joins, SELECT *) get their position."""
+    return [f"{column} (column {position + 1})" if columns.count(column) > 1 else column
+            for position, column in enumerate(columns)]
+
+
+def _table(columns, rows):
+    lines = [" | ".join(columns)]
+    lines.extend(" | ".join("None" if v is None else str(v) for v in row) for row in rows)
+    return "\n".join(lines)
+
+
+def digest_result(result: dict, top_n: int = DIGEST_TOP_N):
+    """
+    Reduces a fetched result ({"columns", "rows", "truncated"}) to a compact digest:
+    row count, totals and ranges of the numeric measures, the change over time when
+    the result has a date column, and the first `top_n` rows in query order.
+    """
+    columns, rows = result["columns"], result["rows"]
+    # Columns are addressed by position: names repeat in joins and SELECT *
+    frame = pd.DataFrame(rows, columns=range(len(columns)))
+    labels = _labels(list(columns))
+    partial = bool(result.get("truncated"))
+
+    lines = [f"Rows: {len(rows):,}" + (" (only the first rows were fetched; the query returned more)" if partial else "")]
+    measures = _measure_columns(frame, columns)
+    scope = "over the fetched rows" if partial else "over all rows"
+    for position, values in measures.items():
+        lines.append(
+            f"{labels[position]} {scope}: total={_fmt(values.sum())}, min={_fmt(values.min())}, "
+            f"max={_fmt(values.max())}, mean={_fmt(values.mean())}"
+        )
+
+    time_position, parsed = _time_column(frame, columns)
+    if time_position is not None and measures and len(frame) > 1:
+        order = parsed.sort_values(kind="stable").dropna().index
+        first, last = order[0], order[-1]
+        time_values = frame[time_position]
+        for position, values in measures.items():
+            start, end = values[first], values[last]
+            change = f" ({(end - start) / abs(start):+.1%})" if start and not pd.isna(start) else ""
+            lines.append(
+                f"Trend of {labels[position]} by {labels[time_position]}: {time_values[first]} = {_fmt(start)} -> "
+                f"{time_values[last]} = {_fmt(end)}{change}"
+            )
+
+    shown = rows[:top_n]
+    lines.append(f"First {len(shown)} of {len(rows):,} rows (query order):")
+    lines.append(_table(columns, shown))
+    return "\n".join(lines)
+
+
+def _fit(observation: str, result, budget_chars: int):
+    """
+    Returns the observation itself if it fits, else a digest shrunk until it does.
+    If the digest cannot be built, the observation text is cut to the budget instead.
+    """
+    if len(observation) <= budget_chars or not result or not result.get("rows"):
+        return observation
+    try:
+        top_n = DIGEST_TOP_N
+        while True:
+            digest = digest_result(result, top_n)
+            if len(digest) <= budget_chars or top_n == 0:
+                break
+            top_n //= 2
+    except Exception as e:
+        print(f"[Observation Digest] Could not digest a result, cutting it instead: {e}")
+        return _cut(observation, budget_chars, "[Observation cut to fit the prompt budget.]")
+    return _cut(digest, budget_chars, "[Digest cut to fit the prompt budget.]")
+
+
+def _cut(text: str, budget_chars: int, marker: str):
+    if len(text) <= budget_chars:
+        return text
+    return text[:budget_chars].rsplit("\n", 1)[0] + "\n" + marker
+
+
+def build_observation_context(gathered, token_budget: int = SYNTHESIS_TOKEN_BUDGET):
+    """
+    Renders the synthesis context from [(step, sub_question, observation, result)].
+    Each observation gets an equal share of `token_budget`; observations that do not
+    fit are replaced by a digest of their result (errors and empty results are short).
+    """
+    if not gathered:
+        return ""
+    budget_chars = token_budget * CHARS_PER_TOKEN // len(gathered)
+    sections = []
+    digested = 0
+    for step, sub_question, observation, result in gathered:
+        fitted = _fit(observation, result, budget_chars)
+        digested += fitted is not observation
+        sections.append(f"Observation {step} (from question '{sub_question}'):\n{fitted.strip()}\n\n")
+    context = "".join(sections)
+    if digested:
+        print(f"[Observation Digest] Digested {digested} of {len(gathered)} observation(s) "
+              f"to fit {token_budget} tokens (now ~{estimate_tokens(context)}).")
+    return context
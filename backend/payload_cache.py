@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from data_events import on_tables_loaded, data_version
+
+# --- Payload Cache Configuration ---
+
+# A payload older than this is stale and gets recomputed
+PAYLOAD_TTL = float(os.getenv("AURA_PAYLOAD_TTL", "300"))
+# Background recompute period (0 disables the scheduler; stale payloads still refresh on demand)
+PAYLOAD_REFRESH_SECONDS = float(os.getenv("AURA_PAYLOAD_REFRESH_SECONDS", "300"))
+# Serve the stale payload immediately while a background refresh runs
+PAYLOAD_STALE_WHILE_REVALIDATE = os.getenv("AURA_PAYLOAD_SWR", "1") == "1"
+
+
+class MaterializedPayload:
+    """
+    Holds the last computed JSON payload of an endpoint together with its ETag
+    and computation time, and refreshes it on a schedule, on expiry or after
+    data loads.
+    """
+
+    def __init__(self, name: str, compute_fn, ttl: float = PAYLOAD_TTL,
+                 refresh_interval: float = PAYLOAD_REFRESH_SECONDS,
+                 stale_while_revalidate: bool = PAYLOAD_STALE_WHILE_REVALIDATE):
+        self.name = name
+        self.compute_fn = compute_fn
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.stale_while_revalidate = stale_while_revalidate
+        self._entry = None  # {"payload", "etag", "computed_at"}
+        self._stale = False
+        self._seen_version = data_version()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._scheduler = None
+        self._stats = {"hits": 0, "staleHits": 0, "refreshes": 0, "refreshFailures": 0}
+
+    def _is_stale(self, entry):
+        return self._stale or time.time() - entry["computed_at"] > self.ttl
+
+    def refresh(self):
+        """Recomputes the payload. Concurrent callers share one computation."""
+        if not self._refresh_lock.acquire(blocking=False):
+            # Someone else is already refreshing; wait for them instead of recomputing
+            with self._refresh_lock:
+                if self._entry is None:
+                    raise RuntimeError(f"Computing '{self.name}' failed.")
+                return self._entry
+        try:
+            version = data_version()
+            started = time.time()
+            payload = self.compute_fn()
+            body = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+            entry = {
+                "payload": payload,
+                "etag": hashlib.sha256(body).hexdigest()[:32],
+                "computed_at": time.time(),
+            }
+            with self._lock:
+                self._entry = entry
+                self._stale = False
+                self._seen_version = version
+                self._stats["refreshes"] += 1
+            print(f"[Payload Cache] Refreshed '{self.name}' in {time.time() - started:.2f}s.")
+            return entry
+        except Exception:
+            with self._lock:
+                self._stats["refreshFailures"] += 1
+            raise
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh_in_background(self):
+        def _run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[Payload Cache] Background refresh of '{self.name}' failed: {e}")
+        threading.Thread(target=_run, name=f"payload-refresh-{self.name}", daemon=True).start()
+
+    def get(self):
+        """
+        Returns the current {"payload", "etag", "computed_at"} entry, computing it
+        synchronously only when nothing usable is cached.
+        """
+        self.start_scheduler()
+        if data_version() != self._seen_version:
+            self.mark_stale()  # another worker loaded new data
+
+        with self._lock:
+            entry = self._entry
+        if entry is None:
+            return self.refresh()
+        if not self._is_stale(entry):
+            with self._lock:
+                self._stats["hits"] += 1
+            return entry
+        if self.stale_while_revalidate:
+            with self._lock:
+                self._stats["staleHits"] += 1
+            if not self._refresh_lock.locked():
+                self._refresh_in_background()
+            return entry
+        return self.refresh()
+
+    def has_value(self):
+        """True once a payload has been computed (it may be stale)."""
+        with self._lock:
+            return self._entry is not None
+
+    def mark_stale(self):
+        """Forces the next request (or the scheduler) to recompute the payload."""
+        with self._lock:
+            self._stale = True
+
+    def invalidate(self):
+        """
+        Marks the payload stale and recomputes it in the background. Until that
+        succeeds the previous payload keeps being served; a failed recompute
+        never replaces it.
+        """
+        self.mark_stale()
+        if self.has_value():
+            self._refresh_in_background()
+
+    def start_scheduler(self):
+        """Starts the periodic background refresher once per worker process."""
+        if self.refresh_interval <= 0 or (self._scheduler is not None and self._scheduler.is_alive()):
+            return
+        with self._lock:
+            if self._scheduler is not None and self._scheduler.is_alive():
+                return
+
+            def _loop():
+                while True:
+                    time.sleep(self.refresh_interval)
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        print(f"[Payload Cache] Scheduled refresh of '{self.name}' failed: {e}")
+
+            self._scheduler = threading.Thread(target=_loop, name=f"payload-scheduler-{self.name}", daemon=True)
+            self._scheduler.start()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["computedAt"] = self._entry["computed_at"] if self._entry else None
+            snapshot["stale"] = bool(self._entry) and self._is_stale(self._entry)
+        return snapshot
+
+
+# --- Registry (so uploads can refresh every payload) ---
+
+_payloads = []
+
+
+def materialized_payload(name: str, compute_fn, **kwargs):
+    """Creates and registers a MaterializedPayload."""
+    payload = MaterializedPayload(name, compute_fn, **kwargs)
+    _payloads.append(payload)
+    return payload
+
+
+@on_tables_loaded
+def refresh_after_load(tables):
+    """New data was loaded: recompute every payload in the background."""
+    for payload in _payloads:
+        payload.invalidate()
+
+
+def payload_cache_stats():
+    return {payload.name: payload.stats() for payload in _payloads}
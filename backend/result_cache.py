@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+from cache_store import make_cache, MemoryCache
+from data_events import on_tables_loaded, data_version
+from telemetry import span, increment
+
+# --- Result Cache Configuration ---
+
+RESULT_CACHE_ENABLED = os.getenv("AURA_RESULT_CACHE", "1") == "1"
+RESULT_CACHE_TTL = float(os.getenv("AURA_RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("AURA_RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("AURA_RESULT_CACHE_MAX_ENTRIES", "5000"))
+# Point this at a SQLite file to share cached results between gunicorn workers
+RESULT_CACHE_PATH = os.getenv("AURA_RESULT_CACHE_PATH")
+
+_SQL_TOKEN = re.compile(
+    r"'(?:[^']|'')*'"          # string literal (kept verbatim)
+    r'|"(?:[^"]|"")*"'         # quoted identifier (kept verbatim, case-sensitive)
+    r"|--[^\n]*"               # line comment
+    r"|/\*.*?\*/"              # block comment
+    r"|\s+"                    # whitespace
+    r"|[^'\"\s]+?(?=--|/\*|['\"\s]|$)"  # anything else up to the next boundary
+    r"|.",
+    re.DOTALL
+)
+_IDENTIFIER = re.compile(r'[A-Z_][A-Z0-9_$]*|"(?:[^"]|"")*"')
+
+_cache = make_cache(
+    RESULT_CACHE_PATH,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    default_ttl=RESULT_CACHE_TTL
+)
+_seen_version = data_version()
+_version_lock = threading.Lock()
+
+
+def tokenize_sql(sql_query: str):
+    """Splits a query into literals, quoted identifiers, comments, whitespace and bare words."""
+    return _SQL_TOKEN.findall(sql_query)
+
+
+def normalize_sql(sql_query: str):
+    """
+    Canonical form of a query used as the cache key: comments removed,
+    whitespace collapsed, keywords/identifiers upper-cased and trailing
+    semicolons dropped. String literals and quoted identifiers are untouched.
+    """
+    parts = []
+    for token in tokenize_sql(sql_query):
+        if token.startswith("--") or token.startswith("/*") or token.isspace():
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        elif token[0] in ("'", '"'):
+            parts.append(token)
+        else:
+            parts.append(token.upper())
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def referenced_tables(normalized_sql: str):
+    """
+    Returns every bare identifier in a normalized query. This is a superset of
+    the tables it reads, which is all invalidation needs to stay correct.
+    """
+    without_literals = re.sub(r"'(?:[^']|'')*'", "''", normalized_sql)
+    return {name.strip('"').upper() for name in _IDENTIFIER.findall(without_literals)}
+
+
+def _sync_with_other_workers():
+    """Drops in-memory entries once another worker has loaded new data."""
+    global _seen_version
+    if not isinstance(_cache, MemoryCache):
+        return  # the shared SQLite backend is invalidated directly
+    current = data_version()
+    if current != _seen_version:
+        with _version_lock:
+            if current != _seen_version:
+                _cache.clear()
+                _seen_version = current
+
+
+def get_cached_result(sql_query: str):
+    """Returns the cached result for a query, or None on a miss."""
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with span("cache.result") as lookup:
+        _sync_with_other_workers()
+        value = _cache.get(normalize_sql(sql_query))
+        lookup.set(hit=value is not None)
+    increment("aura_cache_lookups_total", help_text="Cache lookups by cache and outcome.",
+              cache="result", outcome="hit" if value is not None else "miss")
+    return value
+
+
+def cache_result(sql_query: str, result):
+    """Stores a successful query result, tagged with the tables it references."""
+    if not RESULT_CACHE_ENABLED:
+        return
+    key = normalize_sql(sql_query)
+    _cache.set(key, result, tags=referenced_tables(key))
+
+
+@on_tables_loaded
+def invalidate_tables(tables):
+    """Drops every cached result whose query references one of `tables`."""
+    removed = _cache.invalidate_tags({t.upper() for t in tables})
+    if removed:
+        print(f"[Result Cache] Invalidated {removed} cached result(s) for {', '.join(sorted(tables))}.")
+    return removed
+
+
+def result_cache_stats():
+    """Returns hit/miss/eviction counters and current size of the result cache."""
+    return _cache.stats()
@@ -0,0 +1,124 @@
+import os
+import re
+from decimal import Decimal
+from datetime import date, datetime, time as dt_time
+from result_cache import tokenize_sql
+from warehouse import get_warehouse
+
+# --- Result Fetching Configuration ---
+
+# Rows an agent query may return; LIMIT max_rows + 1 is appended to the query so
+# the warehouse stops early and we can still tell that rows were cut off
+RESULT_MAX_ROWS = int(os.getenv("AURA_RESULT_MAX_ROWS", "500"))
+# Size of the rendered result table handed to the synthesizer
+RESULT_MAX_BYTES = int(os.getenv("AURA_RESULT_MAX_BYTES", str(64 * 1024)))
+# Batch size for the row-based fallback when Arrow batches are unavailable
+FETCH_BATCH_ROWS = int(os.getenv("AURA_RESULT_FETCH_BATCH", "1000"))
+
+NO_RESULTS = "Query returned no results."
+
+_WORD = re.compile(r"\(|\)|[A-Za-z_][A-Za-z0-9_$]*")
+
+
+def _is_trivia(token: str):
+    return token.isspace() or token.startswith("--") or token.startswith("/*")
+
+
+def limit_query(sql_query: str, max_rows: int = RESULT_MAX_ROWS):
+    """
+    Appends `LIMIT max_rows + 1` to a SELECT/WITH query that has no top-level
+    LIMIT, FETCH or TOP of its own. Appending (rather than wrapping in a subquery)
+    keeps the query's ORDER BY meaningful. Other statements are returned unchanged.
+    """
+    tokens = tokenize_sql(sql_query)
+    while tokens and (_is_trivia(tokens[-1]) or tokens[-1].strip() == ";"):
+        tokens.pop()
+    if tokens and tokens[-1].endswith(";") and tokens[-1][0] not in ("'", '"'):
+        tokens[-1] = tokens[-1].rstrip(";")
+
+    depth = 0
+    first_keyword = None
+    for token in tokens:
+        if _is_trivia(token) or token[0] in ("'", '"'):
+            continue
+        for word in _WORD.findall(token):
+            if word == "(":
+                depth += 1
+            elif word == ")":
+                depth -= 1
+            elif depth == 0:
+                word = word.upper()
+                first_keyword = first_keyword or word
+                if word in ("LIMIT", "FETCH", "TOP"):
+                    return sql_query
+
+    if first_keyword not in ("SELECT", "WITH"):
+        return sql_query
+    return "".join(tokens).rstrip() + f"\nLIMIT {max_rows + 1}"
+
+
+def _plain(value):
+    """Converts warehouse values into JSON-serializable Python values."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime, date, dt_time)):
+        return str(value)
+    if hasattr(value, "item"):  # NumPy scalars from Arrow batches
+        return _plain(value.item())
+    return str(value)
+
+
+def _row_line(row):
+    return " | ".join("None" if value is None else str(value) for value in row)
+
+
+def _iter_rows(cur):
+    """Yields result rows batch by batch (Arrow batches where the warehouse supports them)."""
+    for batch in get_warehouse().fetch_batches(cur, FETCH_BATCH_ROWS):
+        yield from batch
+
+
+def fetch_bounded(cur, max_rows: int = RESULT_MAX_ROWS, max_bytes: int = RESULT_MAX_BYTES):
+    """
+    Reads at most `max_rows` rows (and `max_bytes` of rendered text) from an executed cursor.
+    Returns a JSON-serializable {"columns", "rows", "truncated", "bytes"} dict where
+    `truncated` is None, "rows" or "bytes" and `bytes` is the size of the rendered rows.
+    """
+    columns = [desc[0] for desc in cur.description]
+    used_bytes = len(" | ".join(columns)) + 1
+    rows, truncated = [], None
+    for row in _iter_rows(cur):
+        if len(rows) >= max_rows:
+            truncated = "rows"
+            break
+        row = [_plain(value) for value in row]
+        line_bytes = len(_row_line(row)) + 1
+        if used_bytes + line_bytes > max_bytes and rows:
+            truncated = "bytes"
+            break
+        used_bytes += line_bytes
+        rows.append(row)
+    return {"columns": columns, "rows": rows, "truncated": truncated, "bytes": used_bytes}
+
+
+def truncation_note(result: dict):
+    """Explains a cut-off result to the synthesizer so it does not treat it as complete."""
+    if result.get("truncated") == "rows":
+        return f"[Truncated: only the first {len(result['rows'])} rows are shown; the query returned more. Totals over these rows are partial.]"
+    if result.get("truncated") == "bytes":
+        return f"[Truncated: only the first {len(result['rows'])} rows fit the size limit; the query returned more. Totals over these rows are partial.]"
+    return None
+
+
+def format_result(result: dict):
+    """Renders a fetched result as the pipe-separated table the prompts expect."""
+    if not result["rows"]:
+        return NO_RESULTS
+    lines = [" | ".join(result["columns"])]
+    lines.extend(_row_line(row) for row in result["rows"])
+    note = truncation_note(result)
+    if note:
+        lines.append(note)
+    return "\n".join(lines) + "\n"
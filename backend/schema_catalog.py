@@ -0,0 +1,167 @@
+import os
+import time
+import hashlib
+import threading
+from dotenv import load_dotenv
+from connection_pool import get_connection
+from warehouse import get_warehouse
+
+load_dotenv()
+
+# --- Schema Catalog Configuration ---
+
+# How often the background thread checks INFORMATION_SCHEMA.TABLES for changes
+SCHEMA_REFRESH_SECONDS = float(os.getenv("AURA_SCHEMA_REFRESH_SECONDS", "300"))
+# Minimum gap between load attempts while the warehouse is unreachable
+SCHEMA_RETRY_SECONDS = float(os.getenv("AURA_SCHEMA_RETRY_SECONDS", "30"))
+
+
+class SchemaCatalog:
+    """
+    In-process cache of table, column and type metadata for one Snowflake schema.
+    A cheap LAST_ALTERED scan of INFORMATION_SCHEMA.TABLES detects changes and
+    only the columns of new or altered tables are re-read.
+    """
+
+    def __init__(self, schema_name: str, database: str = None):
+        self.schema_name = schema_name.upper()
+        self.database = database
+        self._lock = threading.RLock()
+        self._tables = {}  # table -> [(column, dtype)] in ordinal order
+        self._last_altered = {}  # table -> LAST_ALTERED
+        self._loaded = False
+        self._last_attempt = 0.0
+        self._refresher = None
+        self.version = 0
+        self.refreshed_at = None
+
+    # --- Loading ---
+
+    def refresh(self):
+        """Re-reads metadata for tables that were added or altered since the last refresh."""
+        with self._lock:
+            known = dict(self._last_altered)
+        warehouse = get_warehouse()
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                current = warehouse.table_versions(cur, self.schema_name, self.database)
+                changed = [t for t, altered in current.items() if known.get(t) != altered]
+                removed = [t for t in known if t not in current]
+                columns = warehouse.table_columns(cur, self.schema_name, changed, self.database) if changed else {}
+
+        with self._lock:
+            structure_changed = False
+            for table in removed:
+                self._tables.pop(table, None)
+                self._last_altered.pop(table, None)
+                structure_changed = True
+            for table in changed:
+                new_columns = columns.get(table, [])
+                if self._tables.get(table) != new_columns:
+                    structure_changed = True
+                self._tables[table] = new_columns
+                self._last_altered[table] = current[table]
+            if structure_changed:
+                self.version += 1
+            self._loaded = True
+            self.refreshed_at = time.time()
+
+        if structure_changed:
+            print(f"[Schema Catalog] {self.schema_name}: {len(changed)} table(s) reloaded, {len(removed)} removed (version {self.version}).")
+        return structure_changed
+
+    def ensure_loaded(self):
+        """Loads the catalog on first use; returns False if the warehouse is unreachable."""
+        if self._loaded:
+            return True
+        with self._lock:
+            if self._loaded:
+                return True
+            if time.time() - self._last_attempt < SCHEMA_RETRY_SECONDS:
+                return False
+            self._last_attempt = time.time()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[Schema Catalog] Could not load schema '{self.schema_name}': {e}")
+                return False
+        self.start_background_refresh()
+        return True
+
+    def start_background_refresh(self, interval: float = SCHEMA_REFRESH_SECONDS):
+        """Starts a daemon thread that keeps the catalog in sync with the warehouse."""
+        if interval <= 0:
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+
+            def _loop():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        print(f"[Schema Catalog] Background refresh failed: {e}")
+
+            self._refresher = threading.Thread(target=_loop, name=f"schema-catalog-{self.schema_name}", daemon=True)
+            self._refresher.start()
+
+    # --- Views ---
+
+    def tables(self):
+        """Returns {table: [(column, dtype), ...]} sorted by table name."""
+        with self._lock:
+            return {table: list(self._tables[table]) for table in sorted(self._tables)}
+
+    def table_schemas(self):
+        """Returns the {table: {column: dtype}} shape used by the CSV upload planner."""
+        return {table: dict(cols) for table, cols in self.tables().items()}
+
+    def agent_schema_string(self):
+        """Renders the schema in the text format embedded into the agent prompts."""
+        formatted_schema = ""
+        for table_name, columns in self.tables().items():
+            formatted_schema += f"Table: {table_name}\n"
+            formatted_schema += "Columns: " + ", ".join(f"{column} ({dtype})" for column, dtype in columns) + "\n\n"
+        return formatted_schema.strip()
+
+    def fingerprint(self):
+        """A short hash of the table/column/type structure, stable across workers."""
+        digest = hashlib.sha256(self.agent_schema_string().encode("utf-8")).hexdigest()
+        return digest[:16]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "schema": self.schema_name,
+                "loaded": self._loaded,
+                "tables": len(self._tables),
+                "columns": sum(len(cols) for cols in self._tables.values()),
+                "version": self.version,
+                "refreshedAt": self.refreshed_at,
+            }
+
+
+# --- Shared Catalogs (one per schema) ---
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(schema_name: str = None):
+    """Returns the process-wide catalog for a schema (defaults to SNOWFLAKE_SCHEMA)."""
+    schema_name = (schema_name or os.getenv("SNOWFLAKE_SCHEMA") or "").upper()
+    with _catalogs_lock:
+        catalog = _catalogs.get(schema_name)
+        if catalog is None:
+            catalog = SchemaCatalog(schema_name, database=os.getenv("SNOWFLAKE_DATABASE"))
+            _catalogs[schema_name] = catalog
+    return catalog
+
+
+def schema_catalog_stats():
+    """Returns load status and size for every catalog in this worker."""
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+    return [catalog.stats() for catalog in catalogs]
@@ -0,0 +1,200 @@
+import os
+import re
+import math
+from functools import lru_cache
+
+# --- Schema Pruning Configuration ---
+
+SCHEMA_PRUNING_ENABLED = os.getenv("AURA_SCHEMA_PRUNING", "1") == "1"
+# Number of most relevant tables kept in a prompt
+SCHEMA_TOP_K = int(os.getenv("AURA_SCHEMA_TOP_K", "6"))
+# Tables wider than this only keep their key columns and the columns that matched
+SCHEMA_MAX_COLUMNS = int(os.getenv("AURA_SCHEMA_MAX_COLUMNS", "30"))
+
+# Business vocabulary managers use, mapped onto the tokens our column names are built from
+SYNONYMS = {
+    "revenue": ["sales", "net"],
+    "income": ["sales", "net"],
+    "earning": ["sales", "net"],
+    "sold": ["qty", "sold", "sales"],
+    "sell": ["qty", "sold", "sales"],
+    "seller": ["qty", "sold", "sales", "product"],
+    "unit": ["qty"],
+    "quantity": ["qty"],
+    "volume": ["qty"],
+    "item": ["product"],
+    "sku": ["product"],
+    "shop": ["store"],
+    "location": ["store"],
+    "branch": ["store"],
+    "promotion": ["promo"],
+    "discount": ["promo"],
+    "deal": ["promo"],
+    "bogo": ["promo"],
+    "day": ["date"],
+    "daily": ["date"],
+    "week": ["date"],
+    "weekly": ["date"],
+    "month": ["date"],
+    "monthly": ["date"],
+    "year": ["date"],
+    "trend": ["date"],
+    "seasonal": ["date"],
+    "stock": ["inventory", "stock"],
+    "stockout": ["inventory", "stock"],
+    "spoilage": ["waste", "spoil", "shrink"],
+    "loss": ["waste", "shrink"],
+    "margin": ["cost", "profit", "sales"],
+    "profit": ["cost", "profit", "sales"],
+}
+
+_KEY_COLUMN = re.compile(r"(_KEY|_ID)$")
+_TABLE_LINE = re.compile(r"^Table:\s*(\S+)\s*$")
+_COLUMNS_LINE = re.compile(r"^Columns:\s*(.*)$")
+# "NAME (TYPE)", where the type may carry its own parentheses: NET_SALES (NUMBER(12,2))
+_COLUMN_ENTRY = re.compile(r"([^,()]+?)\s*\(((?:[^()]|\([^()]*\))*)\)")
+
+
+def tokenize(text: str):
+    """Splits names and questions into lower-case word stems (snake_case and camelCase aware)."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    tokens = []
+    for word in re.split(r"[^A-Za-z0-9]+", text.lower()):
+        if not word:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def expand_query_tokens(text: str):
+    """Tokenizes a question and adds the schema vocabulary its business terms map to."""
+    tokens = set()
+    for token in tokenize(text):
+        tokens.add(token)
+        tokens.update(SYNONYMS.get(token, ()))
+    return tokens
+
+
+def parse_agent_schema(db_schema: str):
+    """Parses the 'Table: X / Columns: a (T), ...' string back into {table: [(column, dtype)]}."""
+    tables = {}
+    current = None
+    for line in (db_schema or "").splitlines():
+        line = line.strip()
+        table_match = _TABLE_LINE.match(line)
+        if table_match:
+            current = table_match.group(1)
+            tables[current] = []
+            continue
+        columns_match = _COLUMNS_LINE.match(line)
+        if columns_match and current is not None:
+            tables[current] = [(c.strip(), d.strip()) for c, d in _COLUMN_ENTRY.findall(columns_match.group(1))]
+    return tables
+
+
+def render_agent_schema(tables: dict):
+    """Inverse of parse_agent_schema."""
+    formatted_schema = ""
+    for table_name, columns in tables.items():
+        formatted_schema += f"Table: {table_name}\n"
+        formatted_schema += "Columns: " + ", ".join(f"{column} ({dtype})" for column, dtype in columns) + "\n\n"
+    return formatted_schema.strip()
+
+
+class SchemaIndex:
+    """A small lexical index over table and column names with IDF weighting."""
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.table_tokens = {t: set(tokenize(t)) for t in tables}
+        self.column_tokens = {t: {c: set(tokenize(c)) for c, _ in cols} for t, cols in tables.items()}
+
+        # Document frequency counted per table so common words ("key", "date") weigh less
+        df = {}
+        for table in tables:
+            seen = set(self.table_tokens[table])
+            for tokens in self.column_tokens[table].values():
+                seen |= tokens
+            for token in seen:
+                df[token] = df.get(token, 0) + 1
+        n = max(1, len(tables))
+        self.idf = {token: math.log(1 + n / count) for token, count in df.items()}
+
+    def score_tables(self, query_tokens: set):
+        """Returns [(score, table, matched_columns)] for every table that matched, best first."""
+        scored = []
+        for table in self.tables:
+            score = 2.0 * sum(self.idf.get(t, 0) for t in self.table_tokens[table] & query_tokens)
+            matched_columns = set()
+            for column, tokens in self.column_tokens[table].items():
+                overlap = tokens & query_tokens
+                if overlap:
+                    score += sum(self.idf.get(t, 0) for t in overlap) / len(tokens)
+                    matched_columns.add(column)
+            if score > 0:
+                scored.append((score, table, matched_columns))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored
+
+
+@lru_cache(maxsize=8)
+def _index_for(db_schema: str):
+    return SchemaIndex(parse_agent_schema(db_schema))
+
+
+def _prune(index: SchemaIndex, query_text: str, top_k: int, max_columns: int):
+    """Returns the pruned {table: [(column, dtype)]}, or None to signal 'use the full schema'."""
+    if len(index.tables) <= top_k:
+        return None
+    scored = index.score_tables(expand_query_tokens(query_text))
+    if not scored:
+        return None
+
+    selected = {table: matched_columns for _, table, matched_columns in scored[:top_k]}
+
+    # Pull in the dimensions the selected tables join to (PRODUCT_KEY -> DIM_PRODUCT) so
+    # filters on product/store/date names stay expressible, up to twice the top-k budget
+    for table in list(selected):
+        for column, _ in index.tables[table]:
+            if len(selected) >= 2 * top_k or not column.upper().endswith("_KEY"):
+                continue
+            entity = set(tokenize(column[:-4]))
+            for other in index.tables:
+                if other not in selected and entity <= index.table_tokens[other] \
+                        and column in index.column_tokens[other]:
+                    selected[other] = set()
+
+    pruned = {}
+    for table in sorted(selected):
+        columns = index.tables[table]
+        if len(columns) > max_columns:
+            columns = [(c, d) for c, d in columns if c in selected[table] or _KEY_COLUMN.search(c.upper())]
+        pruned[table] = columns
+    return pruned
+
+
+def prune_schema(db_schema: str, query_text: str, top_k: int = None, max_columns: int = None):
+    """
+    Returns the part of the agent schema string most relevant to `query_text`.
+    Falls back to the full schema when pruning is off, the schema is already
+    small, or nothing in the question matches a table or column name.
+    """
+    if not SCHEMA_PRUNING_ENABLED or not db_schema:
+        return db_schema
+    pruned = _prune(_index_for(db_schema), query_text, top_k or SCHEMA_TOP_K, max_columns or SCHEMA_MAX_COLUMNS)
+    if pruned is None:
+        return db_schema
+    return render_agent_schema(pruned)
+
+
+def prune_table_schemas(all_schemas: dict, query_text: str, top_k: int = None, max_columns: int = None):
+    """Same as prune_schema for the {table: {column: dtype}} dict used by the upload planner."""
+    if not SCHEMA_PRUNING_ENABLED or not all_schemas:
+        return all_schemas
+    schema_text = render_agent_schema({t: list(cols.items()) for t, cols in all_schemas.items()})
+    pruned = _prune(_index_for(schema_text), query_text, top_k or SCHEMA_TOP_K, max_columns or SCHEMA_MAX_COLUMNS)
+    if pruned is None:
+        return all_schemas
+    return {table: dict(columns) for table, columns in pruned.items()}
@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from connection_pool import get_connection
+from data_events import on_tables_loaded, data_version
+from result_cache import normalize_sql, referenced_tables
+from warehouse import DuckDBWarehouse, get_warehouse, write_query_parquet
+
+load_dotenv()
+
+# --- Snapshot Configuration ---
+
+# Directory on the app host holding the Parquet snapshot (empty disables the snapshot)
+SNAPSHOT_DIR = os.getenv("AURA_SNAPSHOT_DIR", "")
+# How often the snapshot is refreshed incrementally from the warehouse
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("AURA_SNAPSHOT_REFRESH_SECONDS", "300"))
+# A snapshot older than this is not used for serving until it has been refreshed
+SNAPSHOT_MAX_STALENESS = float(os.getenv("AURA_SNAPSHOT_MAX_STALENESS", "900"))
+# Period of the full rebuild that also picks up rows without LOAD_TS, updates and deletes
+SNAPSHOT_FULL_REFRESH_SECONDS = float(os.getenv("AURA_SNAPSHOT_FULL_REFRESH_SECONDS", "86400"))
+# Also copy FACT_SALES_DAILY itself, so row-level agent queries can be served locally
+SNAPSHOT_INCLUDE_FACT = os.getenv("AURA_SNAPSHOT_FACT", "0") == "1"
+# Route agent queries that only read snapshot tables to the local copy
+SNAPSHOT_ROUTE_QUERIES = os.getenv("AURA_SNAPSHOT_ROUTE_AGENT", "1") == "1"
+
+# Rows loaded this long before the watermark are re-read, for loads that committed late
+WATERMARK_OVERLAP = timedelta(minutes=10)
+# How often workers check whether another worker loaded data
+POLL_SECONDS = 5
+SNAPSHOT_BATCH_ROWS = 100_000
+
+FACT_TABLE = "FACT_SALES_DAILY"
+DIMENSION_TABLES = ("DIM_DATE", "DIM_PRODUCT", "DIM_STORE", "DIM_PROMOTION")
+
+# --- Rollups ---
+# Each rollup is partitioned by the month of D_DATE (0 for facts without a date),
+# so an incremental refresh only rewrites the months that received new rows.
+
+_FACT_FROM = f"""
+    FROM {FACT_TABLE} F
+    LEFT JOIN (SELECT DISTINCT DATE_KEY, D_DATE FROM DIM_DATE) D ON F.DATE_KEY = D.DATE_KEY
+"""
+_PARTITION = "COALESCE(YEAR(D.D_DATE) * 100 + MONTH(D.D_DATE), 0)"
+_MEASURES = """
+    SUM(F.NET_SALES) AS NET_SALES,
+    SUM(F.QTY_SOLD) AS QTY_SOLD,
+    SUM(CASE WHEN F.PROMO_KEY > 0 THEN F.NET_SALES ELSE 0 END) AS PROMO_NET_SALES,
+    SUM(CASE WHEN F.PROMO_KEY = 0 OR F.PROMO_KEY IS NULL THEN F.NET_SALES ELSE 0 END) AS NON_PROMO_NET_SALES,
+    COUNT(*) AS FACT_ROWS
+"""
+
+ROLLUPS = {
+    "SALES_BY_DAY": "F.DATE_KEY, D.D_DATE",
+    "SALES_BY_PRODUCT_DAY": "F.DATE_KEY, D.D_DATE, F.PRODUCT_KEY",
+    "SALES_BY_STORE_DAY": "F.DATE_KEY, D.D_DATE, F.STORE_KEY",
+}
+
+
+def _partition_sql(table: str, partition: int):
+    if table == FACT_TABLE:
+        return f"SELECT F.* {_FACT_FROM} WHERE {_PARTITION} = {int(partition)}"
+    keys = ROLLUPS[table]
+    return f"SELECT {keys}, {_MEASURES} {_FACT_FROM} WHERE {_PARTITION} = {int(partition)} GROUP BY {keys}"
+
+
+def _version_token():
+    version = data_version()
+    return list(version) if version is not None else None
+
+
+class SnapshotStore:
+    """
+    A Parquet copy of the sales mart's hot aggregates on the app host, shared by
+    every worker. One worker at a time refreshes it (guarded by a file lock); all
+    of them serve it through an in-memory DuckDB that reads the files directly.
+    """
+
+    def __init__(self, directory: str, schema_name: str = None, include_fact: bool = SNAPSHOT_INCLUDE_FACT):
+        self.directory = directory
+        self.schema_name = (schema_name or os.getenv("SNOWFLAKE_SCHEMA") or "").upper()
+        self.include_fact = include_fact
+        self._local = DuckDBWarehouse(":memory:", self.schema_name or None, parquet_dir=directory)
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+        self._synced_mtime = None
+        self._refresher = None
+        self._stats = {"refreshes": 0, "fullRefreshes": 0, "refreshFailures": 0,
+                       "localQueries": 0, "fallbacks": 0, "lastRefreshSeconds": None}
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    # --- Manifest ---
+
+    def manifest(self):
+        """The manifest of the last completed refresh (by any worker), or None."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                try:
+                    with open(self.manifest_path) as f:
+                        self._manifest = json.load(f)
+                    self._manifest_mtime = mtime
+                except (OSError, ValueError) as e:
+                    print(f"[Snapshot] Could not read manifest: {e}")
+                    return None
+            return self._manifest
+
+    def _write_manifest(self, manifest: dict):
+        partial = self.manifest_path + ".partial"
+        with open(partial, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(partial, self.manifest_path)
+
+    # --- Serving ---
+
+    def is_fresh(self, manifest: dict = None):
+        """True if the snapshot is recent enough and no data was loaded since it was taken."""
+        manifest = manifest or self.manifest()
+        return (manifest is not None
+                and time.time() - manifest["refreshedAt"] <= SNAPSHOT_MAX_STALENESS
+                and manifest["dataVersion"] == _version_token())
+
+    def serves(self, tables):
+        """True if every table in `tables` is in a fresh snapshot."""
+        manifest = self.manifest()
+        return bool(tables) and self.is_fresh(manifest) and {t.upper() for t in tables} <= set(manifest["tables"])
+
+    def serves_query(self, sql_query: str):
+        """True if an agent query only reads warehouse tables that the fresh snapshot holds."""
+        if not SNAPSHOT_ROUTE_QUERIES:
+            return False
+        manifest = self.manifest()
+        if not self.is_fresh(manifest):
+            return False
+        identifiers = referenced_tables(normalize_sql(sql_query))
+        database = (os.getenv("SNOWFLAKE_DATABASE") or "").upper()
+        if "INFORMATION_SCHEMA" in identifiers or (database and database in identifiers):
+            return False
+        tables = identifiers & set(manifest["sourceTables"])
+        return bool(tables) and tables <= set(manifest["tables"])
+
+    @contextmanager
+    def connection(self):
+        """A session on the local copy, re-reading the file list if a refresh finished since."""
+        manifest_mtime = self._manifest_mtime
+        if manifest_mtime != self._synced_mtime:
+            self._local.sync_parquet()
+            self._synced_mtime = manifest_mtime
+        conn = self._local.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def record_route(self, local: bool):
+        with self._lock:
+            self._stats["localQueries" if local else "fallbacks"] += 1
+
+    # --- Refresh ---
+
+    def refresh(self, full: bool = False):
+        """
+        Brings the snapshot up to date. Only months with facts loaded after the
+        LOAD_TS watermark are rewritten, unless `full` is set, the fact table has
+        no LOAD_TS or it changed without any newer LOAD_TS (updates, deletes).
+        Returns False if another worker is refreshing right now.
+        """
+        with open(os.path.join(self.directory, ".refresh.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                started = time.time()
+                manifest = self._refresh_locked(full)
+                elapsed = time.time() - started
+                with self._lock:
+                    self._stats["refreshes"] += 1
+                    self._stats["fullRefreshes"] += int(manifest["fullRefreshAt"] >= started)
+                    self._stats["lastRefreshSeconds"] = round(elapsed, 3)
+                print(f"[Snapshot] Refreshed {len(manifest['tables'])} table(s) in {elapsed:.2f}s.")
+                return True
+            except Exception:
+                with self._lock:
+                    self._stats["refreshFailures"] += 1
+                raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh_locked(self, full: bool):
+        previous = self.manifest() or {}
+        version = _version_token()  # taken first, so loads during the refresh trigger another one
+        started = time.time()
+        warehouse = get_warehouse()
+        database = os.getenv("SNOWFLAKE_DATABASE")
+        full = (full or not previous or started - previous.get("fullRefreshAt", 0) >= SNAPSHOT_FULL_REFRESH_SECONDS
+                or not set(self._partitioned_tables()) <= set(previous.get("partitions", {})))
+
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                source_versions = {table: str(v) for table, v in warehouse.table_versions(cur, self.schema_name, database).items()}
+                if FACT_TABLE not in source_versions:
+                    raise RuntimeError(f"{FACT_TABLE} not found in schema '{self.schema_name}'.")
+                previous_versions = previous.get("sourceVersions", {})
+                partitions = {table: dict(previous.get("partitions", {}).get(table, {})) for table in self._partitioned_tables()}
+                tables = dict(previous.get("tables", {})) if not full else {}
+
+                # Dimensions are small: copied whole whenever they changed
+                for table in DIMENSION_TABLES:
+                    if table not in source_versions:
+                        continue
+                    if not full and table in tables and previous_versions.get(table) == source_versions[table]:
+                        continue
+                    rows = write_query_parquet(warehouse, cur, f"SELECT * FROM {table}",
+                                               os.path.join(self.directory, f"{table}.parquet"), SNAPSHOT_BATCH_ROWS)
+                    tables[table] = rows or 0
+
+                columns = {column.upper() for column, _ in
+                           warehouse.table_columns(cur, self.schema_name, [FACT_TABLE], database).get(FACT_TABLE, [])}
+                watermark = None
+                if "LOAD_TS" in columns:
+                    cur.execute(f"SELECT MAX(LOAD_TS) FROM {FACT_TABLE}")
+                    watermark = cur.fetchone()[0]
+
+                fact_changed = full or previous_versions.get(FACT_TABLE) != source_versions[FACT_TABLE]
+                affected = set()
+                if fact_changed and not full and watermark is not None and previous.get("watermark"):
+                    since = datetime.fromisoformat(previous["watermark"]).replace(tzinfo=None) - WATERMARK_OVERLAP
+                    cur.execute(f"SELECT DISTINCT {_PARTITION} {_FACT_FROM} "
+                                f"WHERE F.LOAD_TS > CAST('{since.isoformat(sep=' ')}' AS TIMESTAMP)")
+                    affected = {int(p) for (p,) in cur.fetchall()}
+                if fact_changed and not affected:
+                    full = True
+                if full:
+                    cur.execute(f"SELECT DISTINCT {_PARTITION} {_FACT_FROM}")
+                    affected = {int(p) for (p,) in cur.fetchall()}
+                    tables = {t: rows for t, rows in tables.items() if t in DIMENSION_TABLES}
+
+                for table, table_partitions in partitions.items():
+                    folder = os.path.join(self.directory, table)
+                    os.makedirs(folder, exist_ok=True)
+                    if full:
+                        table_partitions.clear()
+                    for partition in sorted(affected):
+                        target = os.path.join(folder, f"part-{partition}.parquet")
+                        rows = write_query_parquet(warehouse, cur, _partition_sql(table, partition), target,
+                                                   SNAPSHOT_BATCH_ROWS)
+                        if rows is None:
+                            table_partitions.pop(str(partition), None)
+                            if os.path.exists(target):
+                                os.remove(target)
+                        else:
+                            table_partitions[str(partition)] = rows
+                    for name in os.listdir(folder):
+                        if name.endswith(".parquet") and name[len("part-"):-len(".parquet")] not in table_partitions:
+                            os.remove(os.path.join(folder, name))  # months that no longer have facts
+                    if table_partitions:
+                        tables[table] = sum(table_partitions.values())
+                    else:
+                        tables.pop(table, None)
+
+        for table in set(DIMENSION_TABLES) - set(tables):
+            path = os.path.join(self.directory, f"{table}.parquet")
+            if os.path.exists(path):
+                os.remove(path)
+
+        manifest = {
+            "refreshedAt": started,
+            "fullRefreshAt": started if full else previous.get("fullRefreshAt", started),
+            "dataVersion": version,
+            "watermark": str(watermark) if watermark is not None else None,
+            "sourceVersions": source_versions,
+            "sourceTables": sorted(source_versions),
+            "tables": tables,
+            "partitions": partitions,
+        }
+        self._write_manifest(manifest)
+        return manifest
+
+    def _partitioned_tables(self):
+        return list(ROLLUPS) + ([FACT_TABLE] if self.include_fact else [])
+
+    def refresh_if_due(self):
+        """Refreshes when the snapshot is stale, or data was loaded since it was taken."""
+        manifest = self.manifest()
+        if (manifest is None or manifest["dataVersion"] != _version_token()
+                or time.time() - manifest["refreshedAt"] >= SNAPSHOT_REFRESH_SECONDS):
+            self.refresh()
+
+    def start_background_refresh(self):
+        """Starts a daemon thread per worker; the file lock keeps their refreshes from overlapping."""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+
+            def _loop():
+                while True:
+                    try:
+                        self.refresh_if_due()
+                    except Exception as e:
+                        print(f"[Snapshot] Refresh failed: {e}")
+                        time.sleep(SNAPSHOT_REFRESH_SECONDS)  # do not hammer an unreachable warehouse
+                    time.sleep(POLL_SECONDS)
+
+            self._refresher = threading.Thread(target=_loop, name="snapshot-refresh", daemon=True)
+            self._refresher.start()
+
+    def stats(self):
+        manifest = self.manifest()
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "directory": self.directory,
+            "fresh": self.is_fresh(manifest),
+            "ageSeconds": round(time.time() - manifest["refreshedAt"], 1) if manifest else None,
+            "watermark": manifest["watermark"] if manifest else None,
+            "tables": manifest["tables"] if manifest else {},
+        })
+        return stats
+
+
+# --- Shared Store ---
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """Returns the process-wide snapshot (starting its refresher), or None if AURA_SNAPSHOT_DIR is unset."""
+    global _store
+    if not SNAPSHOT_DIR:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore(SNAPSHOT_DIR)
+    _store.start_background_refresh()
+    return _store
+
+
+@on_tables_loaded
+def refresh_after_load(tables):
+    """New data was loaded: refresh the snapshot now instead of at the next poll."""
+    if _store is None or not {t.upper() for t in tables} & {FACT_TABLE, *DIMENSION_TABLES}:
+        return
+
+    def _run():
+        try:
+            _store.refresh()
+        except Exception as e:
+            print(f"[Snapshot] Refresh after load failed: {e}")
+    threading.Thread(target=_run, name="snapshot-refresh-after-load", daemon=True).start()
+
+
+def snapshot_stats():
+    store = get_snapshot_store()
+    return store.stats() if store is not None else {"enabled": False}
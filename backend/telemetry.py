@@ -0,0 +1,239 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- Telemetry Configuration ---
+
+TELEMETRY_ENABLED = os.getenv("AURA_TELEMETRY", "1") == "1"
+# Lets clients ask for a per-request trace with "debug": true (keep off in production)
+DEBUG_TRACES_ENABLED = os.getenv("AURA_DEBUG_TRACES", "0") == "1"
+# Spans kept per trace so a runaway investigation cannot grow a response without bound
+TRACE_MAX_SPANS = int(os.getenv("AURA_TRACE_MAX_SPANS", "500"))
+
+# Latency histogram bucket bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Span:
+    """One timed stage. Attributes set while it is open end up in the trace."""
+
+    __slots__ = ("name", "attrs", "started")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Trace:
+    """The spans recorded while serving one request, across all of its threads."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: Span, duration: float, error: str = None):
+        entry = {
+            "name": span.name,
+            "startMs": round((span.started - self.started) * 1000, 1),
+            "durationMs": round(duration * 1000, 1),
+            "thread": threading.current_thread().name,
+        }
+        if span.attrs:
+            entry["attrs"] = dict(span.attrs)
+        if error:
+            entry["error"] = error
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(entry)
+            else:
+                self.dropped += 1
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["startMs"])
+            return {
+                "totalMs": round((time.time() - self.started) * 1000, 1),
+                "spans": spans,
+                "droppedSpans": self.dropped,
+            }
+
+
+_current_trace = contextvars.ContextVar("aura_trace", default=None)
+
+
+# --- Metric Registry ---
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._counters = {}  # (name, labels) -> value
+        self._help = {}
+        self._gauges = {}  # name -> (help, fn)
+
+    def observe(self, name: str, labels: tuple, value: float, help_text: str):
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            buckets = self._histograms.get((name, labels))
+            if buckets is None:
+                buckets = self._histograms[(name, labels)] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            buckets[len(LATENCY_BUCKETS)] += 1
+            buckets[-1] += value
+
+    def increment(self, name: str, labels: tuple, value: float, help_text: str):
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def register_gauge(self, name: str, help_text: str, fn):
+        with self._lock:
+            self._gauges[name] = (help_text, fn)
+
+    def snapshot(self):
+        with self._lock:
+            return (
+                {key: list(values) for key, values in self._histograms.items()},
+                dict(self._counters),
+                dict(self._help),
+                dict(self._gauges),
+            )
+
+
+_registry = _Registry()
+
+
+def _labels(**labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+# --- Public API ---
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times a pipeline stage. The duration feeds the `aura_stage_seconds{stage=name}`
+    histogram and, if a trace is active for this request, a span entry.
+    """
+    if not TELEMETRY_ENABLED:
+        yield Span(name, attrs)
+        return
+    current = Span(name, attrs)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.time() - current.started
+        outcome = "error" if error else "ok"
+        _registry.observe("aura_stage_seconds", _labels(stage=name, outcome=outcome), duration,
+                          "Latency of each agent pipeline stage.")
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current, duration, error)
+
+
+def observe(name: str, value: float, help_text: str = "", **labels):
+    """Records `value` (seconds) in a latency histogram."""
+    if TELEMETRY_ENABLED:
+        _registry.observe(name, _labels(**labels), value, help_text)
+
+
+def increment(name: str, value: float = 1, help_text: str = "", **labels):
+    """Adds `value` to a Prometheus counter (use a `_total` suffix for the name)."""
+    if TELEMETRY_ENABLED:
+        _registry.increment(name, _labels(**labels), value, help_text)
+
+
+def register_gauge(name: str, help_text: str, fn):
+    """Registers `fn()` -> number or {((label, value), ...): number} as a gauge read at scrape time."""
+    _registry.register_gauge(name, help_text, fn)
+
+
+@contextmanager
+def request_trace(enabled: bool = True):
+    """Collects the spans of the enclosed request (including its worker threads) into a Trace."""
+    if not enabled or not TELEMETRY_ENABLED:
+        yield None
+        return
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def debug_trace_requested(flag):
+    """True if the client asked for a trace and debug traces are allowed on this deployment."""
+    return DEBUG_TRACES_ENABLED and str(flag).lower() in ("1", "true", "yes")
+
+
+# --- Prometheus Exposition ---
+
+def _escape(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: tuple = ()):
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Renders every metric of this worker in the Prometheus text format (version 0.0.4)."""
+    histograms, counters, help_texts, gauges = _registry.snapshot()
+    worker = (("worker", str(os.getpid())),)
+    lines = []
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {name} {help_texts.get(name, '')}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            base = labels + worker
+            for bound, count in zip(LATENCY_BUCKETS, values):
+                lines.append(f"{name}_bucket{_format_labels(base, (('le', repr(float(bound))),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(base, (('le', '+Inf'),))} {values[len(LATENCY_BUCKETS)]}")
+            lines.append(f"{name}_sum{_format_labels(base)} {_number(values[-1])}")
+            lines.append(f"{name}_count{_format_labels(base)} {values[len(LATENCY_BUCKETS)]}")
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {name} {help_texts.get(name, '')}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels + worker)} {_number(value)}")
+
+    for name, (help_text, fn) in sorted(gauges.items()):
+        try:
+            value = fn()
+        except Exception as e:
+            print(f"[Telemetry] Gauge {name} failed: {e}")
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, sample in samples:
+            lines.append(f"{name}{_format_labels(tuple(labels) + worker)} {_number(sample)}")
+
+    return "\n".join(lines) + "\n"
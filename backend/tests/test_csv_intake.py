@@ -0,0 +1,65 @@
+import pytest
+from csv_intake import CsvProfiler
+
+QUOTED = (
+    'id,note,amount\r\n'
+    '1,"first line\nsecond line",10\r\n'
+    '2,"say ""hi"", then\r\nleave",20.5\r\n'
+    '3,plain,30\r\n'
+).encode("utf-8")
+
+
+def _profile(chunks, max_rows=1000):
+    profiler = CsvProfiler(max_rows=max_rows)
+    for chunk in chunks:
+        profiler.feed(chunk)
+    return profiler.finish()
+
+
+def _split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _column(profile, name):
+    return next(column for column in profile["columns"] if column["name"] == name)
+
+
+def test_newlines_inside_quotes_do_not_end_records():
+    profile = _profile([QUOTED])
+    assert [column["name"] for column in profile["columns"]] == ["id", "note", "amount"]
+    assert profile["rowsProfiled"] == 3
+    assert _column(profile, "note")["samples"] == ["first line\nsecond line", 'say "hi", then\r\nleave', "plain"]
+    assert _column(profile, "amount")["type"] == "FLOAT"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 13])
+def test_small_chunks_keep_quote_parity(size):
+    assert _profile(_split(QUOTED, size)) == _profile([QUOTED])
+
+
+def test_every_split_point_gives_the_same_profile():
+    expected = _profile([QUOTED])
+    for i in range(1, len(QUOTED)):
+        assert _profile([QUOTED[:i], QUOTED[i:]]) == expected, f"split at byte {i}"
+
+
+def test_bom_and_multibyte_characters_split_across_chunks():
+    data = '\ufeffcity,"quote"\n"Zürich","a ""€"" sign\nhere"\nKøbenhavn,x\n'.encode("utf-8")
+    profile = _profile(_split(data, 1))
+    assert [column["name"] for column in profile["columns"]] == ["city", "quote"]
+    assert _column(profile, "city")["samples"] == ["Zürich", "København"]
+    assert _column(profile, "quote")["samples"] == ['a "€" sign\nhere', "x"]
+
+
+def test_last_record_without_trailing_newline_is_counted():
+    profile = _profile(_split(b'a,b\n1,"x\ny"\n2,"z"', 4))
+    assert profile["rowsProfiled"] == 2
+    assert _column(profile, "b")["samples"] == ["x\ny", "z"]
+
+
+def test_profiling_stops_at_max_rows_but_counts_every_byte():
+    data = b"n\n" + b"".join(b"%d\n" % i for i in range(50))
+    profile = _profile(_split(data, 7), max_rows=10)
+    assert profile["rowsProfiled"] == 10
+    assert profile["sampled"] is True
+    assert profile["bytes"] == len(data)
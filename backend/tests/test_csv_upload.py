@@ -0,0 +1,106 @@
+import os
+import time
+from decimal import Decimal
+import pytest
+import upload_transform
+from csv_intake import CsvProfiler, read_csv_header
+from upload_mapping import match_plan
+from upload_transform import ParquetTransform, purge_expired_reports, rejects_report_path
+from warehouse import DuckDBWarehouse
+
+# Spreadsheet exports often put a space after each comma of the header
+SPACED = (
+    "date_key, product_key, store_key, qty_sold, net_sales\n"
+    "20240101, 7, 3, 2, 19.98\n"
+    "20240102, 8, 3, 1, 4.50\n"
+)
+SCHEMAS = {
+    "FACT_SALES": {"DATE_KEY": "NUMBER(38,0)", "PRODUCT_KEY": "NUMBER(38,0)", "STORE_KEY": "NUMBER(38,0)",
+                   "QTY_SOLD": "NUMBER(38,0)", "NET_SALES": "NUMBER(12,2)"},
+    "DIM_STORE": {"STORE_KEY": "NUMBER(38,0)", "STORE_NAME": "TEXT", "REGION": "TEXT"},
+}
+DUCKDB_TYPES = {"DATE_KEY": "INTEGER", "PRODUCT_KEY": "INTEGER", "STORE_KEY": "INTEGER",
+                "QTY_SOLD": "INTEGER", "NET_SALES": "DECIMAL(12,2)"}
+
+
+@pytest.fixture
+def spaced_csv(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text(SPACED)
+    return str(path)
+
+
+@pytest.fixture
+def warehouse():
+    warehouse = DuckDBWarehouse(":memory:", "MART", parquet_dir=None)
+    con = warehouse.raw_connection()
+    con.execute("CREATE TABLE FACT_SALES (" + ", ".join(f"{c} {t}" for c, t in DUCKDB_TYPES.items()) + ")")
+    return warehouse, con
+
+
+def _plan(path):
+    profiler = CsvProfiler()
+    with open(path, "rb") as f:
+        profiler.feed(f.read())
+    profile = profiler.finish()
+    csv_cols = read_csv_header(path)
+    assert csv_cols == [column["name"] for column in profile["columns"]]
+    plan, _ = match_plan(csv_cols, SCHEMAS, profile)
+    assert plan["suggested_table"] == "FACT_SALES"
+    return csv_cols, {col: target for col, target in plan["column_mapping"].items() if target}
+
+
+def test_header_is_read_like_the_profile(spaced_csv):
+    assert read_csv_header(spaced_csv) == ["date_key", "product_key", "store_key", "qty_sold", "net_sales"]
+
+
+def test_spaced_header_loads_through_the_typed_path(spaced_csv, warehouse, tmp_path):
+    warehouse, con = warehouse
+    _, mapping = _plan(spaced_csv)
+    assert mapping["net_sales"] == "NET_SALES"
+    transform = ParquetTransform(spaced_csv, mapping, SCHEMAS["FACT_SALES"], str(tmp_path),
+                                 str(tmp_path / "rejected.csv"))
+    assert warehouse.bulk_load_parquet(con, transform.parts(), "FACT_SALES") == 2
+    assert transform.summary["rowsRejected"] == 0
+    assert con.execute("SELECT SUM(QTY_SOLD), SUM(NET_SALES) FROM FACT_SALES").fetchone() == (3, Decimal("24.48"))
+
+
+def test_spaced_header_loads_through_the_raw_csv_path(spaced_csv, warehouse):
+    warehouse, con = warehouse
+    csv_cols, mapping = _plan(spaced_csv)
+    warehouse.bulk_load(con, spaced_csv, "FACT_SALES", csv_cols, mapping)
+    assert con.execute("SELECT COUNT(NET_SALES), SUM(STORE_KEY) FROM FACT_SALES").fetchone() == (2, 6)
+
+
+def test_raw_csv_files_load_per_table_with_per_file_counts(spaced_csv, warehouse, tmp_path):
+    warehouse, con = warehouse
+    csv_cols, mapping = _plan(spaced_csv)
+    second = tmp_path / "more_sales.csv"
+    second.write_text(SPACED + "20240103, 9, 4, 5, 10.00\n")
+    results = warehouse.bulk_load_csv_tables(con, {
+        "FACT_SALES": [("f0000", spaced_csv, csv_cols, mapping), ("f0001", str(second), csv_cols, mapping)],
+        "MISSING": [("f0002", spaced_csv, csv_cols, mapping)],
+    })
+    assert results["FACT_SALES"] == ({"f0000": 2, "f0001": 3}, None)
+    loaded, error = results["MISSING"]
+    assert loaded == {} and error is not None
+    assert con.execute("SELECT COUNT(*) FROM FACT_SALES").fetchone() == (5,)
+
+
+def test_rejected_rows_reports_expire(spaced_csv, monkeypatch, tmp_path):
+    monkeypatch.setattr(upload_transform, "REJECTS_DIR", str(tmp_path / "rejects"))
+    monkeypatch.setattr(upload_transform, "REJECTS_RETENTION_SECONDS", 60)
+    bad = tmp_path / "bad.csv"
+    bad.write_text(SPACED + "20240103, 9, 4, two, 10.00\n")
+    _, mapping = _plan(spaced_csv)
+    transform = ParquetTransform(str(bad), mapping, SCHEMAS["FACT_SALES"], str(tmp_path), rejects_report_path(str(bad)))
+    list(transform.parts())
+    report = transform.summary["report"]
+    assert os.path.dirname(report) == str(tmp_path / "rejects") and report.endswith("_bad.csv.rejected.csv")
+    assert transform.summary["rowsRejected"] == 1
+
+    purge_expired_reports()
+    assert os.path.exists(report)
+    os.utime(report, (time.time() - 120, time.time() - 120))
+    purge_expired_reports()
+    assert not os.path.exists(report)
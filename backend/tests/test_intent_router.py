@@ -0,0 +1,49 @@
+import pytest
+import intent_router
+from intent_router import classify_intent
+from schema_pruner import render_agent_schema
+
+SCHEMA = render_agent_schema({
+    "FACT_SALES_DAILY": [("DATE_KEY", "NUMBER(38,0)"), ("PRODUCT_KEY", "NUMBER(38,0)"), ("STORE_KEY", "NUMBER(38,0)"),
+                         ("QTY_SOLD", "NUMBER(38,0)"), ("NET_SALES", "NUMBER(12,2)")],
+    "DIM_PRODUCT": [("PRODUCT_KEY", "NUMBER(38,0)"), ("PRODUCT_NAME", "TEXT"), ("CATEGORY", "TEXT"),
+                    ("UNIT_PRICE", "NUMBER(10,2)")],
+    "DIM_STORE": [("STORE_KEY", "NUMBER(38,0)"), ("STORE_NAME", "TEXT"), ("CITY", "TEXT")],
+})
+
+
+@pytest.fixture(autouse=True)
+def dimension_values(monkeypatch):
+    # Product and store name words, as loaded from the DIM_*_NAME columns
+    words = {"milk", "pasta", "princeton"}
+    monkeypatch.setattr(intent_router._dimension_vocabulary, "words", lambda db_schema: words)
+
+
+@pytest.mark.parametrize("question", [
+    "what were net sales by store last week",
+    "top 5 products by units sold",
+    "how many units of milk did we sell",
+    "what is the average unit price",
+])
+def test_metric_questions_are_data_queries(question):
+    assert classify_intent(question, SCHEMA) == ("data_query", "vocabulary")
+
+
+@pytest.mark.parametrize("question", [
+    "how do I cook pasta?",  # off-topic phrase about a product: the rules disagree
+    "tell me a joke about milk",
+    "what is the price of gold",  # a column word, but "gold" is nothing we sell
+    "whats new with you",
+    "how is milk selling in princeton",  # value words alone are not enough
+])
+def test_unclear_questions_go_to_the_model(question):
+    assert classify_intent(question, SCHEMA) == (None, "llm")
+
+
+@pytest.mark.parametrize("question", ["capital of new jersey", "what's the weather"])
+def test_off_topic_without_data_words(question):
+    assert classify_intent(question, SCHEMA) == ("off_topic", "rules")
+
+
+def test_greeting():
+    assert classify_intent("thanks aura!", SCHEMA) == ("greeting", "rules")
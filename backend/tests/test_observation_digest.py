@@ -0,0 +1,44 @@
+import observation_digest
+from observation_digest import build_observation_context, digest_result
+
+
+def _result(columns, rows, truncated=False):
+    return {"columns": columns, "rows": rows, "truncated": truncated}
+
+
+def test_digest_sums_measures_and_reports_the_trend():
+    result = _result(["SALE_DATE", "STORE_NAME", "NET_SALES"],
+                     [["2025-01-02", "A", 20.0], ["2025-01-01", "B", 10.0], ["2025-01-03", "A", 30.0]])
+    digest = digest_result(result)
+    assert "Rows: 3" in digest
+    assert "NET_SALES over all rows: total=60, min=10, max=30, mean=20" in digest
+    assert "Trend of NET_SALES by SALE_DATE: 2025-01-01 = 10 -> 2025-01-03 = 30 (+200.0%)" in digest
+
+
+def test_duplicate_column_names_are_digested_by_position():
+    # e.g. SELECT * over a join: both sides have STORE_KEY and NET_SALES
+    result = _result(["STORE_KEY", "NET_SALES", "STORE_KEY", "NET_SALES", "SALE_DATE"],
+                     [[1, 10.0, 1, 5.0, "2025-01-01"], [2, 20.0, 2, 7.0, "2025-01-02"]])
+    digest = digest_result(result)
+    assert "NET_SALES (column 2) over all rows: total=30" in digest
+    assert "NET_SALES (column 4) over all rows: total=12" in digest
+    assert "Trend of NET_SALES (column 4) by SALE_DATE: 2025-01-01 = 5 -> 2025-01-02 = 7" in digest
+    assert "STORE_KEY | NET_SALES | STORE_KEY | NET_SALES | SALE_DATE" in digest
+
+
+def test_context_falls_back_to_the_cut_observation_when_digesting_fails(monkeypatch):
+    def broken(result, top_n):
+        raise TypeError("cannot digest")
+
+    monkeypatch.setattr(observation_digest, "digest_result", broken)
+    observation = "A | B\n" + "\n".join(f"{i} | {i}" for i in range(1000))
+    result = _result(["A", "B"], [[i, i] for i in range(1000)])
+    context = build_observation_context([(1, "q", observation, result)], token_budget=100)
+    assert context.startswith("Observation 1 (from question 'q'):\nA | B\n0 | 0\n")
+    assert "[Observation cut to fit the prompt budget.]" in context
+    assert len(context) < 500
+
+
+def test_small_observations_are_kept_verbatim():
+    context = build_observation_context([(1, "q", "A\n1", _result(["A"], [[1]]))])
+    assert context == "Observation 1 (from question 'q'):\nA\n1\n\n"
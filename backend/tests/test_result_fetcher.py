@@ -0,0 +1,61 @@
+import pytest
+from result_fetcher import limit_query
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM t", "SELECT * FROM t\nLIMIT 11"),
+    ("SELECT * FROM t;", "SELECT * FROM t\nLIMIT 11"),
+    ("SELECT * FROM t /* c */ ;  ", "SELECT * FROM t\nLIMIT 11"),
+    ("SELECT * FROM t; -- done", "SELECT * FROM t\nLIMIT 11"),
+    ("SELECT * FROM t -- limit 5", "SELECT * FROM t\nLIMIT 11"),
+    ("-- leading comment\nSELECT 1", "-- leading comment\nSELECT 1\nLIMIT 11"),
+    ("with x as (select 1 a) select a from x", "with x as (select 1 a) select a from x\nLIMIT 11"),
+])
+def test_appends_limit_after_trailing_semicolons_and_comments(sql, expected):
+    assert limit_query(sql, max_rows=10) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "select a from t limit 5",
+    "SELECT a FROM t ORDER BY a FETCH FIRST 3 ROWS ONLY",
+    "SELECT TOP 10 a FROM t",
+    "SELECT a /* ) */ FROM t LIMIT 5",
+    "SELECT ')' FROM t LIMIT 5",
+    'SELECT "a(" FROM t LIMIT 5',
+    "(SELECT 1) UNION (SELECT 2 LIMIT 1)",
+])
+def test_keeps_queries_with_a_top_level_limit(sql):
+    assert limit_query(sql, max_rows=10) == sql
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM (SELECT a FROM t LIMIT 5) s",
+    "WITH x AS (SELECT a FROM t LIMIT 5) SELECT * FROM x",
+    "SELECT a FROM t WHERE b IN (SELECT c FROM u FETCH FIRST 1 ROWS ONLY) ORDER BY a",
+])
+def test_limit_inside_subquery_or_cte_does_not_count(sql):
+    assert limit_query(sql, max_rows=10) == sql + "\nLIMIT 11"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 'limit 5' AS note FROM t",
+    'SELECT "LIMIT" FROM t',
+    "SELECT 'top; fetch' FROM t",
+])
+def test_limit_words_in_literals_and_identifiers_do_not_count(sql):
+    assert limit_query(sql, max_rows=10) == sql + "\nLIMIT 11"
+
+
+def test_semicolon_inside_a_string_is_kept():
+    assert limit_query("SELECT 'it''s; over' FROM t;", max_rows=10) == "SELECT 'it''s; over' FROM t\nLIMIT 11"
+
+
+@pytest.mark.parametrize("sql", [
+    "INSERT INTO t SELECT * FROM s",
+    "SHOW TABLES",
+    "DESCRIBE TABLE t",
+    "",
+    "  ",
+])
+def test_non_select_statements_are_unchanged(sql):
+    assert limit_query(sql, max_rows=10) == sql
@@ -0,0 +1,18 @@
+from schema_pruner import parse_agent_schema, render_agent_schema
+
+TABLES = {
+    "FACT_SALES_DAILY": [("DATE_KEY", "NUMBER(38,0)"), ("NET_SALES", "NUMBER(12,2)"), ("LOAD_TS", "TIMESTAMP_NTZ")],
+    "DIM_PRODUCT": [("PRODUCT_KEY", "NUMBER(38,0)"), ("PRODUCT_NAME", "TEXT"), ("SKU", "VARCHAR(16)"),
+                    ("UNIT_PRICE", "DECIMAL(10, 2)")],
+}
+
+
+def test_parameterized_types_round_trip():
+    rendered = render_agent_schema(TABLES)
+    assert "NET_SALES (NUMBER(12,2))" in rendered
+    assert parse_agent_schema(rendered) == TABLES
+
+
+def test_plain_types_parse():
+    schema = "Table: DIM_STORE\nColumns: STORE_KEY (NUMBER), STORE_NAME (TEXT)"
+    assert parse_agent_schema(schema) == {"DIM_STORE": [("STORE_KEY", "NUMBER"), ("STORE_NAME", "TEXT")]}
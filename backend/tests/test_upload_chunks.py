@@ -0,0 +1,67 @@
+import csv
+import io
+import pytest
+import upload_chunks
+from upload_chunks import chunk_ranges
+
+ROWS = [[str(i), f"line {i}\nstill {i}" if i % 3 == 0 else f'say "{i}", ok' if i % 3 == 1 else f"v{i}", "x"]
+        for i in range(40)]
+
+
+def _write_csv(path, rows, trailing_newline=True):
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["id", "note", "flag"])
+    writer.writerows(rows)
+    text = buffer.getvalue() if trailing_newline else buffer.getvalue().rstrip("\n")
+    path.write_bytes(text.encode("utf-8"))
+    return path.read_bytes()
+
+
+def _records(header: bytes, piece: bytes):
+    return list(csv.reader(io.StringIO((header + piece).decode("utf-8"), newline="")))[1:]
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 16, 50, 10_000])
+@pytest.mark.parametrize("scan_block", [3, 8, 64, 8 * 1024 * 1024])
+def test_chunks_end_on_record_boundaries(tmp_path, monkeypatch, chunk_bytes, scan_block):
+    # Small scan blocks make quoted fields straddle block boundaries
+    monkeypatch.setattr(upload_chunks, "SCAN_BLOCK_BYTES", scan_block)
+    data = _write_csv(tmp_path / "data.csv", ROWS)
+    header, ranges = chunk_ranges(str(tmp_path / "data.csv"), chunk_bytes)
+
+    assert header == b"id,note,flag\n"
+    assert ranges[0][0] == len(header) and ranges[-1][1] == len(data)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(end - start >= chunk_bytes for start, end in ranges[:-1])
+
+    records = []
+    for start, end in ranges:
+        assert data[end - 1:end] == b"\n"
+        records.extend(_records(header, data[start:end]))
+    assert records == ROWS
+
+
+def test_quoted_newline_at_the_target_is_not_cut(tmp_path):
+    data = _write_csv(tmp_path / "data.csv", [["1", "aaaa\nbbbb\ncccc", "x"], ["2", "short", "y"]])
+    header, ranges = chunk_ranges(str(tmp_path / "data.csv"), chunk_bytes=len("1,\"aaaa\n"))
+    assert [_records(header, data[start:end]) for start, end in ranges] == [
+        [["1", "aaaa\nbbbb\ncccc", "x"]], [["2", "short", "y"]]]
+
+
+def test_last_record_without_trailing_newline(tmp_path):
+    data = _write_csv(tmp_path / "data.csv", ROWS, trailing_newline=False)
+    header, ranges = chunk_ranges(str(tmp_path / "data.csv"), chunk_bytes=30)
+    assert ranges[-1][1] == len(data)
+    assert [row for start, end in ranges for row in _records(header, data[start:end])] == ROWS
+
+
+def test_header_only_file_has_no_ranges(tmp_path):
+    _write_csv(tmp_path / "data.csv", [])
+    assert chunk_ranges(str(tmp_path / "data.csv"), chunk_bytes=10) == (b"id,note,flag\n", [])
+
+
+def test_small_file_is_one_range(tmp_path):
+    data = _write_csv(tmp_path / "data.csv", ROWS)
+    header, ranges = chunk_ranges(str(tmp_path / "data.csv"), chunk_bytes=len(data))
+    assert ranges == [(len(header), len(data))]
@@ -0,0 +1,110 @@
+import os
+import gzip
+import shutil
+
+# --- Upload Chunking Configuration ---
+
+# Uncompressed size of each staged piece of a CSV upload
+UPLOAD_CHUNK_BYTES = int(float(os.getenv("AURA_UPLOAD_CHUNK_MB", "128")) * 1024 * 1024)
+# Compression of the staged pieces: gzip, zstd (needs the zstandard package) or none
+UPLOAD_COMPRESSION = os.getenv("AURA_UPLOAD_COMPRESSION", "gzip").lower()
+UPLOAD_COMPRESSION_LEVEL = int(os.getenv("AURA_UPLOAD_COMPRESSION_LEVEL", "3"))
+# Pieces compressed and staged at the same time
+UPLOAD_PARALLELISM = int(os.getenv("AURA_UPLOAD_PARALLELISM", "4"))
+
+SCAN_BLOCK_BYTES = 8 * 1024 * 1024
+COPY_BUFFER_BYTES = 1024 * 1024
+
+# compression -> (file suffix, Snowflake SOURCE_COMPRESSION name)
+COMPRESSIONS = {
+    "gzip": (".gz", "GZIP"),
+    "zstd": (".zst", "ZSTD"),
+    "none": ("", "NONE"),
+}
+
+
+def resolve_compression(compression: str = UPLOAD_COMPRESSION):
+    """The compression to use; zstd falls back to gzip when zstandard is not installed."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown AURA_UPLOAD_COMPRESSION '{compression}' (expected gzip, zstd or none).")
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            print("⚠️  zstandard is not installed; compressing upload chunks with gzip instead.")
+            return "gzip"
+    return compression
+
+
+def chunk_ranges(file_path: str, chunk_bytes: int = UPLOAD_CHUNK_BYTES):
+    """
+    Splits a CSV into roughly `chunk_bytes`-sized byte ranges that each end on a
+    record boundary. A newline only ends a record outside double quotes, so quoted
+    fields with embedded newlines are never cut. Returns (header, [(start, end)]).
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        chunk_start = position = f.tell()
+        target = chunk_start + chunk_bytes
+        ranges, quotes = [], 0
+        while target < size:
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            search_from = max(0, target - position)
+            while search_from < len(block):
+                newline = block.find(b"\n", search_from)
+                if newline < 0:
+                    break
+                if (quotes + block.count(b'"', 0, newline)) % 2:
+                    search_from = newline + 1  # inside a quoted field
+                    continue
+                ranges.append((chunk_start, position + newline + 1))
+                chunk_start = position + newline + 1
+                target = chunk_start + chunk_bytes
+                search_from = max(newline + 1, target - position)
+            quotes += block.count(b'"')
+            position += len(block)
+    if chunk_start < size:
+        ranges.append((chunk_start, size))
+    return header, ranges
+
+
+def _open_compressed(path: str, compression: str):
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=max(1, min(9, UPLOAD_COMPRESSION_LEVEL)))
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=UPLOAD_COMPRESSION_LEVEL).stream_writer(open(path, "wb"), closefd=True)
+    return open(path, "wb")
+
+
+def write_chunk(file_path: str, header: bytes, start: int, end: int, target: str, compression: str):
+    """Writes the header plus bytes [start, end) of `file_path` to `target`, compressed. Returns its size."""
+    with open(file_path, "rb") as source, _open_compressed(target, compression) as out:
+        out.write(header)
+        source.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = source.read(min(COPY_BUFFER_BYTES, remaining))
+            if not data:
+                break
+            out.write(data)
+            remaining -= len(data)
+    return os.path.getsize(target)
+
+
+def chunk_file_name(prefix: str, index: int, compression: str):
+    return f"{prefix}_part{index:04d}.csv{COMPRESSIONS[compression][0]}"
+
+
+def remove_quietly(path: str):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except OSError:
+        pass
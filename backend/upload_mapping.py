@@ -0,0 +1,154 @@
+import os
+import re
+import hashlib
+import difflib
+import threading
+from cache_store import make_cache
+from schema_catalog import get_catalog
+from schema_pruner import tokenize, SYNONYMS
+from upload_transform import target_kind
+from telemetry import increment
+
+# --- Upload Mapping Configuration ---
+
+# SQLite file of confirmed upload plans, shared by all workers and kept across restarts ("" = in memory)
+MAPPING_STORE_PATH = os.getenv("AURA_MAPPING_STORE_PATH",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "upload_mappings.sqlite"))
+# Confirmed plans are forgotten after this many days without being stored again
+MAPPING_TTL_DAYS = float(os.getenv("AURA_MAPPING_TTL_DAYS", "90"))
+# Local matcher plans at or above this confidence are used without asking the LLM (1.01 = always ask)
+MAPPING_MIN_CONFIDENCE = float(os.getenv("AURA_MAPPING_MIN_CONFIDENCE", "0.7"))
+# ... and only if the best table beats the runner-up by this much
+MAPPING_MIN_MARGIN = float(os.getenv("AURA_MAPPING_MIN_MARGIN", "0.15"))
+
+MIN_COLUMN_SCORE = 0.5  # weaker column matches are left unmapped
+_ID_TOKENS = {"key", "id"}
+
+_store = make_cache(MAPPING_STORE_PATH or None, max_bytes=16 * 1024 * 1024, max_entries=10000,
+                    default_ttl=MAPPING_TTL_DAYS * 86400)
+_plan_counts = {"memory": 0, "matcher": 0, "llm": 0}
+_counts_lock = threading.Lock()
+
+# csv_intake profile type -> {target kind: how plausible the pair is}; missing pairs score 0.3
+_TYPE_FIT = {
+    "INTEGER": {"integer": 1.0, "number": 1.0, "float": 1.0, "text": 0.8, "date": 0.6},
+    "FLOAT": {"number": 1.0, "float": 1.0, "integer": 0.5, "text": 0.8},
+    "BOOLEAN": {"boolean": 1.0, "text": 0.8},
+    "DATE": {"date": 1.0, "timestamp": 1.0, "timestamp_tz": 1.0, "text": 0.8},
+    "TIMESTAMP": {"timestamp": 1.0, "timestamp_tz": 1.0, "date": 0.7, "text": 0.8},
+    "STRING": {"text": 1.0},
+}
+
+
+def header_key(csv_cols: list, schema_name: str):
+    """Store key for a CSV header (case and surrounding spaces ignored) against the current schema."""
+    header = "\x1f".join(col.strip().lower() for col in csv_cols)
+    raw = f"{header}\n{schema_name.upper()}\n{get_catalog(schema_name).fingerprint()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _record(source: str):
+    with _counts_lock:
+        _plan_counts[source] += 1
+    increment("aura_upload_plans_total", help_text="Upload plans by where they came from.", source=source)
+
+
+def lookup_plan(csv_cols: list, schema_name: str):
+    """Returns the plan confirmed earlier for this exact header and schema, or None."""
+    plan = _store.get(header_key(csv_cols, schema_name))
+    if plan is not None:
+        _record("memory")
+    return plan
+
+
+def remember_plan(csv_cols: list, schema_name: str, table_name: str, column_mapping: dict):
+    """Stores a plan the user confirmed (and that loaded) for the next file with this header."""
+    mapping = {col: column_mapping.get(col) for col in csv_cols}
+    _store.set(header_key(csv_cols, schema_name), {"suggested_table": table_name, "column_mapping": mapping},
+               tags=[f"schema:{schema_name.upper()}"])
+
+
+# --- Local Matcher ---
+
+def _squash(name: str):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _core_tokens(name: str):
+    tokens = set(tokenize(name))
+    return (tokens - _ID_TOKENS) or tokens
+
+
+def name_similarity(csv_col: str, db_col: str):
+    """0..1 similarity of a CSV header and a column name, through tokens, synonyms and spelling."""
+    a, b = _squash(csv_col), _squash(db_col)
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    csv_tokens, db_tokens = _core_tokens(csv_col), _core_tokens(db_col)
+    # Synonyms are stemmed like the column tokens ("sales" -> "sale") before comparing
+    expanded = {token: {token, *tokenize(" ".join(SYNONYMS.get(token, ())))} for token in csv_tokens}
+    matched_csv = sum(1 for options in expanded.values() if options & db_tokens)
+    matched_db = len(db_tokens & set().union(*expanded.values()))
+    overlap = (matched_csv / len(csv_tokens) + matched_db / len(db_tokens)) / 2
+    spelling = difflib.SequenceMatcher(None, a, b).ratio()
+    return max(0.95 * overlap, 0.9 * spelling)
+
+
+def _type_fit(profile_type: str, dtype: str):
+    if not profile_type or profile_type == "UNKNOWN":
+        return 1.0
+    return _TYPE_FIT.get(profile_type, {}).get(target_kind(dtype), 0.3)
+
+
+def _match_table(csv_cols: list, columns: dict, profile_types: dict):
+    """One-to-one greedy assignment of CSV columns to table columns. Returns (score, mapping)."""
+    pairs = []
+    for csv_col in csv_cols:
+        for db_col, dtype in columns.items():
+            score = name_similarity(csv_col, db_col) * _type_fit(profile_types.get(csv_col), dtype)
+            if score >= MIN_COLUMN_SCORE:
+                pairs.append((score, csv_col, db_col))
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    mapping, used, total = {col: None for col in csv_cols}, set(), 0.0
+    for score, csv_col, db_col in pairs:
+        if mapping[csv_col] is None and db_col not in used:
+            mapping[csv_col] = db_col
+            used.add(db_col)
+            total += score
+    return total / max(1, len(csv_cols)), mapping
+
+
+def match_plan(csv_cols: list, all_db_schemas: dict, profile: dict = None):
+    """
+    Scores every table by how well its columns cover the CSV header (name and
+    type similarity) and returns (plan, confidence), where confidence is the
+    best table's mean column score, or (None, 0.0) when nothing matched.
+    """
+    profile_types = {column["name"]: column["type"] for column in (profile or {}).get("columns", [])}
+    scored = []
+    for table, columns in (all_db_schemas or {}).items():
+        score, mapping = _match_table(csv_cols, columns, profile_types)
+        if score > 0:
+            scored.append((score, table, mapping))
+    if not scored:
+        return None, 0.0
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    best_score, table, mapping = scored[0]
+    runner_up = scored[1][0] if len(scored) > 1 else 0.0
+    plan = {"suggested_table": table, "column_mapping": mapping,
+            "confident": best_score >= MAPPING_MIN_CONFIDENCE and best_score - runner_up >= MAPPING_MIN_MARGIN}
+    return plan, round(best_score, 3)
+
+
+def record_plan_source(source: str):
+    """Counts a plan produced by the matcher or the LLM (memory hits count themselves)."""
+    _record(source)
+
+
+def mapping_stats():
+    """Returns where upload plans came from and the size of the confirmed-plan store."""
+    with _counts_lock:
+        counts = dict(_plan_counts)
+    return {"plans": counts, "store": _store.stats()}
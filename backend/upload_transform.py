@@ -0,0 +1,285 @@
+import os
+import re
+import csv
+import time
+import uuid
+import tempfile
+from decimal import Decimal, InvalidOperation, Context
+import pandas as pd
+from csv_intake import NULL_TOKENS, read_csv_header
+
+# --- Upload Transform Configuration ---
+
+# Coerce uploads to the target column types and load them as Parquet (0 = stage the raw CSV)
+UPLOAD_TRANSFORM = os.getenv("AURA_UPLOAD_TRANSFORM", "1") == "1"
+# Rows converted (and written to one Parquet part) at a time
+TRANSFORM_CHUNK_ROWS = int(os.getenv("AURA_TRANSFORM_CHUNK_ROWS", "250000"))
+# Where rejected-rows reports are written, and how long they stay downloadable
+REJECTS_DIR = os.getenv("AURA_REJECTS_DIR", os.path.join(tempfile.gettempdir(), "aura_rejects"))
+REJECTS_RETENTION_SECONDS = float(os.getenv("AURA_REJECTS_RETENTION_SECONDS", "86400"))
+
+REJECT_EXAMPLES = 5
+READ_BLOCK_BYTES = 16 * 1024 * 1024
+MAX_PRECISION = 38  # widest NUMBER / DECIMAL in Snowflake and DuckDB
+INT64_DIGITS = 18  # integer columns up to this precision are loaded as Int64
+
+_TRUE = {"true", "t", "yes", "y", "1"}
+_FALSE = {"false", "f", "no", "n", "0"}
+# Digits that always fit the integer types DuckDB reports (Snowflake reports them all as NUMBER(38,0))
+_INTEGER_DIGITS = {"TINYINT": 2, "BYTEINT": 2, "UTINYINT": 2, "SMALLINT": 4, "USMALLINT": 4,
+                   "INT": 9, "INTEGER": 9, "UINTEGER": 9, "BIGINT": 18, "UBIGINT": 19, "HUGEINT": 38}
+_FLOAT_TYPES = {"FLOAT", "FLOAT4", "FLOAT8", "DOUBLE", "DOUBLE PRECISION", "REAL"}
+_TZ_TIMESTAMPS = {"TIMESTAMP_TZ", "TIMESTAMP_LTZ", "TIMESTAMPTZ", "TIMESTAMPLTZ", "TIMESTAMP WITH TIME ZONE"}
+_WIDE = Context(prec=2 * MAX_PRECISION)
+
+
+def target_spec(dtype: str):
+    """
+    Maps a Snowflake (or DuckDB) type name to (kind, precision, scale), where kind
+    is integer, number, float, boolean, date, timestamp, timestamp_tz or text and
+    precision/scale are only set for integer and number.
+    """
+    name = (dtype or "").upper().strip()
+    base = name.split("(")[0].strip()
+    if base in _INTEGER_DIGITS:
+        return "integer", _INTEGER_DIGITS[base], 0
+    if base in ("NUMBER", "DECIMAL", "NUMERIC"):
+        # A bare NUMBER is NUMBER(38,0) in Snowflake
+        args = [int(arg) for arg in re.findall(r"\d+", name[len(base):])]
+        precision, scale = (args + [MAX_PRECISION, 0][len(args):])[:2]
+        precision = min(precision, MAX_PRECISION)
+        return ("integer" if scale == 0 else "number"), precision, scale
+    if base in _FLOAT_TYPES:
+        return "float", None, None
+    if base in ("BOOLEAN", "BOOL"):
+        return "boolean", None, None
+    if base == "DATE":
+        return "date", None, None
+    if base in _TZ_TIMESTAMPS:
+        return "timestamp_tz", None, None
+    if base.startswith("TIMESTAMP") or base == "DATETIME":
+        return "timestamp", None, None
+    return "text", None, None
+
+
+def target_kind(dtype: str):
+    """The kind part of target_spec()."""
+    return target_spec(dtype)[0]
+
+
+def _parse_datetimes(values: pd.Series, keep_tz: bool):
+    # One inferred format for the whole chunk (vectorized); only values that do not
+    # fit it are retried element by element. Values without an offset are taken as UTC.
+    parsed = pd.to_datetime(values, errors="coerce", utc=True)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors="coerce", utc=True, format="mixed")
+    # TIMESTAMP_TZ / LTZ keep the instant; TIMESTAMP_NTZ gets the UTC wall-clock time
+    return parsed if keep_tz else parsed.dt.tz_localize(None)
+
+
+def _exact_decimal(text, precision: int, scale: int):
+    """`text` as a Decimal with `scale` places, or None if it is not a number or would lose digits."""
+    try:
+        value = Decimal(text)
+        if not value.is_finite():
+            return None
+        quantized = value.quantize(Decimal(1).scaleb(-scale), context=_WIDE)
+    except (InvalidOperation, ValueError):
+        return None
+    if quantized != value or (quantized and quantized.adjusted() >= precision - scale):
+        return None
+    return quantized
+
+
+def _parse_decimals(values: pd.Series, precision: int, scale: int):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    target = pa.decimal128(precision, scale)
+    try:
+        # Vectorized; raises if any value is not a number, overflows or needs rounding
+        parsed = pc.cast(pa.array(values, type=pa.string(), from_pandas=True), target)
+    except pa.ArrowInvalid:
+        parsed = pa.array([None if pd.isna(text) else _exact_decimal(text, precision, scale) for text in values],
+                          type=target)
+    if scale == 0 and precision <= INT64_DIGITS:
+        return pd.Series(parsed.cast(pa.int64()).to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get),
+                         index=values.index)
+    return pd.Series(pd.arrays.ArrowExtensionArray(parsed), index=values.index)
+
+
+def coerce_column(raw: pd.Series, kind: str, precision: int = None, scale: int = None):
+    """
+    Converts a column of CSV strings to `kind` with vectorized casts. Returns
+    (typed values, mask of values that are present but could not be converted).
+    Integers and numbers must fit NUMBER(precision, scale) without rounding.
+    """
+    stripped = raw.str.strip()
+    nulls = raw.isna() | stripped.str.lower().isin(NULL_TOKENS)
+    present = stripped.where(~nulls)
+
+    if kind == "text":
+        return raw.where(~nulls), pd.Series(False, index=raw.index)
+    if kind == "boolean":
+        lowered = present.str.lower()
+        values = pd.Series(pd.NA, index=raw.index, dtype="boolean")
+        values[lowered.isin(_TRUE)] = True
+        values[lowered.isin(_FALSE)] = False
+    elif kind in ("date", "timestamp", "timestamp_tz"):
+        values = _parse_datetimes(present, keep_tz=kind == "timestamp_tz")
+    elif kind in ("integer", "number"):
+        values = _parse_decimals(present, precision or MAX_PRECISION, scale or 0)
+    else:
+        values = pd.to_numeric(present, errors="coerce", dtype_backend="numpy_nullable").astype("Float64")
+    failed = values.isna() & ~nulls
+    return values, failed
+
+
+def purge_expired_reports():
+    """Deletes rejected-rows reports older than the retention window."""
+    cutoff = time.time() - REJECTS_RETENTION_SECONDS
+    try:
+        entries = os.listdir(REJECTS_DIR)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        path = os.path.join(REJECTS_DIR, entry)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass  # another worker purged it first
+
+
+def rejects_report_path(file_path: str):
+    """
+    Path of the rejected-rows report for an upload, in REJECTS_DIR. The random
+    prefix keeps report names unguessable for the download route.
+    """
+    purge_expired_reports()
+    os.makedirs(REJECTS_DIR, exist_ok=True)
+    return os.path.join(REJECTS_DIR, f"{uuid.uuid4().hex}_{os.path.basename(file_path)}.rejected.csv")
+
+
+class ParquetTransform:
+    """
+    Turns an uploaded CSV into typed Parquet parts for a by-name load: mapped
+    columns are read in chunks as strings, coerced to the target table's types
+    and renamed to the target columns. Rows with a value that does not convert
+    (or a malformed line) go to a rejected-rows CSV instead of being dropped.
+    """
+
+    def __init__(self, file_path: str, column_mapping: dict, target_types: dict, out_dir: str,
+                 report_path: str, chunk_rows: int = TRANSFORM_CHUNK_ROWS, part_prefix: str = ""):
+        self.file_path = file_path
+        self.column_mapping = column_mapping  # csv column -> target column
+        self.types = {target: target_types.get(target.upper()) or "TEXT" for target in column_mapping.values()}
+        self.specs = {target: target_spec(dtype) for target, dtype in self.types.items()}
+        self.out_dir = out_dir
+        self.report_path = report_path
+        self.chunk_rows = chunk_rows
+        self.part_prefix = part_prefix  # tells apart the parts of several files sharing out_dir
+        self.summary = {"rowsRead": 0, "rowsWritten": 0, "rowsRejected": 0, "malformedRows": 0,
+                        "rejectedByColumn": {}, "examples": [], "report": None, "parts": 0}
+        self._report = None
+        self._report_writer = None
+        self._malformed = []
+
+    def _reject(self, row: dict, row_number, column: str, reason: str):
+        if self._report_writer is None:
+            self._report = open(self.report_path, "w", newline="")
+            self._report_writer = csv.writer(self._report)
+            self._report_writer.writerow(["_row", "_column", "_reason", *self.column_mapping])
+            self.summary["report"] = self.report_path
+        self._report_writer.writerow([row_number, column, reason, *(row.get(col) for col in self.column_mapping)])
+        if len(self.summary["examples"]) < REJECT_EXAMPLES:
+            self.summary["examples"].append({"row": row_number, "column": column, "reason": reason})
+        if column:
+            by_column = self.summary["rejectedByColumn"]
+            by_column[column] = by_column.get(column, 0) + 1
+        self.summary["rowsRejected"] += 1
+
+    def _on_invalid_row(self, row):
+        # Called by the pyarrow reader for lines with the wrong number of fields
+        self._malformed.append(row)
+        return "skip"
+
+    def _flush_malformed(self):
+        # pyarrow reports physical line numbers, which differ from data row numbers
+        for row in self._malformed:
+            self.summary["malformedRows"] += 1
+            self._reject({}, None, None, f"malformed line {row.number}: expected {row.expected_columns} "
+                                         f"fields, got {row.actual_columns}")
+        self._malformed = []
+
+    def _batches(self):
+        import pyarrow as pa
+        import pyarrow.csv as pv
+
+        # The header is read here, not by pyarrow, so column names match the mapping (spaces stripped)
+        header = read_csv_header(self.file_path)
+        reader = pv.open_csv(
+            self.file_path,
+            read_options=pv.ReadOptions(block_size=READ_BLOCK_BYTES, encoding="utf8",
+                                        column_names=header, skip_rows=1),
+            parse_options=pv.ParseOptions(newlines_in_values=True, invalid_row_handler=self._on_invalid_row),
+            convert_options=pv.ConvertOptions(column_types={name: pa.string() for name in header},
+                                              include_columns=list(self.column_mapping),
+                                              strings_can_be_null=False, quoted_strings_can_be_null=False),
+        )
+        pending = []
+        pending_rows = 0
+        for batch in reader:
+            pending.append(batch.to_pandas())
+            pending_rows += batch.num_rows
+            if pending_rows >= self.chunk_rows:
+                yield pd.concat(pending, ignore_index=True)
+                pending, pending_rows = [], 0
+        if pending:
+            yield pd.concat(pending, ignore_index=True)
+
+    def parts(self):
+        """Yields the path of each Parquet part as soon as it is written; `summary` is final afterwards."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            for chunk in self._batches():
+                self._flush_malformed()
+
+                typed, failures = {}, {}
+                for csv_col, target in self.column_mapping.items():
+                    typed[target], failures[target] = coerce_column(chunk[csv_col], *self.specs[target])
+                failed = pd.DataFrame(failures)
+                bad_rows = failed.any(axis=1)
+                first_row = self.summary["rowsRead"] + 1
+                self.summary["rowsRead"] += len(chunk)
+
+                if bad_rows.any():
+                    first_failure = failed[bad_rows].idxmax(axis=1)
+                    for index, target in first_failure.items():
+                        row = chunk.loc[index].to_dict()
+                        self._reject(row, first_row + index, target,
+                                     f"cannot convert {row[self._csv_column(target)]!r} to {self.types[target]}")
+
+                good = pd.DataFrame(typed)[~bad_rows]
+                if good.empty:
+                    continue
+                path = os.path.join(self.out_dir, f"{self.part_prefix}part{self.summary['parts']:05d}.parquet")
+                table = pa.Table.from_pandas(good, preserve_index=False)
+                for name in table.column_names:
+                    if self.specs[name][0] == "date":
+                        table = table.set_column(table.column_names.index(name), name,
+                                                 table[name].cast(pa.date32(), safe=False))
+                pq.write_table(table, path)
+                self.summary["rowsWritten"] += len(good)
+                self.summary["parts"] += 1
+                yield path
+            self._flush_malformed()  # lines after the last batch
+        finally:
+            if self._report is not None:
+                self._report.close()
+
+    def _csv_column(self, target: str):
+        return next(csv_col for csv_col, mapped in self.column_mapping.items() if mapped == target)
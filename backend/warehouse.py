@@ -0,0 +1,779 @@
+import os
+import re
+import glob
+import time
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from telemetry import span
+from upload_chunks import (COMPRESSIONS, UPLOAD_PARALLELISM, resolve_compression, chunk_ranges, write_chunk,
+                           chunk_file_name, remove_quietly)
+
+load_dotenv()
+
+# --- Warehouse Configuration ---
+
+# Engine behind every query: "snowflake" (the source of truth) or "duckdb" (a local copy)
+WAREHOUSE_ENGINE = os.getenv("AURA_WAREHOUSE", "snowflake").lower()
+# DuckDB database file; ":memory:" keeps the local copy in RAM
+DUCKDB_PATH = os.getenv("AURA_DUCKDB_PATH", ":memory:")
+# Directory of <TABLE>.parquet files (or <TABLE>/ folders of parts) served as tables by DuckDB
+DUCKDB_PARQUET_DIR = os.getenv("AURA_DUCKDB_PARQUET_DIR")
+DUCKDB_THREADS = int(os.getenv("AURA_DUCKDB_THREADS", "0"))  # 0 = DuckDB default (all cores)
+# Threads the Snowflake connector uses for each PUT
+UPLOAD_PUT_THREADS = int(os.getenv("AURA_UPLOAD_PUT_THREADS", "4"))
+
+
+def _quote_literal(value: str):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _quote_identifier(name: str):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class Warehouse(ABC):
+    """
+    What the backend needs from a SQL engine. Connections follow the Snowflake
+    connector's DB-API shape (cursor() as a context manager, execute, fetch*,
+    description, is_closed, close) and are handed out by the connection pool.
+    """
+
+    name = "warehouse"
+
+    @abstractmethod
+    def connect(self):
+        """Opens a new connection for the pool."""
+        raise NotImplementedError
+
+    def is_connection_error(self, error: Exception):
+        """True if `error` means the connection itself is unusable and must not go back to the pool."""
+        return False
+
+    def fetch_batches(self, cur, batch_rows: int):
+        """Yields lists of row tuples from an executed cursor."""
+        while True:
+            rows = cur.fetchmany(batch_rows)
+            if not rows:
+                return
+            yield rows
+
+    @abstractmethod
+    def arrow_type(self, column):
+        """Arrow type for one `cursor.description` entry, so every exported batch shares a schema."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def table_versions(self, cur, schema_name: str, database: str = None):
+        """Returns {table: last_altered} for every table in a schema."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def table_columns(self, cur, schema_name: str, tables: list, database: str = None):
+        """Returns {table: [(column, data_type)]} in ordinal order for the given tables."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel_query(self, conn):
+        """Stops whatever `conn` is executing; called from another thread while the query runs."""
+        raise NotImplementedError
+
+    def bulk_load(self, cur, file_path: str, table_name: str, csv_columns: list, column_mapping: dict):
+        """
+        Appends a CSV file to a table. `column_mapping` maps CSV columns to target
+        columns; unmapped CSV columns are skipped. Returns the rows loaded, if known.
+        """
+        files, error = self.bulk_load_csv_tables(
+            cur, {table_name: [("file", file_path, csv_columns, column_mapping)]})[table_name]
+        if error is not None:
+            raise error
+        return files.get("file")
+
+    @abstractmethod
+    def bulk_load_csv_tables(self, cur, tables: dict):
+        """
+        Loads raw CSV files into several tables in one go: `tables` maps each table
+        to a list of (key, file path, csv columns, column mapping). Files of a table
+        that share a column layout get a single load statement. Returns {table:
+        ({key: rows loaded, or None if the engine does not say} for the files that
+        loaded, the exception that stopped the others, else None)}.
+        """
+        raise NotImplementedError
+
+    def bulk_load_parquet(self, cur, parts, table_name: str):
+        """
+        Appends Parquet files whose columns are already named and typed like the
+        table's (see upload_transform). `parts` may be a generator; files are
+        consumed as it yields them. Returns the rows loaded, if known.
+        """
+        files, error = self.bulk_load_parquet_tables(cur, {table_name: parts})[table_name]
+        if error is not None:
+            raise error
+        return sum(files.values()) if files is not None else None
+
+    @abstractmethod
+    def bulk_load_parquet_tables(self, cur, tables: dict):
+        """
+        Loads Parquet parts into several tables in one go: `tables` maps each table
+        to an iterable of part paths, and each table gets a single load statement.
+        Returns {table: (rows loaded per part file name, or None if the engine does
+        not say; the exception if that table's load failed, else None)}.
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        return {"engine": self.name}
+
+
+# --- Snowflake ---
+
+class SnowflakeWarehouse(Warehouse):
+    """The production warehouse, reached with the environment credentials."""
+
+    name = "snowflake"
+
+    def connect(self):
+        import snowflake.connector
+
+        load_dotenv()
+        return snowflake.connector.connect(
+            user=os.getenv("SNOWFLAKE_USER"),
+            password=os.getenv("SNOWFLAKE_PASSWORD"),
+            account=os.getenv("SNOWFLAKE_ACCOUNT"),
+            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
+            database=os.getenv("SNOWFLAKE_DATABASE"),
+            schema=os.getenv("SNOWFLAKE_SCHEMA"),
+            # Keep the session token alive while the connection sits idle in the pool
+            client_session_keep_alive=True
+        )
+
+    def is_connection_error(self, error: Exception):
+        from snowflake.connector.errors import DatabaseError, OperationalError, ProgrammingError
+
+        # ProgrammingError (bad SQL, missing object) is a DatabaseError too, but leaves the session usable
+        return isinstance(error, (OperationalError, DatabaseError)) and not isinstance(error, ProgrammingError)
+
+    def fetch_batches(self, cur, batch_rows: int):
+        """Reads Arrow batches when the connector has the pandas extra, else fetchmany."""
+        try:
+            batches = iter(cur.fetch_pandas_batches())
+            first = next(batches, None)
+        except Exception:
+            batches = None  # connector without the pandas extra, or a non-Arrow result
+        if batches is None:
+            yield from super().fetch_batches(cur, batch_rows)
+            return
+        batch = first
+        while batch is not None:
+            batch = batch.astype(object).where(batch.notna(), None)
+            yield list(batch.itertuples(index=False, name=None))
+            batch = next(batches, None)
+
+    def arrow_type(self, column):
+        import pyarrow as pa
+
+        type_code, precision, scale = column[1], column[4], column[5]
+        if type_code == 0:  # FIXED: NUMBER(p, s)
+            return pa.int64() if not scale and (precision or 0) <= 18 else pa.decimal128(38, scale or 0)
+        # Connector type codes (FIELD_TYPES); VARIANT, OBJECT and ARRAY arrive as JSON text
+        utc = pa.timestamp("us", tz="UTC")
+        types = {1: pa.float64(), 2: pa.string(), 3: pa.date32(), 4: pa.timestamp("us"), 6: utc, 7: utc,
+                 8: pa.timestamp("us"), 11: pa.binary(), 12: pa.time64("us"), 13: pa.bool_()}
+        return types.get(type_code, pa.string())
+
+    def cancel_query(self, conn):
+        # Only touches queries of this connection's session; the blocked execute() raises
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT SYSTEM$CANCEL_ALL_QUERIES({int(conn.session_id)})")
+
+    @staticmethod
+    def _information_schema(database: str = None):
+        return f"{database}.INFORMATION_SCHEMA" if database else "INFORMATION_SCHEMA"
+
+    def table_versions(self, cur, schema_name: str, database: str = None):
+        cur.execute(f"""
+            SELECT table_name, last_altered
+            FROM {self._information_schema(database)}.TABLES
+            WHERE table_schema = {_quote_literal(schema_name)};
+        """)
+        return {table: last_altered for table, last_altered in cur.fetchall()}
+
+    def table_columns(self, cur, schema_name: str, tables: list, database: str = None):
+        if not tables:
+            return {}
+        # NUMBER carries its precision and scale, e.g. NUMBER(12,2), so uploads can be coerced exactly
+        cur.execute(f"""
+            SELECT table_name, column_name,
+                   IFF(data_type = 'NUMBER', data_type || '(' || numeric_precision || ',' || numeric_scale || ')', data_type)
+            FROM {self._information_schema(database)}.COLUMNS
+            WHERE table_schema = {_quote_literal(schema_name)}
+              AND table_name IN ({", ".join(_quote_literal(t) for t in tables)})
+            ORDER BY table_name, ordinal_position;
+        """)
+        columns = {}
+        for table, column, dtype in cur.fetchall():
+            columns.setdefault(table, []).append((column, dtype))
+        return columns
+
+    def bulk_load_csv_tables(self, cur, tables: dict):
+        """
+        Splits every CSV into row-aligned, compressed chunks and PUTs them in
+        parallel to one temporary stage, with a folder per table and column layout
+        (which CSV position feeds which column). Each folder is loaded with one
+        pattern-matched COPY INTO, so files planned from the same header share a
+        single COPY per table. Rows that do not load are skipped (ON_ERROR = 'CONTINUE').
+        """
+        stage_name = "temp_csv_stage"
+        cur.execute(f"CREATE OR REPLACE TEMPORARY STAGE {stage_name}")
+        results = {}
+        for table_name, files in tables.items():
+            layouts = {}
+            for key, file_path, csv_columns, column_mapping in files:
+                layout = tuple((target, csv_columns.index(col) + 1) for col, target in column_mapping.items())
+                layouts.setdefault(layout, []).append((key, file_path))
+            loaded, error = {}, None
+            for number, (layout, layout_files) in enumerate(layouts.items()):
+                location = f"{stage_name}/{table_name.upper()}_{number}"
+                try:
+                    for key, file_path in layout_files:
+                        print(f"   - Staging '{os.path.basename(file_path)}' for '{table_name}'...")
+                        self._stage_chunks(cur, file_path, location, key)
+
+                    # Dynamically build the COPY INTO command from the AI map
+                    target_cols_str = ", ".join(f'"{target}"' for target, _ in layout)
+                    source_cols_str = ", ".join(f't.${position}' for _, position in layout)
+                    print(f"   - Executing smart COPY INTO {table_name} for {len(layout_files)} file(s)...")
+                    with span("upload.copy", table=table_name, files=len(layout_files)):
+                        cur.execute(f"""
+                        COPY INTO {table_name} ({target_cols_str})
+                        FROM (SELECT {source_cols_str} FROM @{location}/ t)
+                        PATTERN = '.*_part[0-9]+[.]csv.*'
+                        FILE_FORMAT = (TYPE = 'CSV' FIELD_OPTIONALLY_ENCLOSED_BY = '"' SKIP_HEADER = 1 EMPTY_FIELD_AS_NULL = TRUE)
+                        ON_ERROR = 'CONTINUE';
+                        """)
+                    per_chunk = self._copy_files(cur)
+                except Exception as e:
+                    print(f"   - Loading '{table_name}' failed: {e}")
+                    error = e
+                    break
+                for key, _ in layout_files:
+                    loaded[key] = None if per_chunk is None else \
+                        sum(n for name, n in per_chunk.items() if name.startswith(f"{key}_part"))
+            results[table_name] = (loaded, error)
+        return results
+
+    def bulk_load_parquet_tables(self, cur, tables: dict):
+        """
+        Uses one temporary stage for the whole batch, with a folder per table. Each
+        table's parts are PUT while the next ones are still being written, then
+        loaded with one COPY that matches columns by name; per-file row counts come
+        from the load history COPY returns. Values were already coerced, so any
+        load error is unexpected and aborts that table's COPY.
+        """
+        stage_name = "temp_parquet_stage"
+        cur.execute(f"CREATE OR REPLACE TEMPORARY STAGE {stage_name}")
+        results = {}
+        for table_name, parts in tables.items():
+            location = f"{stage_name}/{table_name.upper()}"
+            try:
+                print(f"   - Staging typed Parquet parts for '{table_name}'...")
+                # Parquet pages are compressed already
+                staged = self._put_files(cur, location, ((lambda path=path: (path, os.path.getsize(path)))
+                                                         for path in parts), "AUTO_COMPRESS = FALSE", "Part")
+                if not staged:
+                    results[table_name] = ({}, None)
+                    continue
+                print(f"   - Executing COPY INTO {table_name} ... MATCH_BY_COLUMN_NAME...")
+                with span("upload.copy", table=table_name, files=staged):
+                    cur.execute(f"""
+                    COPY INTO {table_name}
+                    FROM @{location}/
+                    PATTERN = '.*[.]parquet'
+                    FILE_FORMAT = (TYPE = PARQUET)
+                    MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+                    ON_ERROR = 'ABORT_STATEMENT';
+                    """)
+                results[table_name] = (self._copy_files(cur), None)
+            except Exception as e:
+                print(f"   - Loading '{table_name}' failed: {e}")
+                results[table_name] = (None, e)
+        return results
+
+    @staticmethod
+    def _copy_files(cur):
+        """{staged file name: rows_loaded} from the rows COPY INTO returns (None if it reports none)."""
+        columns = [desc[0].lower() for desc in cur.description or []]
+        if "rows_loaded" not in columns or "file" not in columns:
+            return None
+        name, position = columns.index("file"), columns.index("rows_loaded")
+        errors = columns.index("errors_seen") if "errors_seen" in columns else None
+        rows = cur.fetchall()
+        files_with_errors = sum(bool(errors is not None and row[errors]) for row in rows)
+        if files_with_errors:
+            print(f"   - {files_with_errors} chunk(s) had rows rejected (ON_ERROR = CONTINUE).")
+        return {os.path.basename(row[name]): row[position] or 0 for row in rows}
+
+    @staticmethod
+    def _put_files(cur, stage_name: str, tasks, put_options: str, label: str):
+        """
+        Runs each task (a callable that writes one local file and returns its path
+        and source size) on its own thread and PUTs the file as soon as it exists,
+        reporting per file as it lands. `tasks` may be a generator, so producing
+        files overlaps with staging them. All threads share the session, which
+        owns the temporary stage. Returns the number of files staged.
+        """
+        def _stage(index, task):
+            started = time.time()
+            path = None
+            try:
+                with span("upload.put", chunk=index):
+                    path, source_bytes = task()
+                    staged_bytes = os.path.getsize(path)
+                    with cur.connection.cursor() as put_cur:
+                        put_cur.execute(f"PUT file://{path} @{stage_name} PARALLEL = {UPLOAD_PUT_THREADS} {put_options}")
+            finally:
+                if path:
+                    remove_quietly(path)
+            return index, source_bytes, staged_bytes, time.time() - started
+
+        with ThreadPoolExecutor(max_workers=max(1, UPLOAD_PARALLELISM), thread_name_prefix="aura-upload") as executor:
+            futures = [executor.submit(_stage, i, task) for i, task in enumerate(tasks)]
+            for done, future in enumerate(as_completed(futures), start=1):
+                index, source_bytes, staged_bytes, seconds = future.result()
+                print(f"   - {label} {index + 1} staged ({done}/{len(futures)}): {source_bytes / 1e6:,.1f} MB -> "
+                      f"{staged_bytes / 1e6:,.1f} MB in {seconds:.1f}s.")
+        return len(futures)
+
+    @classmethod
+    def _stage_chunks(cls, cur, file_path: str, stage_name: str, prefix: str):
+        """
+        Compresses and PUTs each chunk of the file on its own thread. COPY detects
+        the compression of each staged file by itself.
+        """
+        compression = resolve_compression()
+        header, ranges = chunk_ranges(file_path)
+        work_dir = tempfile.mkdtemp(prefix="aura_upload_")
+        total_bytes = os.path.getsize(file_path)
+        put_options = ("AUTO_COMPRESS = TRUE" if compression == "none"
+                       else f"AUTO_COMPRESS = FALSE SOURCE_COMPRESSION = {COMPRESSIONS[compression][1]}")
+        print(f"   - Staging {total_bytes / 1e6:,.1f} MB as {len(ranges)} {compression} chunk(s)...")
+
+        def _chunk_task(index, start, end):
+            def _write():
+                path = os.path.join(work_dir, chunk_file_name(prefix, index, compression))
+                write_chunk(file_path, header, start, end, path, compression)
+                return path, end - start
+            return _write
+
+        try:
+            cls._put_files(cur, stage_name, [_chunk_task(i, start, end) for i, (start, end) in enumerate(ranges)],
+                           put_options, "Chunk")
+        finally:
+            remove_quietly(work_dir)
+
+
+# --- DuckDB ---
+
+# Snowflake date functions the generated SQL relies on, rewritten for DuckDB:
+# DATEADD(day, -7, d) -> aura_dateadd('day', -7, d), DATEDIFF(day, a, b) -> aura_datediff('day', a, b)
+_DATEADD = re.compile(r"\bDATEADD\s*\(\s*'?([A-Za-z]+)'?\s*,", re.IGNORECASE)
+_DATEDIFF = re.compile(r"\bDATEDIFF\s*\(\s*'?([A-Za-z]+)'?\s*,", re.IGNORECASE)
+_DATEADD_MACRO = """
+    CREATE OR REPLACE MACRO aura_dateadd(part, n, d) AS CASE lower(part)
+        WHEN 'year' THEN CAST(d AS TIMESTAMP) + to_years(CAST(n AS INTEGER))
+        WHEN 'quarter' THEN CAST(d AS TIMESTAMP) + to_months(CAST(n AS INTEGER) * 3)
+        WHEN 'month' THEN CAST(d AS TIMESTAMP) + to_months(CAST(n AS INTEGER))
+        WHEN 'week' THEN CAST(d AS TIMESTAMP) + to_days(CAST(n AS INTEGER) * 7)
+        WHEN 'hour' THEN CAST(d AS TIMESTAMP) + to_hours(CAST(n AS BIGINT))
+        WHEN 'minute' THEN CAST(d AS TIMESTAMP) + to_minutes(CAST(n AS BIGINT))
+        WHEN 'second' THEN CAST(d AS TIMESTAMP) + to_seconds(CAST(n AS BIGINT))
+        ELSE CAST(d AS TIMESTAMP) + to_days(CAST(n AS INTEGER))
+    END
+"""
+_DATEDIFF_MACRO = """
+    CREATE OR REPLACE MACRO aura_datediff(part, a, b) AS datediff(part, CAST(a AS TIMESTAMP), CAST(b AS TIMESTAMP))
+"""
+
+
+def translate_snowflake_sql(sql: str):
+    """Rewrites the Snowflake-only date functions used by the agent for DuckDB."""
+    sql = _DATEADD.sub(lambda m: f"aura_dateadd('{m.group(1).lower()}',", sql)
+    return _DATEDIFF.sub(lambda m: f"aura_datediff('{m.group(1).lower()}',", sql)
+
+
+class DuckDBConnection:
+    """A session on the shared DuckDB database with the connector-style API the backend uses."""
+
+    def __init__(self, con, schema_name: str):
+        self._con = con
+        self._closed = False
+        con.execute(f"SET search_path = {_quote_literal(schema_name)}")
+
+    def cursor(self):
+        return DuckDBCursor(self._con)
+
+    def is_closed(self):
+        return self._closed
+
+    def interrupt(self):
+        self._con.interrupt()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._con.close()
+
+
+class DuckDBCursor:
+    """Runs statements on its connection's session (the pool gives it to one thread at a time)."""
+
+    sfqid = None
+
+    def __init__(self, con):
+        self._con = con
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, sql: str, params=None):
+        self._con.execute(translate_snowflake_sql(sql), params)
+        return self
+
+    @property
+    def description(self):
+        return self._con.description
+
+    def fetchone(self):
+        return self._con.fetchone()
+
+    def fetchall(self):
+        return self._con.fetchall()
+
+    def fetchmany(self, size: int):
+        return self._con.fetchmany(size)
+
+    def fetch_record_batches(self, batch_rows: int):
+        return self._con.fetch_record_batch(batch_rows)
+
+    def close(self):
+        pass
+
+
+class DuckDBWarehouse(Warehouse):
+    """
+    An embedded, columnar copy of the mart for local development, benchmarks and
+    edge serving. Tables live in a schema named like the Snowflake one, so the same
+    SQL runs on both; Parquet files in `parquet_dir` are exposed as views over the
+    files, so a fresh extract is picked up without reloading anything.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, path: str = DUCKDB_PATH, schema_name: str = None, parquet_dir: str = DUCKDB_PARQUET_DIR,
+                 threads: int = DUCKDB_THREADS):
+        self.path = path
+        self.schema_name = (schema_name or os.getenv("SNOWFLAKE_SCHEMA") or "MART").upper()
+        self.parquet_dir = parquet_dir
+        self.threads = threads
+        self._base = None
+        self._lock = threading.Lock()
+        self._parquet_tables = {}  # table -> newest file mtime
+        self._loaded_at = {}  # table -> time of the last bulk load through this process
+
+    def _database(self):
+        """Opens the shared database on first use; sessions for the pool are cursors of it."""
+        if self._base is None:
+            with self._lock:
+                if self._base is None:
+                    import duckdb
+
+                    base = duckdb.connect(self.path)
+                    if self.threads > 0:
+                        base.execute(f"SET threads = {self.threads}")
+                    base.execute(f"CREATE SCHEMA IF NOT EXISTS {_quote_identifier(self.schema_name)}")
+                    base.execute(_DATEADD_MACRO)
+                    base.execute(_DATEDIFF_MACRO)
+                    self._base = base
+                    self._sync_parquet()
+        return self._base
+
+    def raw_connection(self):
+        """A plain DuckDB session for setup work (seeding, extracts) outside the pool."""
+        con = self._database().cursor()
+        con.execute(f"SET search_path = {_quote_literal(self.schema_name)}")
+        return con
+
+    def sync_parquet(self):
+        """Picks up Parquet tables added to or removed from `parquet_dir` since the last sync."""
+        self._database()
+        with self._lock:
+            self._sync_parquet()
+
+    def _sync_parquet(self):
+        """(Re)creates one view per Parquet table so new or replaced extracts are served."""
+        if not self.parquet_dir or not os.path.isdir(self.parquet_dir):
+            return
+        found, changed = {}, False
+        for entry in sorted(os.listdir(self.parquet_dir)):
+            path = os.path.join(self.parquet_dir, entry)
+            if entry.lower().endswith(".parquet") and os.path.isfile(path):
+                found[entry[:-len(".parquet")].upper()] = (path, [path])
+            elif os.path.isdir(path):
+                parts = glob.glob(os.path.join(path, "*.parquet"))
+                if parts:
+                    found[entry.upper()] = (os.path.join(path, "*.parquet"), parts)
+        for table, (pattern, files) in found.items():
+            mtime = max(os.path.getmtime(f) for f in files)
+            if self._parquet_tables.get(table) == mtime:
+                continue
+            self._base.execute(
+                f"CREATE OR REPLACE VIEW {_quote_identifier(self.schema_name)}.{_quote_identifier(table)} AS "
+                f"SELECT * FROM read_parquet({_quote_literal(pattern)}, union_by_name = true)"
+            )
+            self._parquet_tables[table] = mtime
+            changed = True
+        for table in set(self._parquet_tables) - set(found):
+            self._base.execute(f"DROP VIEW IF EXISTS {_quote_identifier(self.schema_name)}.{_quote_identifier(table)}")
+            del self._parquet_tables[table]
+            changed = True
+        if changed:
+            print(f"[DuckDB] Serving {len(found)} Parquet table(s) from {self.parquet_dir}.")
+
+    def connect(self):
+        return DuckDBConnection(self._database().cursor(), self.schema_name)
+
+    def cancel_query(self, conn):
+        conn.interrupt()
+
+    def arrow_type(self, column):
+        import pyarrow as pa
+
+        name = str(column[1]).upper()
+        decimal = re.fullmatch(r"DECIMAL\((\d+),\s*(\d+)\)", name)
+        if decimal:
+            return pa.decimal128(int(decimal.group(1)), int(decimal.group(2)))
+        simple = {"BOOLEAN": pa.bool_(), "TINYINT": pa.int8(), "SMALLINT": pa.int16(), "INTEGER": pa.int32(),
+                  "BIGINT": pa.int64(), "UTINYINT": pa.uint8(), "USMALLINT": pa.uint16(), "UINTEGER": pa.uint32(),
+                  "UBIGINT": pa.uint64(), "HUGEINT": pa.decimal128(38, 0), "FLOAT": pa.float32(),
+                  "DOUBLE": pa.float64(), "DATE": pa.date32(), "TIME": pa.time64("us"),
+                  "TIMESTAMP": pa.timestamp("us"), "TIMESTAMP WITH TIME ZONE": pa.timestamp("us", tz="UTC"),
+                  "BLOB": pa.binary()}
+        return simple.get(name, pa.string())
+
+    def is_connection_error(self, error: Exception):
+        import duckdb
+
+        return isinstance(error, (duckdb.ConnectionException, duckdb.FatalException))
+
+    def fetch_batches(self, cur, batch_rows: int):
+        """Reads Arrow record batches and turns the columns into row tuples."""
+        for batch in cur.fetch_record_batches(batch_rows):
+            columns = [column.to_pylist() for column in batch.columns]
+            yield list(zip(*columns))
+
+    def table_versions(self, cur, schema_name: str, database: str = None):
+        # INFORMATION_SCHEMA has no LAST_ALTERED here: Parquet tables use their file
+        # time and loaded tables the time of their last bulk load
+        self.sync_parquet()
+        with self._lock:
+            parquet_tables = dict(self._parquet_tables)
+            loaded_at = dict(self._loaded_at)
+        cur.execute(
+            "SELECT table_name FROM information_schema.tables WHERE upper(table_schema) = ?",
+            [schema_name.upper()]
+        )
+        return {table: parquet_tables.get(table, loaded_at.get(table, 0.0)) for (table,) in cur.fetchall()}
+
+    def table_columns(self, cur, schema_name: str, tables: list, database: str = None):
+        if not tables:
+            return {}
+        cur.execute(f"""
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE upper(table_schema) = ?
+              AND table_name IN ({", ".join("?" for _ in tables)})
+            ORDER BY table_name, ordinal_position
+        """, [schema_name.upper(), *tables])
+        columns = {}
+        for table, column, dtype in cur.fetchall():
+            columns.setdefault(table, []).append((column, dtype))
+        return columns
+
+    def bulk_load_csv_tables(self, cur, tables: dict):
+        """
+        Inserts the mapped columns of each file, one transaction per table so the
+        per-file counts are exact; values that do not cast are loaded as NULL,
+        like ON_ERROR = 'CONTINUE'.
+        """
+        results = {}
+        for table_name, files in tables.items():
+            types = dict(self.table_columns(cur, self.schema_name, [table_name.upper()]).get(table_name.upper(), []))
+            loaded = {}
+            try:
+                cur.execute("BEGIN TRANSACTION")
+                for key, file_path, csv_columns, column_mapping in files:
+                    targets = ", ".join(_quote_identifier(col) for col in column_mapping.values())
+                    sources = ", ".join(
+                        f"TRY_CAST({_quote_identifier(csv_col)} AS {types.get(target.upper(), 'VARCHAR')})"
+                        for csv_col, target in column_mapping.items()
+                    )
+                    cur.execute(f"""
+                        INSERT INTO {_quote_identifier(table_name.upper())} ({targets})
+                        SELECT {sources}
+                        FROM read_csv(?, header = true, names = ?, all_varchar = true, ignore_errors = true)
+                    """, [os.path.abspath(file_path), list(csv_columns)])
+                    row = cur.fetchone()
+                    loaded[key] = row[0] if row else None
+                cur.execute("COMMIT")
+                with self._lock:
+                    self._loaded_at[table_name.upper()] = time.time()
+                results[table_name] = (loaded, None)
+            except Exception as e:
+                cur.execute("ROLLBACK")
+                print(f"   - Loading '{table_name}' failed: {e}")
+                results[table_name] = ({}, e)
+        return results
+
+    def bulk_load_parquet_tables(self, cur, tables: dict):
+        """Inserts each table's parts by column name in one statement; per-file counts come from the Parquet footers."""
+        import pyarrow.parquet as pq
+
+        results = {}
+        for table_name, parts in tables.items():
+            try:
+                paths = [os.path.abspath(path) for path in parts]
+                if paths:
+                    cur.execute(f"""
+                        INSERT INTO {_quote_identifier(table_name.upper())} BY NAME
+                        SELECT * FROM read_parquet(?, union_by_name = true)
+                    """, [paths])
+                    with self._lock:
+                        self._loaded_at[table_name.upper()] = time.time()
+                results[table_name] = ({os.path.basename(path): pq.read_metadata(path).num_rows for path in paths}, None)
+            except Exception as e:
+                print(f"   - Loading '{table_name}' failed: {e}")
+                results[table_name] = (None, e)
+        return results
+
+    def stats(self):
+        return {"engine": self.name, "path": self.path, "schema": self.schema_name,
+                "parquetTables": sorted(self._parquet_tables)}
+
+
+# --- Parquet Extract ---
+
+def _arrow_column(values, arrow_type):
+    import pyarrow as pa
+
+    try:
+        return pa.array(values, type=arrow_type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # e.g. NUMBER(p, s) fetched as floats; cast() still fails on overflow
+        return pa.array(values, from_pandas=True).cast(arrow_type)
+
+
+def write_query_parquet(source: Warehouse, cur, sql: str, target: str, batch_rows: int = 100_000):
+    """
+    Streams the result of `sql` into a Parquet file at `target`, writing to a
+    temporary name first so readers only ever see complete files. Returns the
+    row count, or None (and writes nothing) when the query returned no rows.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cur.execute(sql)
+    # Fixed up front: inferring it from the first batch would let an all-NULL or
+    # narrower first batch decide the type of the whole file
+    schema = pa.schema([pa.field(column[0], source.arrow_type(column)) for column in cur.description])
+    partial = target + ".partial"
+    writer, rows = None, 0
+    try:
+        for batch in source.fetch_batches(cur, batch_rows):
+            arrow_batch = pa.Table.from_arrays(
+                [_arrow_column(values, field.type) for values, field in zip(zip(*batch), schema)], schema=schema)
+            if writer is None:
+                writer = pq.ParquetWriter(partial, schema)
+            writer.write_table(arrow_batch)
+            rows += len(batch)
+    except Exception:
+        if writer is not None:
+            writer.close()
+            os.remove(partial)
+        raise
+    if writer is None:
+        return None
+    writer.close()
+    os.replace(partial, target)
+    return rows
+
+
+def export_parquet_extract(out_dir: str, tables: list = None, source: Warehouse = None, schema_name: str = None,
+                           batch_rows: int = 100_000):
+    """
+    Copies tables from `source` (Snowflake by default) into <out_dir>/<TABLE>.parquet,
+    streaming batches so large fact tables never sit in memory. Files are written
+    next to the target and renamed into place, so a DuckDB warehouse serving
+    `out_dir` never sees a half-written extract. Returns {table: rows}.
+    """
+    source = source or SnowflakeWarehouse()
+    schema_name = (schema_name or os.getenv("SNOWFLAKE_SCHEMA") or "").upper()
+    os.makedirs(out_dir, exist_ok=True)
+    conn = source.connect()
+    written = {}
+    try:
+        with conn.cursor() as cur:
+            tables = tables or sorted(source.table_versions(cur, schema_name, os.getenv("SNOWFLAKE_DATABASE")))
+            for table in tables:
+                target = os.path.join(out_dir, f"{table.upper()}.parquet")
+                rows = write_query_parquet(source, cur, f"SELECT * FROM {table}", target, batch_rows)
+                if rows is None:
+                    continue  # empty table: no schema to write
+                written[table.upper()] = rows
+                print(f"[Parquet Extract] {table.upper()}: {rows:,} row(s) -> {target}")
+    finally:
+        conn.close()
+    return written
+
+
+# --- Shared Warehouse ---
+
+_warehouse = None
+_warehouse_lock = threading.Lock()
+
+
+def get_warehouse():
+    """Returns the process-wide warehouse chosen by AURA_WAREHOUSE."""
+    global _warehouse
+    if _warehouse is None:
+        with _warehouse_lock:
+            if _warehouse is None:
+                if WAREHOUSE_ENGINE == "duckdb":
+                    _warehouse = DuckDBWarehouse()
+                elif WAREHOUSE_ENGINE == "snowflake":
+                    _warehouse = SnowflakeWarehouse()
+                else:
+                    raise ValueError(f"Unknown AURA_WAREHOUSE '{WAREHOUSE_ENGINE}' (expected snowflake or duckdb).")
+    return _warehouse
+
+
+def configure_warehouse(warehouse: Warehouse):
+    """Replaces the shared warehouse; call configure_pool() afterwards to drop old connections."""
+    global _warehouse
+    with _warehouse_lock:
+        _warehouse = warehouse
+    return _warehouse
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the Snowflake mart to Parquet for AURA_DUCKDB_PARQUET_DIR.")
+    parser.add_argument("out_dir")
+    parser.add_argument("tables", nargs="*", help="tables to export (default: every table in SNOWFLAKE_SCHEMA)")
+    args = parser.parse_args()
+    export_parquet_extract(args.out_dir, args.tables or None)